@@ -0,0 +1,88 @@
+"""
+Pre-baked animation frames.
+
+Pulsing sprites (the revealed gate, live bombs) and the fading dead player
+used to be rescaled or copied on every frame. AnimationCache renders a fixed
+number of scale or alpha frames per sprite once and then picks the frame that
+matches the animation phase, so drawing never allocates a new surface.
+"""
+from collections import OrderedDict
+
+import pygame
+
+FRAME_COUNT = 16   # Frames baked for each animation
+MAX_ENTRIES = 32   # Animations kept before the least recently used one is dropped
+
+
+class AnimationCache:
+    def __init__(self, frame_count=FRAME_COUNT, max_entries=MAX_ENTRIES):
+        """
+        Args:
+            frame_count: Number of frames baked for each animation
+            max_entries: Number of animations kept in the cache
+        """
+        self.frame_count = frame_count
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def get_frames(self, key, build):
+        """Return the frames stored under key, building them on a miss"""
+        frames = self.entries.get(key)
+        if frames is None:
+            frames = build()
+            self.entries[key] = frames
+            # Evict the least recently used animation when the cache is full
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(key)
+        return frames
+
+    def frame_index(self, phase):
+        """Map a phase between 0 and 1 to a frame index"""
+        phase = min(1.0, max(0.0, phase))
+        return int(round(phase * (self.frame_count - 1)))
+
+    def scale_frames(self, name, image, min_scale, max_scale):
+        """
+        Bake frames of image scaled from min_scale to max_scale.
+
+        Returns:
+            List of (surface, offset) tuples, where offset re-centers the
+            scaled surface over the original sprite position
+        """
+        def build():
+            width, height = image.get_size()
+            frames = []
+            for i in range(self.frame_count):
+                scale = min_scale + (max_scale - min_scale) * i / (self.frame_count - 1)
+                size = (int(width * scale), int(height * scale))
+                frames.append((pygame.transform.scale(image, size), (size[0] - width) // 2))
+            return frames
+
+        return self.get_frames((name, 'scale', min_scale, max_scale, self.frame_count), build)
+
+    def alpha_frames(self, name, image):
+        """
+        Bake frames of image faded from fully transparent to opaque.
+
+        Returns:
+            List of surfaces with increasing alpha
+        """
+        def build():
+            frames = []
+            for i in range(self.frame_count):
+                frame = image.copy()
+                frame.set_alpha(int(255 * i / (self.frame_count - 1)))
+                frames.append(frame)
+            return frames
+
+        return self.get_frames((name, 'alpha', self.frame_count), build)
+
+    def scaled(self, name, image, min_scale, max_scale, phase):
+        """Return the (surface, offset) frame for a scale animation at phase"""
+        return self.scale_frames(name, image, min_scale, max_scale)[self.frame_index(phase)]
+
+    def faded(self, name, image, phase):
+        """Return the frame for an alpha animation at phase (0 = invisible, 1 = opaque)"""
+        return self.alpha_frames(name, image)[self.frame_index(phase)]
@@ -0,0 +1,214 @@
+"""
+On-disk sprite atlas cache.
+
+Building the sprites takes hundreds of pygame.draw calls and the results are
+in whatever pixel format they were drawn in, so every blit converted them.
+The atlas packs every sprite into two pages - one for opaque tiles and one
+for sprites with per-pixel alpha - saves them as PNGs with a JSON index and
+reloads them on the next start. The cache key is the tile size plus a hash
+of everything the sprites are made from (the code that draws them and any
+sprite files on disk), so changing either rebuilds the atlas. After loading,
+each page is converted to the display's pixel format once and the sprites
+are handed out as subsurfaces of the converted pages.
+"""
+import hashlib
+import inspect
+import json
+import os
+
+import pygame
+
+ATLAS_VERSION = 1    # Bump when the atlas file layout changes
+ATLAS_WIDTH = 512    # Page width in pixels; pages grow downwards as needed
+PADDING = 1          # Empty pixels between sprites so scaling never bleeds neighbours in
+PAGE_OPAQUE = 'opaque'
+PAGE_ALPHA = 'alpha'
+
+
+def content_key(build, tile_size, source_files=()):
+    """
+    Hash of everything the sprites are made from.
+
+    Args:
+        build: Function that creates the sprite dictionary
+        tile_size: Tile size the sprites are drawn for
+        source_files: Sprite files the build function may load
+
+    Returns:
+        Hex digest identifying this set of sprites
+    """
+    digest = hashlib.sha1()
+    digest.update(f"{ATLAS_VERSION}:{tile_size}:{build.__qualname__}:".encode())
+    # Hash the whole module the build function lives in: it also covers the
+    # colours and constants the drawing code uses, and reading a file is much
+    # cheaper than inspect.getsource()
+    for path in (inspect.getfile(build), *source_files):
+        digest.update(os.path.basename(path).encode())
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        else:
+            digest.update(b'<missing>')
+    return digest.hexdigest()[:16]
+
+
+def flatten(sprites, path=()):
+    """
+    List the sprites in a nested dict/list structure.
+
+    Returns:
+        List of (path, surface) where path is a tuple of dict keys and list indices
+    """
+    if isinstance(sprites, pygame.Surface):
+        return [(path, sprites)]
+    items = sprites.items() if isinstance(sprites, dict) else enumerate(sprites)
+    flat = []
+    for key, value in items:
+        flat.extend(flatten(value, path + (key,)))
+    return flat
+
+
+def unflatten(flat):
+    """Rebuild the nested structure from (path, value) pairs (integer keys become lists)"""
+    root = {}
+    for path, value in flat:
+        node = root
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = value
+
+    def lists(node):
+        if not isinstance(node, dict):
+            return node
+        if node and all(isinstance(key, int) for key in node):
+            return [lists(node[i]) for i in sorted(node)]
+        return {key: lists(value) for key, value in node.items()}
+    return lists(root)
+
+
+def pack(flat, width=ATLAS_WIDTH):
+    """
+    Shelf-pack sprites into pages.
+
+    Sprites are sorted by height and placed left to right in rows; a new row
+    starts when the current one is full.
+
+    Returns:
+        Tuple of (pages dict of page name -> Surface, entries list of
+        (path, page name, (x, y, w, h)))
+    """
+    placements = {PAGE_OPAQUE: [], PAGE_ALPHA: []}
+    for path, surface in flat:
+        page = PAGE_ALPHA if surface.get_flags() & pygame.SRCALPHA else PAGE_OPAQUE
+        placements[page].append((path, surface))
+
+    pages = {}
+    entries = []
+    for page, items in placements.items():
+        if not items:
+            continue
+        items.sort(key=lambda item: -item[1].get_height())
+        x = y = row_height = 0
+        rects = []
+        for path, surface in items:
+            w, h = surface.get_size()
+            if x and x + w > width:
+                x, y = 0, y + row_height + PADDING
+                row_height = 0
+            rects.append((path, surface, (x, y, w, h)))
+            x += w + PADDING
+            row_height = max(row_height, h)
+
+        flags = pygame.SRCALPHA if page == PAGE_ALPHA else 0
+        sheet = pygame.Surface((width, y + row_height), flags)
+        for path, surface, rect in rects:
+            sheet.blit(surface, rect[:2])
+            entries.append((path, page, rect))
+        pages[page] = sheet
+    return pages, entries
+
+
+def atlas_paths(cache_dir, tile_size, key):
+    base = os.path.join(cache_dir, f"sprites_{tile_size}_{key}")
+    return base + '.json', {page: f"{base}_{page}.png" for page in (PAGE_OPAQUE, PAGE_ALPHA)}
+
+
+def save(cache_dir, tile_size, key, pages, entries):
+    """Write the pages and the index; replaces atlases built from older sources"""
+    os.makedirs(cache_dir, exist_ok=True)
+    for name in os.listdir(cache_dir):
+        if name.startswith(f"sprites_{tile_size}_") and key not in name:
+            os.remove(os.path.join(cache_dir, name))
+
+    index_path, page_paths = atlas_paths(cache_dir, tile_size, key)
+    for page, sheet in pages.items():
+        pygame.image.save(sheet, page_paths[page])
+    index = {
+        'version': ATLAS_VERSION,
+        'tile_size': tile_size,
+        'key': key,
+        'pages': sorted(pages),
+        'sprites': [{'path': list(path), 'page': page, 'rect': list(rect)} for path, page, rect in entries],
+    }
+    # Write the index last and atomically, so a half-written atlas is never picked up
+    with open(index_path + '.tmp', 'w') as f:
+        json.dump(index, f)
+    os.replace(index_path + '.tmp', index_path)
+
+
+def load(cache_dir, tile_size, key):
+    """
+    Read a cached atlas.
+
+    Returns:
+        Tuple of (pages, entries) as returned by pack(), or None if there is
+        no usable atlas for this key
+    """
+    index_path, page_paths = atlas_paths(cache_dir, tile_size, key)
+    try:
+        with open(index_path) as f:
+            index = json.load(f)
+        if index.get('version') != ATLAS_VERSION or index.get('key') != key:
+            return None
+        pages = {page: pygame.image.load(page_paths[page]) for page in index['pages']}
+    except (OSError, ValueError, KeyError, pygame.error):
+        return None
+    entries = [(tuple(entry['path']), entry['page'], tuple(entry['rect'])) for entry in index['sprites']]
+    return pages, entries
+
+
+def convert_pages(pages):
+    """Convert each page to the display's pixel format (needs an open display)"""
+    if pygame.display.get_surface() is None:
+        return pages
+    return {page: sheet.convert_alpha() if page == PAGE_ALPHA else sheet.convert()
+            for page, sheet in pages.items()}
+
+
+def load_sprites(build, cache_dir, tile_size, source_files=()):
+    """
+    Sprites from the atlas cache, building and caching them on a miss.
+
+    Args:
+        build: Function that creates the sprite dictionary
+        cache_dir: Directory holding the atlas files
+        tile_size: Tile size the sprites are drawn for
+        source_files: Sprite files the build function may load
+
+    Returns:
+        The same nested dictionary build() returns, with every sprite a
+        subsurface of a display-format atlas page
+    """
+    key = content_key(build, tile_size, source_files)
+    cached = load(cache_dir, tile_size, key)
+    if cached is None:
+        pages, entries = pack(flatten(build()))
+        try:
+            save(cache_dir, tile_size, key, pages, entries)
+        except (OSError, pygame.error) as e:
+            print(f"Could not write sprite atlas: {e}")
+    else:
+        pages, entries = cached
+
+    pages = convert_pages(pages)
+    return unflatten([(path, pages[page].subsurface(rect)) for path, page, rect in entries])
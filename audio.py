@@ -0,0 +1,144 @@
+"""
+Sound effects through a reserved pool of mixer channels.
+
+The game used to call Sound.play() once per event, so a frame where several
+bombs went off and caught a crowd of enemies started dozens of overlapping
+voices on whatever channels pygame picked, and the burst of play() calls
+showed up as a frame-time spike. SoundManager queues the sounds a frame
+asks for and starts them in one flush() per frame:
+
+- Requests for the same sound in one frame are coalesced into one voice,
+  played a little louder for every extra request.
+- Voices play on SOUND_CHANNELS channels reserved with set_reserved(), so
+  pygame's own channel picking never cuts them off.
+- Every sound has a priority and a voice limit. A sound already playing as
+  often as its limit allows restarts on the channel of its oldest voice.
+  When the pool is full, it takes the channel of the lowest-priority, oldest
+  voice below its own priority, or is dropped if there is none.
+
+load() decodes the sounds one by one and the game runs it on a loader
+thread. Each sound becomes playable as soon as it is decoded. Sounds that
+are not ready yet, or requested before the mixer is up, are skipped.
+"""
+import os
+import time
+
+import pygame
+
+SOUND_CHANNELS = 6     # Mixer channels reserved for sound effects (fewer than the voice limits add up to)
+VOICE_VOLUME = 0.8     # Channel volume of a single request, leaving headroom for coalesced ones
+COALESCE_BOOST = 0.05  # Extra channel volume per additional request of a sound in the same frame
+
+# Sound effects: name -> (file name, priority, volume, most voices at once)
+SOUND_SPECS = {
+    'player_death': ('player_death.wav', 3, 1.0, 1),
+    'explosion': ('explosion.wav', 2, 1.0, 3),
+    'enemy_death': ('enemy_death.wav', 1, 1.0, 2),
+    'bomb_placed': ('bomb_placed.wav', 0, 1.0, 2),
+}
+
+
+class SoundManager:
+    def __init__(self, specs=SOUND_SPECS, channels=SOUND_CHANNELS, timer=time.perf_counter):
+        """
+        Args:
+            specs: Sound effects as in SOUND_SPECS
+            channels: Number of mixer channels to reserve
+            timer: Function returning the current time in seconds
+        """
+        self.specs = specs
+        self.channel_count = channels
+        self.timer = timer
+        self.sounds = {}    # name -> decoded Sound, filled in by load()
+        self.channels = []  # Reserved Channel objects, set by open()
+        self.voices = []    # Per channel: (name, priority, start time) of its last voice, or None
+        self.queued = {}    # name -> requests since the last flush()
+        # Counters for tuning the pool
+        self.played = 0
+        self.coalesced = 0
+        self.stolen = 0
+        self.dropped = 0
+
+    def open(self):
+        """Reserve the channel pool (call once the mixer is initialized)"""
+        if pygame.mixer.get_num_channels() < self.channel_count:
+            pygame.mixer.set_num_channels(self.channel_count)
+        pygame.mixer.set_reserved(self.channel_count)
+        self.voices = [None] * self.channel_count
+        # Set last: flush() starts using the pool as soon as it is there
+        self.channels = [pygame.mixer.Channel(index) for index in range(self.channel_count)]
+
+    def load(self, directory):
+        """
+        Decode every sound file; each one can play as soon as it is done.
+
+        Raises:
+            FileNotFoundError or pygame.error: If a sound cannot be loaded
+        """
+        for name, (file_name, _, volume, _) in self.specs.items():
+            sound = pygame.mixer.Sound(os.path.join(directory, file_name))
+            sound.set_volume(volume)
+            self.sounds[name] = sound
+
+    def play(self, name):
+        """Ask for a sound; it starts at the next flush()"""
+        self.queued[name] = self.queued.get(name, 0) + 1
+
+    def flush(self):
+        """Start the sounds queued since the last call (once per frame), highest priority first"""
+        if not self.queued:
+            return
+        queued, self.queued = self.queued, {}
+        now = self.timer()
+        for name in sorted(queued, key=lambda name: -self.specs[name][1]):
+            count = queued[name]
+            sound = self.sounds.get(name)
+            if sound is None or not self.channels:
+                self.dropped += count
+                continue
+            _, priority, _, max_voices = self.specs[name]
+            index = self.pick_channel(name, priority, max_voices)
+            if index is None:
+                self.dropped += count
+                continue
+            channel = self.channels[index]
+            channel.set_volume(min(1.0, VOICE_VOLUME + COALESCE_BOOST * (count - 1)))
+            channel.play(sound)  # Stops whatever the channel was playing
+            self.voices[index] = (name, priority, now)
+            self.played += 1
+            self.coalesced += count - 1
+
+    def pick_channel(self, name, priority, max_voices):
+        """
+        Channel for a new voice of a sound.
+
+        Returns:
+            Channel index, or None if every channel plays something at least
+            as important
+        """
+        free = None
+        own = []    # (start time, index) of the sound's own voices
+        lower = []  # (priority, start time, index) of less important voices
+        for index, channel in enumerate(self.channels):
+            voice = self.voices[index]
+            if voice is None or not channel.get_busy():
+                if free is None:
+                    free = index
+            elif voice[0] == name:
+                own.append((voice[2], index))
+            elif voice[1] < priority:
+                lower.append((voice[1], voice[2], index))
+        if len(own) >= max_voices:
+            return min(own)[1]
+        if free is not None:
+            return free
+        if lower:
+            self.stolen += 1
+            return min(lower)[2]
+        return None
+
+    def stop(self):
+        """Silence every voice and forget queued requests"""
+        self.queued.clear()
+        for channel in self.channels:
+            channel.stop()
@@ -0,0 +1,438 @@
+"""
+Benchmark suite for the hot paths of the game.
+
+Times grid generation, sprite creation, background and world drawing, bomb
+and enemy updates, a headless simulation step, the scripted bot and a full frame (simulation
+step plus drawing to an off-screen surface). Each case is timed with timeit:
+autorange() picks a loop count that runs for at least 0.2 seconds, then the
+best and median of several repeats are reported in microseconds per call.
+
+Results can be saved as a JSON baseline and later runs compared against it.
+A case that got slower than the baseline by more than the threshold counts
+as a regression and makes the script exit with status 1, so it can gate a
+change before it is merged. Baselines are machine-specific and are not
+committed.
+
+Usage:
+    python benchmark.py --save                # record a baseline
+    python benchmark.py                       # compare against it
+    python benchmark.py --filter grid --threshold 0.1
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import timeit
+
+# Render without a window or sound card
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+import main as game
+from bitboard import BitboardGrid
+from clock import FixedStepClock
+from difficulty import ScriptedPolicy
+from gamestate import FlatGrid, snapshot, restore
+from renderer import Renderer
+from scheduler import Scheduler
+from server import Match
+from simulation import (
+    Simulation, ListGrid, Enemy, Bomb, Player, RandomStreams, generate_level, tile_to_pixel,
+    GRID_WIDTH, GRID_HEIGHT, BOMB_TIMER, ENEMY_MOVE_INTERVAL,
+    ACTION_LEFT, ACTION_RIGHT, ACTION_UP, ACTION_DOWN, ACTION_BOMB,
+)
+from spatial import OccupancyIndex
+
+# Renderer surfaces are converted to the display format, so open the (dummy) window
+game.init_display()
+
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+DEFAULT_THRESHOLD = 0.25  # Allowed slowdown before a case counts as a regression
+REPEATS = 5               # Timing repeats per case
+ENEMY_COUNT = 1000        # Enemies in the enemy update case
+FRAME_TICKS = 600         # Ticks of scripted input replayed by the step and frame cases
+SEED = 1234
+
+# Benchmark cases: name -> setup function returning the callable to time
+CASES = {}
+
+
+def case(name):
+    """Register a benchmark case"""
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+
+def scripted_actions(count, seed=SEED, bombs=True):
+    """
+    Reproducible input: walk in runs of one direction and drop bombs now and then.
+
+    Args:
+        bombs: False to only walk (the player then stays boxed in near its start)
+    """
+    rng = random.Random(seed)
+    moves = (ACTION_LEFT, ACTION_RIGHT, ACTION_UP, ACTION_DOWN)
+    actions = []
+    while len(actions) < count:
+        action = rng.choice(moves)
+        if rng.random() < 0.2 and bombs:
+            action |= ACTION_BOMB
+        actions.extend([action] * rng.randint(5, 30))
+    return actions[:count]
+
+
+def replay(sim, actions, tick):
+    """Step a seeded simulation through the scripted input, starting over when it ends"""
+    def run():
+        if tick[0] == len(actions) or sim.game_over or sim.level_complete:
+            sim.clock.ticks = 0
+            sim.reset(seed=SEED)
+            tick[0] = 0
+        events = sim.step(actions[tick[0]])
+        tick[0] += 1
+        return events
+    return run
+
+
+def seeded_simulation(level=1, pursuit=False):
+    sim = Simulation(level=level, clock=FixedStepClock(dt=1 / game.FPS), seed=SEED, pursuit=pursuit)
+    sim.reset()
+    return sim
+
+
+# ===== GRID =====
+
+@case('create_grid.list')
+def bench_create_grid_list():
+    rng = random.Random(SEED)
+    return lambda: ListGrid.generate(rng)
+
+
+@case('create_grid.bitboard')
+def bench_create_grid_bitboard():
+    rng = random.Random(SEED)
+    return lambda: BitboardGrid.generate(rng)
+
+
+@case('generate_level')
+def bench_generate_level():
+    """Layout plus the union-find reachability check and spawn list"""
+    rng = random.Random(SEED)
+    return lambda: generate_level(ListGrid.generate, rng)
+
+
+@case('explosion_area.list')
+def bench_explosion_area_list():
+    grid = ListGrid.generate(random.Random(SEED))
+    return lambda: [grid.explosion_area(x, y) for x in range(1, GRID_WIDTH - 1, 2) for y in range(1, GRID_HEIGHT - 1, 2)]
+
+
+@case('explosion_area.bitboard')
+def bench_explosion_area_bitboard():
+    grid = BitboardGrid.generate(random.Random(SEED))
+    return lambda: [grid.explosion_area(x, y) for x in range(1, GRID_WIDTH - 1, 2) for y in range(1, GRID_HEIGHT - 1, 2)]
+
+
+# ===== ENTITIES =====
+
+@case('bomb.update')
+def bench_bomb_update():
+    """Poll a board full of armed bombs, as a per-frame loop would"""
+    grid = ListGrid.generate(random.Random(SEED))
+    index = OccupancyIndex()
+    player = Player(*tile_to_pixel(1, 1))
+    bombs = [Bomb(x, y, 0.0) for x in range(1, GRID_WIDTH - 1, 2) for y in range(1, GRID_HEIGHT - 1, 2)]
+    return lambda: [bomb.update(grid, index, player, BOMB_TIMER / 2) for bomb in bombs]
+
+
+@case('enemy.update')
+def bench_enemy_update():
+    """Move ENEMY_COUNT enemies whose move is due"""
+    rng = random.Random(SEED)
+    grid = ListGrid.generate(rng)
+    index = OccupancyIndex()
+    enemies = []
+    for _ in range(ENEMY_COUNT):
+        x, y = grid.find_enemy_position(rng)
+        enemy = Enemy(x, y, 0.0, rng)
+        enemy.occupancy = index
+        index.add(enemy, x, y)
+        enemies.append(enemy)
+
+    def run():
+        for enemy in enemies:
+            enemy.last_move_time = 0.0
+            enemy.update(grid, ENEMY_MOVE_INTERVAL, rng)
+    return run
+
+
+@case('scheduler.enemy_moves')
+def bench_scheduler():
+    """Schedule and pop ENEMY_COUNT enemy moves"""
+    scheduler = Scheduler()
+    streams = RandomStreams(SEED)
+    times = [streams.ai.random() for _ in range(ENEMY_COUNT)]
+
+    def run():
+        for time in times:
+            scheduler.schedule(time, 'enemy_move')
+        return scheduler.pop_due(1.0)
+    return run
+
+
+# ===== SIMULATION =====
+
+@case('sim.step')
+def bench_sim_step():
+    sim = seeded_simulation()
+    return replay(sim, scripted_actions(FRAME_TICKS), [0])
+
+
+@case('sim.step.level5')
+def bench_sim_step_crowded():
+    sim = seeded_simulation(level=5)
+    return replay(sim, scripted_actions(FRAME_TICKS), [0])
+
+
+@case('sim.step.pursuit')
+def bench_sim_step_pursuit():
+    sim = seeded_simulation(level=5, pursuit=True)
+    return replay(sim, scripted_actions(FRAME_TICKS), [0])
+
+
+@case('bot.act')
+def bench_bot_act():
+    """Scripted bot choosing its action (danger checks and escape searches) plus the step"""
+    sim = seeded_simulation()
+    policy = ScriptedPolicy(sim)
+
+    def run():
+        if sim.game_over or sim.level_complete:
+            sim.clock.ticks = 0
+            sim.reset(seed=SEED)
+        sim.step(policy.act())
+    return run
+
+
+@case('gamestate.snapshot_restore')
+def bench_snapshot_restore():
+    """Clone-and-go-back cycle of a tree search, mid-game with bombs on the board"""
+    sim = Simulation(clock=FixedStepClock(dt=1 / game.FPS), seed=SEED, grid_factory=FlatGrid.generate)
+    sim.reset()
+    for action in scripted_actions(300):
+        sim.step(action)
+
+    def run():
+        restore(sim, snapshot(sim))
+    return run
+
+
+class NullPeer:
+    """Server-side client that drops everything sent to it"""
+    match = number = None
+
+    def send(self, data):
+        pass
+
+    def backlog(self):
+        return 0
+
+    def close(self):
+        pass
+
+
+@case('server.match_tick')
+def bench_match_tick():
+    """One tick of a 4-player match: inputs, the step and the delta sent to every client"""
+    match = Match([NullPeer() for _ in range(4)], seed=SEED)
+    inputs = [scripted_actions(FRAME_TICKS, SEED + number) for number in range(4)]
+    tick = [0]
+
+    def run():
+        if tick[0] == FRAME_TICKS or match.sim.game_over:
+            match.sim.reset(seed=SEED)
+            tick[0] = 0
+        for number, actions in enumerate(inputs):
+            match.receive_input(number, tick[0], actions[tick[0]])
+        match.tick()
+        tick[0] += 1
+    return run
+
+
+# ===== RENDERING =====
+
+@case('create_sprite_images')
+def bench_create_sprite_images():
+    def run():
+        # Without sprite files on disk every call prints a fallback notice
+        with contextlib.redirect_stdout(io.StringIO()):
+            return game.create_sprite_images()
+    return run
+
+
+@case('atlas.load')
+def bench_atlas_load():
+    """Warm start: read the cached sprite atlas and convert it"""
+    game.load_sprites()  # Make sure the atlas exists
+    return game.load_sprites
+
+
+@case('renderer.build_background')
+def bench_build_background():
+    renderer = Renderer(pygame.Surface((game.WINDOW_WIDTH, game.WINDOW_HEIGHT)), game.sprites)
+    grid = ListGrid.generate(random.Random(SEED))
+
+    def run():
+        renderer.build_background(grid)
+        renderer.compose_background()
+    return run
+
+
+@case('renderer.draw_world')
+def bench_draw_world():
+    sim = seeded_simulation(level=3)
+    renderer = Renderer(pygame.Surface((game.WINDOW_WIDTH, game.WINDOW_HEIGHT)), game.sprites)
+    renderer.begin_frame(sim.grid)
+
+    def run():
+        renderer.begin_frame(sim.grid)
+        renderer.draw_world(sim, sim.now())
+        return renderer.end_frame()
+    return run
+
+
+@case('frame.arena')
+def bench_frame_arena():
+    """Full frame on a 201x201 map: should cost about the same as the standard map"""
+    sim = Simulation(clock=FixedStepClock(dt=1 / game.FPS), seed=SEED, width=201, height=201,
+                     far_radius=game.FAR_ENTITY_RADIUS)
+    sim.reset()
+    renderer = Renderer(pygame.Surface((game.WINDOW_WIDTH, game.WINDOW_HEIGHT)), game.sprites)
+    # Resetting an arena costs far more than a frame and would dominate the
+    # measurement, so the input never drops a bomb and the player cannot die
+    sim.kill_player = lambda cause, events, player=None: None
+    actions = scripted_actions(FRAME_TICKS, bombs=False)
+    tick = [0]
+
+    def run():
+        if tick[0] == len(actions):
+            tick[0] = 0
+        game.update_game(sim, renderer, actions[tick[0]])
+        tick[0] += 1
+        return game.draw_frame(sim, renderer)
+    return run
+
+
+@case('frame')
+def bench_frame():
+    """Full frame: simulation step, sounds, background updates and drawing off-screen"""
+    sim = seeded_simulation()
+    renderer = Renderer(pygame.Surface((game.WINDOW_WIDTH, game.WINDOW_HEIGHT)), game.sprites)
+    actions = scripted_actions(FRAME_TICKS)
+    tick = [0]
+
+    def run():
+        if tick[0] == len(actions) or sim.game_over or sim.level_complete:
+            sim.clock.ticks = 0
+            sim.reset(seed=SEED)
+            tick[0] = 0
+        game.update_game(sim, renderer, actions[tick[0]])
+        tick[0] += 1
+        return game.draw_frame(sim, renderer)
+    return run
+
+
+# ===== RUNNER =====
+
+def time_case(name, repeats=REPEATS):
+    """
+    Time one case.
+
+    Returns:
+        Dictionary with the best and median time per call in microseconds
+        and the number of calls per repeat
+    """
+    timer = timeit.Timer(CASES[name]())
+    number, _ = timer.autorange()
+    totals = timer.repeat(repeat=repeats, number=number)
+    per_call = [total / number * 1e6 for total in totals]
+    return {'best_us': min(per_call), 'median_us': statistics.median(per_call), 'number': number}
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare results against a baseline.
+
+    Returns:
+        List of (name, baseline best, current best, relative change) for the
+        cases that got slower by more than the threshold
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            continue
+        change = result['best_us'] / previous['best_us'] - 1
+        if change > threshold:
+            regressions.append((name, previous['best_us'], result['best_us'], change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the game's hot paths")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument('--save', action='store_true', help="write the results as the new baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="relative slowdown that counts as a regression (0.25 = 25%%)")
+    parser.add_argument('--filter', default='', help="only run cases whose name contains this text")
+    parser.add_argument('--repeats', type=int, default=REPEATS, help="timing repeats per case")
+    args = parser.parse_args()
+
+    baseline = {}
+    if not args.save and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    previous = baseline.get('results', {})
+
+    results = {}
+    for name in CASES:
+        if args.filter not in name:
+            continue
+        results[name] = result = time_case(name, args.repeats)
+        line = f"{name:<28}{result['best_us']:>12.1f} us  (median {result['median_us']:.1f} us)"
+        if name in previous:
+            line += f"  {result['best_us'] / previous[name]['best_us'] - 1:+.1%}"
+        print(line)
+
+    if args.save:
+        # Keep the cases that were filtered out of this run
+        if os.path.exists(args.baseline):
+            with open(args.baseline) as f:
+                results = {**json.load(f).get('results', {}), **results}
+        with open(args.baseline, 'w') as f:
+            json.dump({'python': platform.python_version(), 'pygame': pygame.version.ver,
+                       'machine': platform.machine(), 'results': results}, f, indent=2, sort_keys=True)
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    if not baseline:
+        print(f"No baseline at {args.baseline}; run with --save to record one")
+        return 0
+
+    regressions = compare(results, baseline, args.threshold)
+    for name, before, after, change in regressions:
+        print(f"REGRESSION {name}: {before:.1f} us -> {after:.1f} us ({change:+.1%})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
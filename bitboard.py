@@ -0,0 +1,340 @@
+"""
+Bitboard grid backend.
+
+The grid is stored as four Python-int bitboards (walls, destructible blocks,
+hidden gates and revealed gates), one bit per cell at index y * width + x.
+Blast rays, walkability checks and free-cell tests become shifts and masks
+instead of cell-by-cell list lookups, and a whole board is just four ints.
+The masks of the cells enemies and the player may enter are kept up to date
+on every change, so is_empty() and is_walkable() are one bit test each.
+
+BitboardGrid offers the same methods as simulation.ListGrid and still shows
+the 0-4 cell codes through grid[y][x], so it can be passed to the simulation
+as a drop-in replacement. The codes are mirrored in a bytearray, written
+only when a cell changes, so reading a cell or a row does not decode the
+bitboards:
+
+    sim = Simulation(grid_factory=BitboardGrid.generate)
+"""
+import random
+
+from simulation import (
+    GRID_WIDTH, GRID_HEIGHT, BOMB_RANGE, DESTRUCTIBLE_BLOCK_CHANCE,
+    EMPTY, WALL, BLOCK, HIDDEN_GATE, GATE,
+)
+
+
+class BitboardGrid:
+    # Masks that only depend on the board size, shared by every board of that size
+    _layout_cache = {}
+
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT):
+        """
+        Create an empty board.
+
+        Args:
+            width: Number of grid cells horizontally
+            height: Number of grid cells vertically
+        """
+        self.width = width
+        self.height = height
+        self.walls = 0
+        self.blocks = 0
+        self.hidden_gates = 0
+        self.gates = 0
+        self.full, self.not_left, self.not_right, self.fixed_walls, self.start_area, self.spawn_exclusion = \
+            self.layout(width, height)
+        self.empty = self.full   # Cells with nothing in them - where enemies may walk
+        self.walkable = self.full  # Cells the player may walk on (empty space or revealed gate)
+        self.codes = bytearray(width * height)  # Cell codes, y * width + x
+        view = memoryview(self.codes).toreadonly()
+        self.rows = [view[y * width:(y + 1) * width] for y in range(height)]  # Read-only row views
+
+    @classmethod
+    def layout(cls, width, height):
+        """
+        Compute (and cache) the size-dependent masks.
+
+        Returns:
+            Tuple of (all cells, cells with x > 0, cells with x < width - 1,
+            border and pillar walls, 3x3 start area, enemy spawn exclusion zone)
+        """
+        key = (width, height)
+        if key not in cls._layout_cache:
+            full = (1 << (width * height)) - 1
+            left_column = 0
+            for y in range(height):
+                left_column |= 1 << (y * width)
+            right_column = left_column << (width - 1)
+
+            # Borders plus every second cell, as in create_grid()
+            walls = 0
+            for y in range(height):
+                for x in range(width):
+                    border = x in (0, width - 1) or y in (0, height - 1)
+                    pillar = 2 <= x < width - 1 and 2 <= y < height - 1 and x % 2 == 0 and y % 2 == 0
+                    if border or pillar:
+                        walls |= 1 << (y * width + x)
+
+            start_area = 0
+            spawn_exclusion = 0
+            for y in range(height):
+                for x in range(width):
+                    if x <= 2 and y <= 2:
+                        start_area |= 1 << (y * width + x)
+                    if x <= 3 and y <= 3:
+                        spawn_exclusion |= 1 << (y * width + x)
+
+            cls._layout_cache[key] = (full, full & ~left_column, full & ~right_column,
+                                      walls, start_area, spawn_exclusion)
+        return cls._layout_cache[key]
+
+    # ===== CONSTRUCTION =====
+
+    @classmethod
+    def generate(cls, rng=random, width=GRID_WIDTH, height=GRID_HEIGHT, block_chance=DESTRUCTIBLE_BLOCK_CHANCE):
+        """
+        Create a new random level layout.
+
+        Draws the same random numbers in the same order as create_grid(), so a
+        seeded generator produces the same level with either backend.
+        """
+        grid = cls(width, height)
+        grid.walls = grid.fixed_walls
+
+        # Add destructible blocks randomly, keeping the starting area clear
+        blocked = grid.walls | grid.start_area
+        candidates = []
+        blocks = []
+        for y in range(1, height):
+            for x in range(1, width):
+                bit = 1 << (y * width + x)
+                if blocked & bit:
+                    continue
+                candidates.append(bit)
+                if rng.random() < block_chance:
+                    grid.blocks |= bit
+                    blocks.append(bit)
+
+        # Place a hidden gate under one of the destructible blocks (or under a
+        # new block on a board without any), picked from the same list as create_grid()
+        if not candidates:
+            raise ValueError("cannot place the gate: the board has no cell outside the start area")
+        bit = rng.choice(blocks or candidates)
+        grid.blocks &= ~bit
+        grid.hidden_gates |= bit
+        grid.refresh()
+        return grid
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build a bitboard grid from a grid[y][x] list of cell codes"""
+        grid = cls(len(rows[0]), len(rows))
+        for y, row in enumerate(rows):
+            for x, code in enumerate(row):
+                grid.set_cell(x, y, code)
+        return grid
+
+    def to_rows(self):
+        """Return the grid as a list of rows of cell codes"""
+        return [list(row) for row in self.rows]
+
+    def refresh(self):
+        """Rebuild the walkability masks and cell codes after writing the bitboards directly"""
+        self.empty = self.full & ~(self.walls | self.blocks | self.hidden_gates | self.gates)
+        self.walkable = self.empty | self.gates
+        codes = self.codes
+        codes[:] = bytes(len(codes))  # EMPTY
+        for mask, code in ((self.walls, WALL), (self.blocks, BLOCK),
+                           (self.hidden_gates, HIDDEN_GATE), (self.gates, GATE)):
+            while mask:
+                low = mask & -mask
+                codes[low.bit_length() - 1] = code
+                mask ^= low
+
+    # ===== CELL CODE VIEW =====
+
+    def bit(self, x, y):
+        return 1 << (y * self.width + x)
+
+    def cell(self, x, y):
+        """Cell code at a grid position"""
+        return self.codes[y * self.width + x]
+
+    def set_cell(self, x, y, code):
+        """Change the cell code at a grid position"""
+        index = y * self.width + x
+        bit = 1 << index
+        self.walls &= ~bit
+        self.blocks &= ~bit
+        self.hidden_gates &= ~bit
+        self.gates &= ~bit
+        self.empty &= ~bit
+        self.walkable &= ~bit
+        if code == WALL:
+            self.walls |= bit
+        elif code == BLOCK:
+            self.blocks |= bit
+        elif code == HIDDEN_GATE:
+            self.hidden_gates |= bit
+        elif code == GATE:
+            self.gates |= bit
+            self.walkable |= bit
+        else:
+            self.empty |= bit
+            self.walkable |= bit
+        self.codes[index] = code
+
+    def __getitem__(self, y):
+        """Row y as a read-only view of cell codes, so grid[y][x] keeps working for readers"""
+        return self.rows[y]
+
+    def __len__(self):
+        return self.height
+
+    def __iter__(self):
+        for y in range(self.height):
+            yield self[y]
+
+    def __eq__(self, other):
+        return [list(row) for row in self] == [list(row) for row in other]
+
+    # ===== MASKS =====
+
+    def empty_mask(self):
+        """Cells with nothing in them - where enemies may walk"""
+        return self.empty
+
+    def walkable_mask(self):
+        """Cells the player may walk on (empty space or revealed gate)"""
+        return self.walkable
+
+    def is_empty(self, x, y):
+        """True if (x, y) is on the board and enemies may walk there"""
+        return 0 <= x < self.width and 0 <= y < self.height and (self.empty >> (y * self.width + x)) & 1 == 1
+
+    def is_walkable(self, x, y):
+        """True if (x, y) is on the board and the player may walk there"""
+        return 0 <= x < self.width and 0 <= y < self.height and (self.walkable >> (y * self.width + x)) & 1 == 1
+
+    def cells(self, mask):
+        """List the (x, y) positions of the set bits in a mask"""
+        positions = []
+        while mask:
+            low = mask & -mask
+            index = low.bit_length() - 1
+            positions.append((index % self.width, index // self.width))
+            mask ^= low
+        return positions
+
+    # ===== EXPLOSIONS =====
+
+    def shift(self, ray, dx, dy):
+        """Move every bit in ray one cell in the given direction"""
+        if dx > 0:
+            return (ray << 1) & self.not_left
+        if dx < 0:
+            return (ray >> 1) & self.not_right
+        if dy > 0:
+            return (ray << self.width) & self.full
+        return ray >> self.width
+
+    def blast_mask(self, center_x, center_y, reach=BOMB_RANGE):
+        """Bitboard of the tiles reached by an explosion at the given position"""
+        return self.blast_rays(center_x, center_y, reach)[0]
+
+    def blast_rays(self, center_x, center_y, reach=BOMB_RANGE):
+        """
+        Propagate the four blast rays by shifting.
+
+        Returns:
+            Tuple of (mask of all reached tiles, list of (dx, dy, length) per ray)
+        """
+        origin = self.bit(center_x, center_y)
+        stoppers = self.blocks | self.hidden_gates
+        open_cells = ~self.walls
+        width = self.width
+        reached = origin
+        rays = []
+        # Each direction as (dx, dy, shift, mask): negative shifts move right,
+        # the mask drops bits that wrapped to the other edge or left the board
+        for dx, dy, step, keep in ((0, -1, width, open_cells), (0, 1, -width, self.full & open_cells),
+                                   (-1, 0, 1, self.not_right & open_cells), (1, 0, -1, self.not_left & open_cells)):
+            ray = origin
+            length = 0
+            while length < reach:
+                ray = (ray >> step if step > 0 else ray << -step) & keep
+                if not ray:
+                    break  # Out of bounds or hit an indestructible wall
+                reached |= ray
+                length += 1
+                if ray & stoppers:
+                    break  # The blast destroys the block but stops there
+            rays.append((dx, dy, length))
+        return reached, rays
+
+    def explosion_area(self, center_x, center_y, reach=BOMB_RANGE):
+        """
+        Tiles reached by an explosion at the given position.
+
+        Returns:
+            List of (x, y) grid positions, starting with the center tile and in
+            the same order as ListGrid.explosion_area
+        """
+        _, rays = self.blast_rays(center_x, center_y, reach)
+        affected_tiles = [(center_x, center_y)]
+        append = affected_tiles.append
+        for dx, dy, length in rays:
+            x, y = center_x, center_y
+            for _ in range(length):
+                x += dx
+                y += dy
+                append((x, y))
+        return affected_tiles
+
+    def destroy_blocks(self, tiles):
+        """
+        Destroy destructible blocks and reveal hidden gates on the given tiles.
+
+        Returns:
+            List of (x, y) grid positions whose cell code changed
+        """
+        mask = 0
+        for x, y in tiles:
+            mask |= self.bit(x, y)
+        changed = set(self.destroy_mask(mask))
+        # Report the cells in tile order, like ListGrid does
+        return [tile for tile in tiles if tile in changed]
+
+    def destroy_mask(self, mask):
+        """Mask version of destroy_blocks()"""
+        destroyed = self.blocks & mask
+        revealed = self.hidden_gates & mask
+        self.blocks &= ~destroyed
+        self.hidden_gates &= ~revealed
+        self.gates |= revealed
+        self.empty |= destroyed
+        self.walkable |= destroyed | revealed
+        changed = self.cells(destroyed | revealed)
+        width = self.width
+        for x, y in changed:
+            self.codes[y * width + x] = GATE if revealed >> (y * width + x) & 1 else EMPTY
+        return changed
+
+    # ===== FREE CELL SAMPLING =====
+
+    def spawn_mask(self):
+        """Empty cells away from the player start where enemies may spawn"""
+        return self.empty_mask() & ~self.spawn_exclusion
+
+    def find_enemy_position(self, rng=random):
+        """
+        Pick a random empty cell away from the player start.
+
+        Uses the same random draw as simulation.find_enemy_position(): one
+        choice from the free cells listed row by row.
+        """
+        candidates = self.cells(self.spawn_mask())
+        if not candidates:
+            raise ValueError("no free cell left for an enemy")
+        return rng.choice(candidates)
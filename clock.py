@@ -0,0 +1,98 @@
+"""
+Time sources for the simulation.
+
+Every timer in the game (bomb fuses, explosions, enemy moves, the death fade)
+reads the time through one of these clocks instead of calling time.time()
+directly. WallClock follows real time for the interactive game, while
+FixedStepClock advances by a constant step per tick so simulations can run
+faster than real time and reproduce exactly.
+
+The game draws frames at whatever rate the display allows, independent of
+the tick rate. StepAccumulator converts the real time between two frames
+into a whole number of fixed ticks and carries the remainder over, so a
+slow frame is caught up with extra ticks and a fast one may run none.
+"""
+import time
+
+MAX_CATCH_UP = 0.25  # Seconds of game time one frame may catch up on; anything beyond is dropped
+
+
+class WallClock:
+    """Clock that follows the real wall-clock time"""
+
+    def now(self):
+        """Current time in seconds"""
+        return time.time()
+
+    def advance(self):
+        """Called once per simulation tick - real time advances on its own"""
+        pass
+
+
+class FixedStepClock:
+    """Clock that advances by a fixed timestep every simulation tick"""
+
+    def __init__(self, dt=1 / 60, start=0.0):
+        """
+        Args:
+            dt: Seconds added on every tick
+            start: Time at which the clock starts
+        """
+        self.dt = dt
+        self.start = start
+        self.ticks = 0
+
+    def now(self):
+        """Current time in seconds"""
+        # Multiply instead of accumulating so long runs don't drift
+        return self.start + self.ticks * self.dt
+
+    def advance(self):
+        """Move the clock forward by one timestep"""
+        self.ticks += 1
+
+
+class StepAccumulator:
+    """Turns real time between frames into fixed simulation ticks"""
+
+    def __init__(self, dt=1 / 60, max_catch_up=MAX_CATCH_UP, timer=time.perf_counter):
+        """
+        Args:
+            dt: Seconds of game time per tick
+            max_catch_up: Most game time a single frame may run, so a long
+                stall (a dragged window, a breakpoint) does not trigger a
+                burst of ticks that makes the next frame slow as well
+            timer: Function returning the current time in seconds
+        """
+        self.dt = dt
+        self.max_steps = max(1, int(max_catch_up / dt))
+        self.timer = timer
+        self.last = None
+        self.accumulator = 0.0  # Real time not yet turned into ticks
+        self.dropped = 0        # Ticks skipped because a frame took too long
+
+    def steps(self):
+        """
+        Number of ticks to run this frame (call once per frame).
+
+        The first call only starts the count and returns 0.
+        """
+        now = self.timer()
+        if self.last is None:
+            self.last = now
+            return 0
+        self.accumulator += now - self.last
+        self.last = now
+        steps = int(self.accumulator / self.dt)
+        if steps > self.max_steps:
+            self.dropped += steps - self.max_steps
+            steps = self.max_steps
+            self.accumulator = self.accumulator % self.dt
+        else:
+            self.accumulator -= steps * self.dt
+        return steps
+
+    @property
+    def alpha(self):
+        """How far real time is past the last tick, as a fraction of a tick (0 to 1)"""
+        return min(1.0, self.accumulator / self.dt)
@@ -0,0 +1,105 @@
+"""
+Danger map of pending blasts.
+
+Every armed bomb will hit a known set of tiles at a known time, but the
+game only worked those tiles out when the bomb went off, and the bots
+recomputed the blast area of every bomb on the board for every move they
+considered. DangerMap keeps, for each tile, the earliest time a pending
+bomb will hit it. A bomb's tiles are added when it is placed and removed
+when it explodes. When a block is destroyed, only the bombs whose rays
+stopped at that block are recomputed, since their rays now reach further.
+
+Blast areas are also cached per center tile, so asking "what would a bomb
+here hit?" for many candidate tiles costs one dictionary lookup after the
+first time. Clearing a block drops only the cached areas of the centers on
+its row and column within reach.
+"""
+
+
+class DangerMap:
+    def __init__(self, grid, reach):
+        """
+        Args:
+            grid: The level grid (any grid with explosion_area())
+            reach: Number of tiles an explosion reaches in each direction
+        """
+        self.grid = grid
+        self.reach = reach
+        self.areas = {}     # (x, y) -> tiles a bomb there would hit, for the current grid
+        self.pending = {}   # bomb -> (blast time, tiles it will hit)
+        self.hits = {}      # (x, y) -> {bomb: blast time} for every pending bomb hitting it
+        self.earliest = {}  # (x, y) -> earliest blast time of the pending bombs hitting it
+
+    def area(self, x, y):
+        """Tiles an explosion at (x, y) would hit on the current grid (cached)"""
+        tiles = self.areas.get((x, y))
+        if tiles is None:
+            tiles = self.areas[(x, y)] = tuple(self.grid.explosion_area(x, y, self.reach))
+        return tiles
+
+    def add(self, bomb, x, y, blast_time, tiles=None):
+        """
+        Register a bomb at (x, y) that will explode at blast_time.
+
+        Args:
+            tiles: The bomb's blast tiles if already known (e.g. from a saved state)
+        """
+        if tiles is None:
+            tiles = self.area(x, y)
+        self.pending[bomb] = (blast_time, tiles)
+        for tile in tiles:
+            self.hits.setdefault(tile, {})[bomb] = blast_time
+            if blast_time < self.earliest.get(tile, blast_time + 1):
+                self.earliest[tile] = blast_time
+
+    def remove(self, bomb):
+        """Forget a bomb (it exploded); does nothing if it was never added"""
+        entry = self.pending.pop(bomb, None)
+        if entry is None:
+            return
+        for tile in entry[1]:
+            bombs = self.hits[tile]
+            del bombs[bomb]
+            if bombs:
+                self.earliest[tile] = min(bombs.values())
+            else:
+                del self.hits[tile]
+                del self.earliest[tile]
+
+    def cell_cleared(self, x, y):
+        """
+        Update the map after the cell at (x, y) stopped blocking blasts.
+
+        Cached areas of centers on the same row or column within reach are
+        dropped, and the pending bombs whose rays ended on this cell get their
+        tiles recomputed.
+        """
+        for d in range(-self.reach, self.reach + 1):
+            self.areas.pop((x + d, y), None)
+            self.areas.pop((x, y + d), None)
+        for bomb in list(self.hits.get((x, y), ())):
+            blast_time, tiles = self.pending[bomb]
+            self.remove(bomb)
+            self.add(bomb, *tiles[0], blast_time)  # The first tile is the bomb's own
+
+    def blast_time(self, x, y):
+        """Earliest time a pending bomb hits (x, y), or None if none will"""
+        return self.earliest.get((x, y))
+
+    def is_safe(self, x, y, until=None):
+        """
+        True if no pending bomb hits (x, y), or none before the given time.
+
+        Args:
+            until: Only count blasts earlier than this time (None counts all)
+        """
+        blast_time = self.earliest.get((x, y))
+        return blast_time is None or (until is not None and blast_time >= until)
+
+    def safe_cells(self, cells, until=None):
+        """The given cells that no pending bomb hits (before until, if given)"""
+        return [cell for cell in cells if self.is_safe(*cell, until)]
+
+    def tiles(self):
+        """Tiles some pending bomb will hit (a live view, do not modify)"""
+        return self.earliest.keys()
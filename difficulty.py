@@ -0,0 +1,250 @@
+"""
+Level difficulty estimator.
+
+Generates many levels with the same grid generation and enemy placement the
+game uses, plays each one headless with a scripted policy and reports how
+hard they are: how many are solvable, how long reaching the gate takes, how
+often and how the bot dies and how many blocks get destroyed. Levels are
+spread over a ProcessPoolExecutor and results are printed as they complete.
+Every level gets its own seed derived from the base seed, so a run gives the
+same numbers no matter how many workers it uses.
+
+Usage:
+    python difficulty.py --levels 5000 --workers 8 --block-chance 0.3 --level 2
+"""
+import argparse
+import os
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from clock import FixedStepClock
+from simulation import (
+    Simulation, DIRECTIONS, EMPTY, GATE,
+    ACTION_LEFT, ACTION_RIGHT, ACTION_UP, ACTION_DOWN, ACTION_BOMB, ACTION_ENTER_GATE,
+    EVENT_BOMB_PLACED, EVENT_CELLS_CHANGED, EVENT_ENEMY_KILLED, EVENT_PLAYER_KILLED,
+    EVENT_LEVEL_COMPLETE,
+)
+
+FPS = 60             # Simulation ticks per second of game time
+MAX_SECONDS = 180    # Game time after which a level counts as not solved
+LEVELS_PER_TASK = 25  # Levels played per worker task
+
+# Outcomes of a played level
+OUTCOME_SOLVED = 'solved'
+OUTCOME_TIMEOUT = 'timeout'
+
+# Movement action for each (dx, dy) step
+STEP_ACTIONS = {(0, -1): ACTION_UP, (0, 1): ACTION_DOWN, (-1, 0): ACTION_LEFT, (1, 0): ACTION_RIGHT}
+
+
+class ScriptedPolicy:
+    """
+    Simple bomb-and-hide bot.
+
+    It keeps one bomb on the board at a time: walk next to a block or an
+    enemy, drop a bomb if there is a safe tile to run to, hide until the
+    explosion is over, and walk onto the gate once every enemy is dead.
+    """
+
+    def __init__(self, sim):
+        self.sim = sim
+
+    def passable(self, x, y, enemy_tiles):
+        return self.sim.grid.cell(x, y) in (EMPTY, GATE) and (x, y) not in enemy_tiles
+
+    def danger_tiles(self):
+        """Tiles that an armed bomb will hit (kept up to date by the simulation)"""
+        return self.sim.danger.tiles()
+
+    def find_path(self, start, is_goal, enemy_tiles):
+        """
+        Breadth-first search over passable tiles.
+
+        Returns:
+            The first (dx, dy) step towards the nearest goal tile, (0, 0) if the
+            start is a goal, or None if no goal is reachable
+        """
+        if is_goal(start):
+            return (0, 0)
+        first_step = {start: None}
+        queue = deque([start])
+        while queue:
+            x, y = queue.popleft()
+            for dx, dy in DIRECTIONS:
+                neighbour = (x + dx, y + dy)
+                if neighbour in first_step or not self.passable(*neighbour, enemy_tiles):
+                    continue
+                first_step[neighbour] = first_step[(x, y)] or (dx, dy)
+                if is_goal(neighbour):
+                    return first_step[neighbour]
+                queue.append(neighbour)
+        return None
+
+    def good_bomb_spot(self, tile, enemy_tiles):
+        """A bomb here hits a block or an enemy"""
+        grid = self.sim.grid
+        for x, y in self.sim.danger.area(*tile):
+            if grid.cell(x, y) not in (EMPTY, GATE) or (x, y) in enemy_tiles:
+                return True
+        return False
+
+    def has_escape(self, tile, enemy_tiles):
+        """There is a reachable tile outside the blast of a bomb placed here"""
+        danger = self.sim.danger
+        blast = danger.area(*tile)
+        return self.find_path(tile, lambda t: t not in blast and danger.is_safe(*t), enemy_tiles) is not None
+
+    def act(self):
+        """Choose the action bitmask for the current tick"""
+        sim = self.sim
+        player = sim.player
+        if player.moving or player.is_dead:
+            return 0
+
+        position = player.get_grid_position()
+        enemy_tiles = {(enemy.grid_x, enemy.grid_y) for enemy in sim.enemies}
+        danger = self.danger_tiles()
+
+        if position in danger:
+            # Run for cover
+            step = self.find_path(position, lambda t: t not in danger, enemy_tiles)
+        elif danger:
+            # Wait for our bomb to go off
+            step = (0, 0)
+        elif sim.gate_found:
+            return ACTION_ENTER_GATE
+        elif not sim.enemies and any(GATE in row for row in sim.grid):
+            step = self.find_path(position, lambda t: sim.grid.cell(*t) == GATE, enemy_tiles)
+        else:
+            step = self.find_path(
+                position,
+                lambda t: self.good_bomb_spot(t, enemy_tiles) and self.has_escape(t, enemy_tiles),
+                enemy_tiles)
+            if step == (0, 0):
+                return ACTION_BOMB if player.can_place_bomb else 0
+
+        if step is None or step == (0, 0):
+            return 0
+        return STEP_ACTIONS[step]
+
+
+def play_level(seed, level=1, block_chance=None, max_seconds=MAX_SECONDS):
+    """
+    Generate one level and play it with the scripted policy.
+
+    Returns:
+        Dictionary with the seed, outcome (solved, timeout or the cause of
+        death), game time in seconds and counts of destroyed blocks, killed
+        enemies and placed bombs
+    """
+    clock = FixedStepClock(dt=1 / FPS)
+    sim = Simulation(level=level, clock=clock, seed=seed, block_chance=block_chance)
+    sim.reset()
+    policy = ScriptedPolicy(sim)
+
+    result = {'seed': seed, 'level': level, 'outcome': OUTCOME_TIMEOUT, 'time': max_seconds,
+              'blocks_destroyed': 0, 'enemies_killed': 0, 'bombs_placed': 0,
+              'enemies': len(sim.enemies)}
+    for _ in range(int(max_seconds * FPS)):
+        for kind, data in sim.step(policy.act()):
+            if kind == EVENT_CELLS_CHANGED:
+                result['blocks_destroyed'] += len(data)
+            elif kind == EVENT_ENEMY_KILLED:
+                result['enemies_killed'] += 1
+            elif kind == EVENT_BOMB_PLACED:
+                result['bombs_placed'] += 1
+            elif kind == EVENT_PLAYER_KILLED:
+                result['outcome'] = data
+            elif kind == EVENT_LEVEL_COMPLETE:
+                result['outcome'] = OUTCOME_SOLVED
+        if sim.game_over or sim.level_complete:
+            result['time'] = sim.now()
+            break
+    return result
+
+
+def play_levels(seeds, level, block_chance, max_seconds):
+    """Worker task: play a batch of levels"""
+    return [play_level(seed, level, block_chance, max_seconds) for seed in seeds]
+
+
+def level_seeds(base_seed, count):
+    """Independent per-level seeds derived from the base seed"""
+    return [f"{base_seed}:{i}" for i in range(count)]
+
+
+def estimate(levels, workers=None, base_seed=0, level=1, block_chance=None,
+             max_seconds=MAX_SECONDS, levels_per_task=LEVELS_PER_TASK):
+    """
+    Play levels across a process pool.
+
+    Yields:
+        Result dictionaries from play_level() as soon as each batch completes
+    """
+    seeds = level_seeds(base_seed, levels)
+    batches = [seeds[i:i + levels_per_task] for i in range(0, len(seeds), levels_per_task)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(play_levels, batch, level, block_chance, max_seconds) for batch in batches]
+        for future in as_completed(futures):
+            yield from future.result()
+
+
+class Summary:
+    """Running statistics over played levels"""
+
+    def __init__(self):
+        self.count = 0
+        self.outcomes = Counter()
+        self.solve_times = []
+        self.blocks_destroyed = 0
+
+    def add(self, result):
+        self.count += 1
+        self.outcomes[result['outcome']] += 1
+        self.blocks_destroyed += result['blocks_destroyed']
+        if result['outcome'] == OUTCOME_SOLVED:
+            self.solve_times.append(result['time'])
+
+    def report(self):
+        lines = [f"levels played:        {self.count}"]
+        if not self.count:
+            return "\n".join(lines)
+        solved = self.outcomes[OUTCOME_SOLVED]
+        lines.append(f"solvable:             {solved / self.count:.1%}")
+        if self.solve_times:
+            times = sorted(self.solve_times)
+            lines.append(f"time to gate:         mean {sum(times) / len(times):.1f}s, "
+                         f"median {times[len(times) // 2]:.1f}s")
+        for outcome in sorted(self.outcomes):
+            if outcome != OUTCOME_SOLVED:
+                lines.append(f"{outcome + ':':<22}{self.outcomes[outcome] / self.count:.1%}")
+        lines.append(f"blocks destroyed:     {self.blocks_destroyed / self.count:.1f} per level")
+        return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Estimate level difficulty by playing generated levels")
+    parser.add_argument('--levels', type=int, default=1000, help="number of levels to generate")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument('--seed', default=0, help="base seed; every level derives its own from it")
+    parser.add_argument('--level', type=int, default=1, help="level number (controls the enemy count)")
+    parser.add_argument('--block-chance', type=float, default=None,
+                        help="chance of a destructible block per free cell (default DESTRUCTIBLE_BLOCK_CHANCE)")
+    parser.add_argument('--max-seconds', type=float, default=MAX_SECONDS,
+                        help="game time before a level counts as a timeout")
+    parser.add_argument('--progress', type=int, default=100, help="print a summary every N levels")
+    args = parser.parse_args()
+
+    summary = Summary()
+    for result in estimate(args.levels, args.workers, args.seed, args.level,
+                           args.block_chance, args.max_seconds):
+        summary.add(result)
+        if args.progress and summary.count % args.progress == 0 and summary.count < args.levels:
+            print(f"--- {summary.count}/{args.levels} ---")
+            print(summary.report())
+    print("=== final ===")
+    print(summary.report())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Struct-of-arrays storage for enemies and bombs.
+
+Each entity used to be a regular object with its own attribute dict, a copy
+of the direction list and pixel coordinates kept next to the grid ones. On
+stress maps with thousands of enemies that is most of the memory and a good
+part of the per-entity cost. EntityStore keeps every numeric field in a
+typed array instead (one array per field, one row per entity), and the
+Enemy and Bomb classes in simulation.py become thin __slots__ facades whose
+properties read and write their row. References to other objects (timers,
+the occupancy index, blast tile lists) stay in facade slots.
+
+Rows are packed: removing an entity moves the last row into its place
+(swap-remove), so removal is O(number of fields) wherever the entity sits.
+The facade is the stable handle of its entity - the store updates the row
+of the facade it moved - and callers never see row numbers. A removed
+entity's last values move to the store's graveyard, a second store shared
+by every entity removed from it, so events that mention the entity stay
+readable after it left the board. The graveyard lives as long as its store
+(the simulation starts fresh stores on every level).
+"""
+from array import array
+
+
+class EntityStore:
+    def __init__(self, fields):
+        """
+        Args:
+            fields: Sequence of (name, array typecode) pairs, e.g. ('grid_x', 'i')
+        """
+        self.fields = tuple(fields)
+        self.columns = {name: array(typecode) for name, typecode in self.fields}
+        self.column_list = tuple(self.columns.values())  # Columns in field order
+        self.owners = []  # Facade of each row
+        self.graveyard = None  # Store of the removed facades' last values, created on the first removal
+
+    def __len__(self):
+        return len(self.owners)
+
+    def add(self, owner, values):
+        """
+        Append a row for a facade.
+
+        Args:
+            owner: Facade object with `store` and `row` slots
+            values: Mapping of field name to initial value (every field)
+        """
+        owner.store = self
+        owner.row = len(self.owners)
+        self.owners.append(owner)
+        for name, column in self.columns.items():
+            column.append(values[name])
+
+    def values(self, owner):
+        """Field values of a facade's row as a dict"""
+        return {name: column[owner.row] for name, column in self.columns.items()}
+
+    def row_values(self, owner):
+        """Field values of a facade's row as a tuple, in field order"""
+        row = owner.row
+        return tuple([column[row] for column in self.column_list])
+
+    def remove(self, owner):
+        """
+        Swap-remove a facade's row; the facade keeps its values in the graveyard.
+
+        Does nothing if the facade is not in this store.
+        """
+        row = owner.row
+        if owner.store is not self or row >= len(self.owners) or self.owners[row] is not owner:
+            return
+        graveyard = self.graveyard
+        if graveyard is None:
+            graveyard = self.graveyard = EntityStore(self.fields)
+        last = self.owners.pop()
+        for column, buried in zip(self.column_list, graveyard.column_list):
+            buried.append(column[row])
+            tail = column.pop()
+            if last is not owner:
+                column[row] = tail
+        if last is not owner:
+            self.owners[row] = last
+            last.row = row
+        owner.store = graveyard
+        owner.row = len(graveyard.owners)
+        graveyard.owners.append(owner)
+
+    def nbytes(self):
+        """Bytes held by the field arrays of the live rows"""
+        return sum(column.itemsize * len(column) for column in self.columns.values())
+
+
+def field(name):
+    """Property reading and writing one numeric field of a facade's row"""
+    def get(self):
+        return self.store.columns[name][self.row]
+
+    def set(self, value):
+        self.store.columns[name][self.row] = value
+    return property(get, set)
+
+
+def flag(name):
+    """Like field(), for a field holding a bool (stored as 0 or 1)"""
+    def get(self):
+        return self.store.columns[name][self.row] != 0
+
+    def set(self, value):
+        self.store.columns[name][self.row] = bool(value)
+    return property(get, set)
@@ -0,0 +1,87 @@
+"""
+Shared distance field for enemy pursuit.
+
+Instead of every enemy searching for a path to the player, one breadth-first
+search from the player's cell records how many steps each nearby tile is
+from the player. An enemy then only has to look at its four neighbours and
+step to the one closest to the player. The field is recomputed when the
+player reaches a new cell and patched in place when an explosion clears a
+block, which can only make tiles closer, never further away.
+
+The search stops max_distance steps from the player, so enemies only chase
+a player they are close to and the cost of a recompute does not grow with
+the map size.
+"""
+from collections import deque
+
+PURSUIT_RANGE = 10  # Enemies within this many steps of the player chase it
+DIRECTIONS = ((0, -1), (0, 1), (-1, 0), (1, 0))  # Same order as simulation.DIRECTIONS
+
+
+class FlowField:
+    def __init__(self, walkable, max_distance=PURSUIT_RANGE):
+        """
+        Args:
+            walkable: Function (x, y) -> True if the chasers may walk on that cell
+            max_distance: Steps from the target beyond which tiles are left out
+        """
+        self.walkable = walkable
+        self.max_distance = max_distance
+        self.target = None
+        self.distance = {}  # (x, y) -> steps to the target over walkable tiles
+
+    def set_target(self, x, y):
+        """Recompute the field for a new target cell (does nothing if it did not move)"""
+        if (x, y) == self.target:
+            return
+        self.target = (x, y)
+        self.distance = {(x, y): 0}
+        self.spread(deque([(x, y)]))
+
+    def spread(self, queue):
+        """Breadth-first relaxation from the queued cells, only ever lowering distances"""
+        distance = self.distance
+        max_distance = self.max_distance
+        while queue:
+            x, y = queue.popleft()
+            next_distance = distance[(x, y)] + 1
+            if next_distance > max_distance:
+                continue
+            for dx, dy in DIRECTIONS:
+                neighbour = (x + dx, y + dy)
+                if distance.get(neighbour, max_distance + 1) > next_distance and self.walkable(*neighbour):
+                    distance[neighbour] = next_distance
+                    queue.append(neighbour)
+
+    def cell_cleared(self, x, y):
+        """
+        Patch the field after a cell became walkable (e.g. a destroyed block).
+
+        Only tiles that are now closer to the target change, so the search
+        starts at the cleared cell and stops as soon as nothing improves.
+        """
+        if self.target is None or not self.walkable(x, y):
+            return
+        best = min((self.distance.get((x + dx, y + dy)) for dx, dy in DIRECTIONS
+                    if (x + dx, y + dy) in self.distance), default=None)
+        if best is None or best + 1 > self.max_distance:
+            return
+        if self.distance.get((x, y), self.max_distance + 1) > best + 1:
+            self.distance[(x, y)] = best + 1
+            self.spread(deque([(x, y)]))
+
+    def next_step(self, x, y):
+        """
+        Neighbour of (x, y) that is one step closer to the target.
+
+        Returns:
+            (x, y) of that neighbour, or None if (x, y) is out of range or on the target
+        """
+        current = self.distance.get((x, y))
+        if not current:
+            return None
+        for dx, dy in DIRECTIONS:
+            neighbour = (x + dx, y + dy)
+            if self.distance.get(neighbour) == current - 1:
+                return neighbour
+        return None
@@ -0,0 +1,435 @@
+"""
+Snapshots of the full game state for tree search.
+
+Search algorithms like MCTS or expectimax clone a game, try a move, and go
+back - millions of times. snapshot() copies everything a Simulation needs
+to carry on into a GameState made of plain tuples: the grid rows, the
+players, enemies and bombs, the scheduled events, the clock and the state of
+the random streams. restore() puts it back. Both are O(size of the state),
+and nothing derived is copied: the occupancy indexes, the danger map and
+the pursuit field are rebuilt from the restored entities.
+
+Grid rows are stored as immutable bytes. With FlatGrid as the grid backend
+the simulation keeps its rows as bytes too, and a write replaces only the
+row it touches, so a snapshot shares every row with the live grid and
+taking or restoring one copies row references instead of cells. The first
+snapshot of a level turns a default ListGrid into a FlatGrid in place, so
+the default backend gets the same sharing after one copy per level.
+
+GameState.to_bytes() packs a state with struct into a compact binary form
+that from_bytes() turns back into an identical GameState.
+
+Usage:
+    sim = Simulation(clock=FixedStepClock(), seed=1, grid_factory=FlatGrid.generate)
+    sim.reset()
+    state = snapshot(sim)
+    ...                    # try some moves
+    restore(sim, state)    # and go back
+"""
+import heapq
+import random
+import struct
+
+from danger import DangerMap
+from entities import EntityStore
+from flowfield import FlowField
+from scheduler import Timer
+from simulation import (
+    ListGrid, Player, Enemy, Bomb, create_grid, ENEMY_FIELDS, BOMB_FIELDS, DESTRUCTIBLE_BLOCK_CHANCE,
+    GRID_WIDTH, GRID_HEIGHT, BOMB_RANGE, BOMB_TIMER, EMPTY, BLOCK, HIDDEN_GATE, GATE,
+    TIMER_FUSE, TIMER_EXPLOSION_OVER, TIMER_ENEMY_MOVE, TIMER_ENEMY_ANIMATION,
+)
+
+STATE_MAGIC = b'BMST'
+STATE_VERSION = 3
+
+# Values stored by index instead of by name
+DIRECTION_NAMES = ('up', 'down', 'left', 'right')
+BOMB_TIMER_KINDS = (TIMER_FUSE, TIMER_EXPLOSION_OVER)
+
+# Type codes for the numbers in a record (two bits each) and the struct
+# format each is stored in, eight bytes either way
+TYPE_FLOAT, TYPE_INT, TYPE_BOOL, TYPE_NONE = range(4)
+TYPE_FORMATS = ('d', 'q', 'q', 'q')
+MAX_RECORD_VALUES = 32  # Type bits of a record fit in one 64-bit field
+
+HEADER = struct.Struct('<4sBHHBHHH')  # Magic, version, width, height, players, enemies, bombs, RNG streams
+COUNT = struct.Struct('<H')
+TILE = struct.Struct('<HH')
+RNG_STATE = struct.Struct('<B625I')  # Mersenne Twister version and key (gauss_next is a record)
+
+
+class FlatGrid(ListGrid):
+    """
+    Grid stored as a list of immutable bytes rows, indexed as grid[y][x].
+
+    Reading works like ListGrid. Writing a cell builds a new bytes object for
+    that one row, so any snapshot holding the old row keeps seeing the old
+    cells (copy-on-write per row) and snapshots never have to copy cells.
+    """
+
+    @classmethod
+    def generate(cls, rng=random, width=GRID_WIDTH, height=GRID_HEIGHT, block_chance=DESTRUCTIBLE_BLOCK_CHANCE):
+        """Create a new random level layout (same layout as ListGrid for the same seed)"""
+        return cls(bytes(row) for row in create_grid(rng, width, height, block_chance))
+
+    def set_cell(self, x, y, code):
+        row = bytearray(self[y])
+        row[x] = code
+        self[y] = bytes(row)
+
+    def destroy_blocks(self, tiles):
+        """
+        Destroy destructible blocks and reveal hidden gates on the given tiles.
+
+        Returns:
+            List of (x, y) grid positions whose cell code changed
+        """
+        changed = []
+        for x, y in tiles:
+            if self[y][x] == BLOCK:
+                self.set_cell(x, y, EMPTY)
+                changed.append((x, y))
+            elif self[y][x] == HIDDEN_GATE:
+                self.set_cell(x, y, GATE)
+                changed.append((x, y))
+        return changed
+
+
+def share_rows(grid):
+    """
+    Turn a plain ListGrid into a FlatGrid in place.
+
+    The grid keeps its identity, so everything holding a reference to it
+    (the danger map, a renderer) sees the change. Its rows become bytes once,
+    and every later snapshot shares them instead of copying the cells.
+    """
+    grid[:] = [bytes(row) for row in grid]
+    grid.__class__ = FlatGrid
+
+
+class GameState:
+    """Everything a Simulation needs to carry on, as plain tuples"""
+
+    def __init__(self, rows, scalars, players, enemies, index_order, bombs, rng_states):
+        """
+        Args:
+            rows: Tuple of bytes grid rows
+            scalars: (level, tick, game over, game over time, gate found,
+                level complete, clock ticks, scheduler sequence number)
+            players: Tuple of player records (see player_record()) in sim.players order
+            enemies: Tuple of enemy records in sim.enemies order
+            index_order: Enemy numbers in the order the occupancy index lists them
+            bombs: Tuple of (bomb record, affected tiles, changed cells, pending
+                blast tiles) - the last one saves recomputing the danger map
+            rng_states: Random.getstate() of every random stream (empty if not captured)
+        """
+        self.rows = rows
+        self.scalars = scalars
+        self.players = players
+        self.enemies = enemies
+        self.index_order = index_order
+        self.bombs = bombs
+        self.rng_states = rng_states
+
+    def __eq__(self, other):
+        return isinstance(other, GameState) and self.fields() == other.fields()
+
+    def fields(self):
+        return (self.rows, self.scalars, self.players, self.enemies, self.index_order,
+                self.bombs, self.rng_states)
+
+    # ===== SERIALIZATION =====
+
+    def to_bytes(self):
+        """Pack the state into a compact binary form"""
+        height = len(self.rows)
+        width = len(self.rows[0]) if height else 0
+        out = bytearray(HEADER.pack(STATE_MAGIC, STATE_VERSION, width, height, len(self.players),
+                                    len(self.enemies), len(self.bombs), len(self.rng_states)))
+        out += b''.join(self.rows)
+        pack_record(out, self.scalars)
+        for player in self.players:
+            pack_record(out, player)
+        for enemy in self.enemies:
+            pack_record(out, enemy)
+        out += struct.pack(f'<{len(self.index_order)}H', *self.index_order)
+        for record, *tile_lists in self.bombs:
+            pack_record(out, record)
+            for tiles in tile_lists:
+                pack_tiles(out, tiles)
+        for version, key, gauss_next in self.rng_states:
+            out += RNG_STATE.pack(version, *key)
+            pack_record(out, (gauss_next,))
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Unpack a state written by to_bytes().
+
+        Raises:
+            ValueError: If the data is not a game state of this version
+        """
+        if len(data) < HEADER.size:
+            raise ValueError("not a game state: too short")
+        magic, version, width, height, player_count, enemy_count, bomb_count, rng_count = HEADER.unpack_from(data)
+        if magic != STATE_MAGIC or version != STATE_VERSION:
+            raise ValueError("not a game state or an unsupported version")
+        offset = HEADER.size
+        rows = tuple(bytes(data[offset + y * width:offset + (y + 1) * width]) for y in range(height))
+        offset += width * height
+        scalars, offset = unpack_record(data, offset)
+        players = []
+        for _ in range(player_count):
+            player, offset = unpack_record(data, offset)
+            players.append(player)
+        enemies = []
+        for _ in range(enemy_count):
+            enemy, offset = unpack_record(data, offset)
+            enemies.append(enemy)
+        index_order = struct.unpack_from(f'<{enemy_count}H', data, offset)
+        offset += 2 * enemy_count
+        bombs = []
+        for _ in range(bomb_count):
+            record, offset = unpack_record(data, offset)
+            affected, offset = unpack_tiles(data, offset)
+            changed, offset = unpack_tiles(data, offset)
+            blast, offset = unpack_tiles(data, offset)
+            bombs.append((record, affected, changed, blast))
+        rng_states = []
+        for _ in range(rng_count):
+            version, *key = RNG_STATE.unpack_from(data, offset)
+            gauss_next, offset = unpack_record(data, offset + RNG_STATE.size)
+            rng_states.append((version, tuple(key), gauss_next[0]))
+        return cls(rows, scalars, tuple(players), tuple(enemies), index_order, tuple(bombs), tuple(rng_states))
+
+
+def pack_record(out, values):
+    """
+    Append a tuple of numbers: a count, two type bits per value and the
+    values (floats as doubles, the rest as 64-bit ints), so ints, floats,
+    bools and None come back as they were.
+
+    Raises:
+        ValueError: If there are more than MAX_RECORD_VALUES values
+    """
+    count = len(values)
+    if count > MAX_RECORD_VALUES:
+        raise ValueError(f"a record holds at most {MAX_RECORD_VALUES} values, not {count}")
+    types = 0
+    formats = []
+    for i, value in enumerate(values):
+        if value is None:
+            code = TYPE_NONE
+        elif value is True or value is False:
+            code = TYPE_BOOL
+        elif isinstance(value, int):
+            code = TYPE_INT
+        else:
+            code = TYPE_FLOAT
+        types |= code << (2 * i)
+        formats.append(TYPE_FORMATS[code])
+    out += struct.pack(f"<BQ{''.join(formats)}", count, types, *(0 if value is None else value for value in values))
+
+
+def unpack_record(data, offset):
+    """
+    Read a tuple written by pack_record().
+
+    Returns:
+        Tuple of (values, offset after them)
+    """
+    count, types = struct.unpack_from('<BQ', data, offset)
+    offset += 9
+    codes = [(types >> (2 * i)) & 3 for i in range(count)]
+    raw = struct.unpack_from('<' + ''.join(TYPE_FORMATS[code] for code in codes), data, offset)
+    values = []
+    for code, value in zip(codes, raw):
+        if code == TYPE_BOOL:
+            value = bool(value)
+        elif code == TYPE_NONE:
+            value = None
+        values.append(value)
+    return tuple(values), offset + 8 * count
+
+
+def pack_tiles(out, tiles):
+    out += COUNT.pack(len(tiles))
+    for tile in tiles:
+        out += TILE.pack(*tile)
+
+
+def unpack_tiles(data, offset):
+    (count,) = COUNT.unpack_from(data, offset)
+    offset += COUNT.size
+    tiles = tuple(TILE.unpack_from(data, offset + i * TILE.size) for i in range(count))
+    return tiles, offset + count * TILE.size
+
+
+# ===== SNAPSHOT =====
+
+def timer_fields(timer):
+    """(time, sequence number) of a pending timer, or (None, None)"""
+    if timer is None or timer.cancelled:
+        return None, None
+    return timer.time, timer.seq
+
+
+def player_record(player):
+    return (player.x, player.y, player.vel, player.can_place_bomb, DIRECTION_NAMES.index(player.direction),
+            player.grid_x, player.grid_y, player.target_x, player.target_y, player.moving,
+            player.is_dead, player.death_time)
+
+
+def enemy_record(enemy):
+    # The store row is (grid_x, grid_y, last_move_time, sprite_index, animation_frame,
+    # animation_speed, last_animation_time), see ENEMY_FIELDS
+    return (*enemy.store.row_values(enemy), *timer_fields(enemy.move_timer), *timer_fields(enemy.animation_timer))
+
+
+def bomb_record(bomb):
+    timer_time, timer_seq = timer_fields(bomb.timer)
+    kind = BOMB_TIMER_KINDS.index(bomb.timer.kind) if timer_time is not None else None
+    # The store row is (grid_x, grid_y, placed_time, exploded, explosion_time,
+    # explosion_frames), see BOMB_FIELDS
+    return (*bomb.store.row_values(bomb), kind, timer_time, timer_seq)
+
+
+def snapshot(sim, include_rng=True):
+    """
+    Capture the full state of a simulation.
+
+    Args:
+        sim: Simulation to capture
+        include_rng: Also capture the random streams. Copying them is most of
+            the cost of a snapshot; searches that treat enemy moves as chance
+            nodes can leave them out, and restore() then keeps the current streams
+
+    Raises:
+        ValueError: If the simulation's clock has no tick count (use a
+            FixedStepClock) or it pre-generates levels on a worker thread
+    """
+    if not hasattr(sim.clock, 'ticks'):
+        raise ValueError("snapshots need a simulation with a FixedStepClock")
+    if sim.levels.thread is not None:
+        raise ValueError("snapshots need a simulation created with pregenerate=False")
+
+    grid = sim.grid
+    if type(grid) is ListGrid:
+        share_rows(grid)  # Once per level; from then on snapshots share the rows
+    rows = tuple(grid) if isinstance(grid, FlatGrid) else tuple(bytes(row) for row in grid)
+    scalars = (sim.level, sim.tick, sim.game_over, sim.game_over_time, sim.gate_found,
+               sim.level_complete, sim.clock.ticks, sim.scheduler.seq)
+    numbers = {id(enemy): i for i, enemy in enumerate(sim.enemies)}
+    index_order = tuple(numbers[id(enemy)] for entities in sim.enemy_index.cells.values() for enemy in entities)
+    pending = sim.danger.pending
+    bombs = tuple((bomb_record(bomb), tuple(bomb.affected_tiles), tuple(bomb.changed_cells),
+                   pending[bomb][1] if bomb in pending else ())
+                  for bomb in sim.bombs)
+    rng_states = tuple(getattr(sim.rng, name).getstate() for name in sim.rng.NAMES) if include_rng else ()
+    return GameState(rows, scalars, tuple(player_record(player) for player in sim.players),
+                     tuple(enemy_record(enemy) for enemy in sim.enemies), index_order, bombs, rng_states)
+
+
+# ===== RESTORE =====
+
+def restore_grid(sim, rows):
+    """Put the rows back, in place for list-based grids"""
+    grid = sim.grid
+    if grid is None:
+        # A fresh simulation: build a grid of the class its factory makes
+        grid_class = getattr(sim.grid_factory, '__self__', ListGrid)
+        if issubclass(grid_class, FlatGrid):
+            sim.grid = grid_class(rows)
+        elif issubclass(grid_class, ListGrid):
+            sim.grid = grid_class(list(row) for row in rows)
+        else:
+            sim.grid = grid_class.from_rows(rows)
+    elif isinstance(grid, FlatGrid):
+        grid[:] = rows
+    elif isinstance(grid, ListGrid):
+        grid[:] = [list(row) for row in rows]
+    else:
+        sim.grid = type(grid).from_rows(rows)
+
+
+def restore(sim, state):
+    """Return a simulation to a state captured with snapshot()"""
+    restore_grid(sim, state.rows)
+    (sim.level, sim.tick, sim.game_over, sim.game_over_time, sim.gate_found,
+     sim.level_complete, sim.clock.ticks, scheduler_seq) = state.scalars
+    for name, rng_state in zip(sim.rng.NAMES, state.rng_states):
+        getattr(sim.rng, name).setstate(rng_state)
+
+    # Players
+    sim.players = []
+    for (x, y, vel, can_place_bomb, direction, grid_x, grid_y, target_x, target_y, moving,
+         is_dead, death_time) in state.players:
+        player = Player(x, y)
+        player.vel = vel
+        player.can_place_bomb = can_place_bomb
+        player.direction = DIRECTION_NAMES[direction]
+        player.grid_x, player.grid_y = grid_x, grid_y
+        player.target_x, player.target_y = target_x, target_y
+        player.moving = moving
+        player.is_dead = is_dead
+        player.death_time = death_time
+        sim.players.append(player)
+    sim.player = sim.players[0]
+
+    # Enemies and bombs with their scheduled events
+    heap = []
+
+    def timer(time, seq, kind, target):
+        if time is None:
+            return None
+        handle = Timer(time, seq, kind, target)
+        heap.append((time, seq, handle))
+        return handle
+
+    sim.enemies = []
+    sim.enemy_store = EntityStore(ENEMY_FIELDS)
+    for (grid_x, grid_y, last_move_time, sprite_index, animation_frame, animation_speed,
+         last_animation_time, move_time, move_seq, animation_time, animation_seq) in state.enemies:
+        enemy = Enemy(grid_x, grid_y, last_move_time, store=sim.enemy_store, sprite_index=sprite_index)
+        enemy.animation_frame = animation_frame
+        enemy.animation_speed = animation_speed
+        enemy.last_animation_time = last_animation_time
+        enemy.occupancy = sim.enemy_index
+        enemy.move_timer = timer(move_time, move_seq, TIMER_ENEMY_MOVE, enemy)
+        enemy.animation_timer = timer(animation_time, animation_seq, TIMER_ENEMY_ANIMATION, enemy)
+        sim.enemies.append(enemy)
+    sim.enemy_index.clear()
+    for number in state.index_order:
+        enemy = sim.enemies[number]
+        sim.enemy_index.add(enemy, enemy.grid_x, enemy.grid_y)
+
+    sim.bombs = []
+    sim.bomb_store = EntityStore(BOMB_FIELDS)
+    sim.bomb_index.clear()
+    sim.danger = DangerMap(sim.grid, BOMB_RANGE)
+    for record, affected, changed, blast in state.bombs:
+        (grid_x, grid_y, placed_time, exploded, explosion_time, explosion_frames,
+         kind, timer_time, timer_seq) = record
+        bomb = Bomb(grid_x, grid_y, placed_time, sim.bomb_store)
+        bomb.exploded = exploded
+        bomb.explosion_time = explosion_time
+        bomb.explosion_frames = explosion_frames
+        bomb.affected_tiles = list(affected)
+        bomb.changed_cells = list(changed)
+        if timer_time is not None:
+            bomb.timer = timer(timer_time, timer_seq, BOMB_TIMER_KINDS[kind], bomb)
+        sim.bombs.append(bomb)
+        sim.bomb_index.add(bomb, grid_x, grid_y)
+        if not exploded:
+            sim.danger.add(bomb, grid_x, grid_y, placed_time + BOMB_TIMER, blast)
+
+    heapq.heapify(heap)
+    sim.scheduler.heap = heap
+    sim.scheduler.seq = scheduler_seq
+    sim.scheduler.live = len(heap)
+
+    # The pursuit field is recomputed on the next enemy move
+    if sim.pursuit:
+        sim.flow_field = FlowField(sim.enemy_walkable)
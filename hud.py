@@ -0,0 +1,151 @@
+"""
+Cached HUD and overlays.
+
+The status panel, the gate message and the game over / level complete
+screens used to allocate their semi-transparent backgrounds and rasterize
+their text on every frame. TextCache keeps rendered strings keyed by
+(font, string, color) with LRU eviction, and Hud composites each panel or
+overlay into a single surface once. The status panel is only re-composited
+when the level or the enemy count changes; drawing is then one blit per
+panel.
+"""
+from collections import OrderedDict
+
+import pygame
+
+from transition import KIND_NEXT_LEVEL, STATE_OUTRO
+
+MAX_TEXT_ENTRIES = 64  # Rendered strings kept before the least recently used one is dropped
+STATUS_HEIGHT = 40     # Height of the status panel at the top of the window
+GATE_BAR_HEIGHT = 60   # Height of the "press I" bar at the bottom of the window
+
+WHITE = (255, 255, 255)
+RED = (255, 0, 0)
+YELLOW = (255, 255, 0)
+GOLD = (255, 215, 0)
+ENEMIES_LEFT_COLOR = (255, 100, 100)  # Red while enemies remain
+ENEMIES_CLEARED_COLOR = (0, 255, 0)   # Green once all are defeated
+
+
+class TextCache:
+    def __init__(self, font, max_entries=MAX_TEXT_ENTRIES):
+        """
+        Args:
+            font: Function returning a pygame Font by name ('large', 'medium', ...)
+            max_entries: Number of rendered strings kept in the cache
+        """
+        self.font = font
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+
+    def render(self, font_name, text, color):
+        """Rendered (antialiased) text, rasterized only on a cache miss"""
+        key = (font_name, text, color)
+        surface = self.entries.get(key)
+        if surface is None:
+            surface = self.font(font_name).render(text, True, color)
+            self.entries[key] = surface
+            # Evict the least recently used string when the cache is full
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        else:
+            self.entries.move_to_end(key)
+        return surface
+
+
+class Hud:
+    def __init__(self, font, width, height):
+        """
+        Args:
+            font: Function returning a pygame Font by name
+            width: Window width in pixels
+            height: Window height in pixels
+        """
+        self.width = width
+        self.height = height
+        self.text = TextCache(font)
+        self.status_key = None      # (level, enemy count) the status panel shows
+        self.status_surface = None
+        self.gate_surface = None
+        self.game_over_surface = None
+        self.next_level_entry = (None, None)      # (level, surface) of the last next level screen
+        self.veil_surface = None
+
+    def translucent(self, width, height, alpha):
+        surface = pygame.Surface((width, height), pygame.SRCALPHA)
+        surface.fill((0, 0, 0, alpha))
+        return surface
+
+    def status_panel(self, level, enemy_count):
+        """Status panel with level and enemies left, re-composited when either changes"""
+        key = (level, enemy_count)
+        if key != self.status_key:
+            panel = self.translucent(self.width, STATUS_HEIGHT, 180)
+            level_text = self.text.render('medium', f"LEVEL: {level}", GOLD)
+            panel.blit(level_text, level_text.get_rect(midleft=(20, STATUS_HEIGHT // 2)))
+            color = ENEMIES_CLEARED_COLOR if enemy_count == 0 else ENEMIES_LEFT_COLOR
+            enemies_text = self.text.render('medium', f"ENEMIES: {enemy_count}", color)
+            panel.blit(enemies_text, enemies_text.get_rect(midright=(self.width - 20, STATUS_HEIGHT // 2)))
+            self.status_surface = panel
+            self.status_key = key
+        return self.status_surface
+
+    def gate_bar(self):
+        """Bar at the bottom telling the player to enter the gate"""
+        if self.gate_surface is None:
+            bar = self.translucent(self.width, GATE_BAR_HEIGHT, 150)
+            text = self.text.render('medium', "Press I to enter the gate", YELLOW)
+            bar.blit(text, text.get_rect(center=(self.width // 2, GATE_BAR_HEIGHT // 2)))
+            self.gate_surface = bar
+        return self.gate_surface
+
+    def screen_overlay(self, title, title_color, hint):
+        """Full-window darkened overlay with a title and a hint line"""
+        overlay = self.translucent(self.width, self.height, 180)  # Black with 70% opacity
+        title_text = self.text.render('large', title, title_color)
+        overlay.blit(title_text, title_text.get_rect(center=(self.width // 2, self.height // 2 - 40)))
+        hint_text = self.text.render('medium', hint, WHITE)
+        overlay.blit(hint_text, hint_text.get_rect(center=(self.width // 2, self.height // 2 + 40)))
+        return overlay
+
+    def game_over(self):
+        if self.game_over_surface is None:
+            self.game_over_surface = self.screen_overlay("GAME OVER", RED, "Press R to Restart")
+        return self.game_over_surface
+
+    def next_level(self, level):
+        """Level complete screen shown while the next level is prepared"""
+        if self.next_level_entry[0] != level:
+            self.next_level_entry = (level, self.screen_overlay(
+                f"LEVEL {level} COMPLETE!", YELLOW, f"Get ready for level {level + 1}"))
+        return self.next_level_entry[1]
+
+    def veil(self):
+        """Opaque black window-sized surface, faded in and out with set_alpha()"""
+        if self.veil_surface is None:
+            self.veil_surface = pygame.Surface((self.width, self.height))
+        return self.veil_surface
+
+    def draw_transition(self, renderer, transition, level):
+        """
+        Draw the overlay of a running level transition.
+
+        The outro of a completed level fades in the level complete screen and
+        the outro of a restart fades to black; every intro fades from black.
+        """
+        progress = transition.progress()
+        if transition.state == STATE_OUTRO and transition.kind == KIND_NEXT_LEVEL:
+            overlay = self.next_level(level)
+            overlay.set_alpha(int(255 * progress))
+        else:
+            overlay = self.veil()
+            overlay.set_alpha(int(255 * (progress if transition.state == STATE_OUTRO else 1 - progress)))
+        renderer.blit(overlay, (0, 0))
+
+    def draw(self, renderer, sim):
+        """Draw the overlays that apply to the current game state and the status panel"""
+        if sim.game_over:
+            renderer.blit(self.game_over(), (0, 0))
+        if sim.gate_found:
+            renderer.blit(self.gate_bar(), (0, self.height - GATE_BAR_HEIGHT))
+        renderer.blit(self.status_panel(sim.level, len(sim.enemies)), (0, 0))
@@ -0,0 +1,161 @@
+"""
+Level generation helpers: connectivity checks and background pre-generation.
+
+open_components() joins every open cell of a board with its open neighbours
+in a union-find structure, so checking that two cells can reach each other
+(once every destructible block is cleared) is two near-constant-time finds.
+
+LevelQueue hands out levels in the order they are drawn from a random
+stream. In the background mode a worker thread keeps the next few levels
+ready, so starting a level never waits for generation. Because only one
+thread ever draws from the stream, the levels are the same as the ones
+generated on demand for the same seed.
+"""
+import threading
+from collections import deque
+
+PREGENERATED_LEVELS = 2  # Levels the worker thread keeps ready
+
+
+class UnionFind:
+    def __init__(self, size):
+        """
+        Args:
+            size: Number of elements, numbered 0 to size - 1
+        """
+        self.parent = list(range(size))
+        self.rank = [0] * size
+
+    def find(self, item):
+        """Representative of the set holding item"""
+        parent = self.parent
+        root = item
+        while parent[root] != root:
+            root = parent[root]
+        # Point every element on the way straight at the root
+        while parent[item] != root:
+            parent[item], item = root, parent[item]
+        return root
+
+    def union(self, a, b):
+        """Merge the sets holding a and b"""
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return
+        if self.rank[root_a] < self.rank[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        if self.rank[root_a] == self.rank[root_b]:
+            self.rank[root_a] += 1
+
+    def connected(self, a, b):
+        return self.find(a) == self.find(b)
+
+
+def open_components(width, height, is_open):
+    """
+    Group the open cells of a board into connected areas.
+
+    Args:
+        width: Board width in cells
+        height: Board height in cells
+        is_open: Function (x, y) -> True if the cell can be walked on once
+            every destructible block is cleared
+
+    Returns:
+        UnionFind over the cell indices y * width + x
+    """
+    components = UnionFind(width * height)
+    open_row = [is_open(x, 0) for x in range(width)]
+    for y in range(height):
+        next_row = [is_open(x, y + 1) for x in range(width)] if y + 1 < height else None
+        for x in range(width):
+            if not open_row[x]:
+                continue
+            index = y * width + x
+            if x + 1 < width and open_row[x + 1]:
+                components.union(index, index + 1)
+            if next_row is not None and next_row[x]:
+                components.union(index, index + width)
+        open_row = next_row
+    return components
+
+
+class LevelQueue:
+    def __init__(self, generate, rng, ahead=PREGENERATED_LEVELS, background=False):
+        """
+        Args:
+            generate: Function taking a random generator and returning a level
+            rng: Random generator the levels are drawn from
+            ahead: Number of levels the worker thread keeps ready
+            background: If True, a worker thread generates levels ahead of
+                time; otherwise next() generates each level when asked
+        """
+        self.generate = generate
+        self.rng = rng
+        self.ahead = ahead
+        self.ready = deque()  # (level, exception) pairs in stream order
+        self.epoch = 0        # Bumped by restart() so stale levels are dropped
+        self.closed = False
+        self.condition = threading.Condition()
+        self.thread = None
+        if background:
+            self.thread = threading.Thread(target=self.run, name='levelgen', daemon=True)
+            self.thread.start()
+
+    def run(self):
+        """Worker thread: keep `ahead` levels ready until closed"""
+        while True:
+            with self.condition:
+                while len(self.ready) >= self.ahead and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                epoch, rng = self.epoch, self.rng
+            try:
+                entry = (self.generate(rng), None)
+            except Exception as e:  # Re-raised by next() on the caller's thread
+                entry = (None, e)
+            with self.condition:
+                if epoch == self.epoch:
+                    self.ready.append(entry)
+                    self.condition.notify_all()
+
+    def next(self):
+        """
+        The next level from the stream.
+
+        In the background mode this only waits if the worker has not finished
+        the level yet (e.g. right after start or restart()).
+        """
+        if self.thread is None:
+            return self.generate(self.rng)
+        with self.condition:
+            while not self.ready:
+                self.condition.wait()
+            level, error = self.ready.popleft()
+            self.condition.notify_all()
+        if error is not None:
+            raise error
+        return level
+
+    def has_ready(self):
+        """True if next() would return without waiting for the worker"""
+        if self.thread is None:
+            return True
+        with self.condition:
+            return bool(self.ready)
+
+    def restart(self, rng):
+        """Drop the levels generated so far and continue from a new random stream"""
+        with self.condition:
+            self.rng = rng
+            self.epoch += 1
+            self.ready.clear()
+            self.condition.notify_all()
+
+    def close(self):
+        """Stop the worker thread"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
@@ -1,28 +1,44 @@
+import argparse
 import pygame
 import sys
-import time
 import random
 import os
-import math
+import time
+import warnings
 
-# Initialize Pygame and its modules
-pygame.init()
-pygame.mixer.init()  # Initialize the mixer for audio support
+import atlas
+from audio import SoundManager
+from clock import FixedStepClock, StepAccumulator
+from hud import Hud
+from profiler import FrameProfiler
+from renderer import MotionSnapshot, Renderer
+from replay import InputRecorder
+from startup import AssetLoader, StartupTimer
+from transition import LevelTransition, KIND_NEXT_LEVEL, KIND_RESTART
+from simulation import (
+    Simulation, GRID_WIDTH, GRID_HEIGHT, TILE_SIZE,
+    ACTION_LEFT, ACTION_RIGHT, ACTION_UP, ACTION_DOWN, ACTION_BOMB,
+    ACTION_ENTER_GATE, ACTION_RESTART,
+    EVENT_BOMB_PLACED, EVENT_EXPLOSION, EVENT_CELLS_CHANGED, EVENT_ENEMY_KILLED, EVENT_PLAYER_KILLED,
+    EVENT_GAME_OVER, EVENT_RESTART,
+)
 
-# Game constants - these define the game's basic parameters
-GRID_WIDTH = 15      # Number of grid cells horizontally
-GRID_HEIGHT = 13     # Number of grid cells vertically
-TILE_SIZE = 50       # Size of each grid cell in pixels
-WINDOW_WIDTH = GRID_WIDTH * TILE_SIZE    # Total window width
+# Display constants - the game rules and grid size live in simulation.py
+WINDOW_WIDTH = GRID_WIDTH * TILE_SIZE    # Total window width (larger maps scroll)
 WINDOW_HEIGHT = GRID_HEIGHT * TILE_SIZE  # Total window height
-FPS = 60             # Frames per second (controls game speed)
-PLAYER_SPEED = 5     # Player movement speed
-BOMB_TIMER = 2       # Seconds before a bomb explodes
-DESTRUCTIBLE_BLOCK_CHANCE = 0.4  # 40% chance for a destructible block to appear
-ENEMY_MOVE_INTERVAL = 1.0  # Seconds between enemy movements
-GAME_OVER_DELAY = 2.0  # Seconds to wait after game over before allowing restart
+FAR_ENTITY_RADIUS = max(GRID_WIDTH, GRID_HEIGHT)  # Tiles from the player beyond which enemies update less often
+ENEMY_PURSUIT = True  # Enemies near the player chase it instead of wandering
+FPS = 60  # Simulation ticks per second (controls game speed; frames are drawn at the display's rate)
+RENDER_FPS = 0  # Frame rate cap, 0 for none (vsync, when available, paces the frames instead)
+VSYNC = True    # Wait for the display's vertical blank before showing a frame
+FALLBACK_FPS = 144  # Frame rate cap when vsync was asked for but the display cannot do it
 GATE_VISIBLE_PULSE_SPEED = 0.1  # Speed of gate pulsing animation
-CURRENT_LEVEL = 1    # Starting level number
+
+# Frame timing - phases of the main loop, in the order they run
+FRAME_PHASES = ('input', 'update', 'audio', 'world', 'hud', 'display', 'idle')
+FRAME_TIMES_CSV = os.environ.get('BOMBERMAN_FRAME_CSV', 'frame_times.csv')  # Written on exit
+REPLAY_PATH = os.environ.get('BOMBERMAN_REPLAY', 'last_session.replay')  # Input log written on exit
+TIMING_OVERLAY_REFRESH = 30  # Frames between timing overlay refreshes
 
 # Colors used throughout the game
 BLACK = (0, 0, 0)
@@ -37,33 +53,25 @@ YELLOW = (255, 255, 0)
 BROWN = (165, 42, 42)
 PURPLE = (128, 0, 128)
 
-# Create the game window with the calculated dimensions
-window = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
-pygame.display.set_caption("Bomberman Game")
+# Display and frame clock - created by init_display(), not at import time
+window = None
+clock = None
+frame_limit = RENDER_FPS  # Frame rate cap for clock.tick(), set by init_display()
 
-# Clock for controlling the frame rate
-clock = pygame.time.Clock()
-
-# Load fonts for text display
-pygame.font.init()
-font_large = pygame.font.SysFont('Arial', 64, bold=True)  # For main titles
-font_medium = pygame.font.SysFont('Arial', 36)            # For UI elements
+# Font sizes by name: (system font, size, bold)
+FONT_SPECS = {
+    'large': ('Arial', 64, True),          # For main titles
+    'medium': ('Arial', 36, False),        # For UI elements
+    'small': ('Courier New', 16, False),   # For the timing overlay
+}
 
 # Asset paths - where to find game resources
 ASSETS_DIR = os.path.join(os.path.dirname(__file__), "assets")
+SPRITE_CACHE_DIR = os.path.join(ASSETS_DIR, "cache")  # Sprite atlas built on first start
+ENEMY_SPRITE_FILES = [os.path.join(ASSETS_DIR, f'enemy{i}.png') for i in range(1, 4)]
 
-# Create assets directory if it doesn't exist
-if not os.path.exists(ASSETS_DIR):
-    os.makedirs(ASSETS_DIR)
-
-# Sound effects dictionary - will be populated if sound files are found
-sounds = {
-    'background': None,
-    'bomb_placed': None,
-    'explosion': None,
-    'enemy_death': None,
-    'player_death': None
-}
+# Sound effects - playable once load_sounds() has decoded them
+sound_manager = SoundManager()
 
 # Load or initialize sounds
 def load_sounds():
@@ -76,11 +84,9 @@ def load_sounds():
         pygame.mixer.music.load(os.path.join(ASSETS_DIR, 'background_music.mp3'))
         pygame.mixer.music.set_volume(0.5)
         
-        # Sound effects
-        sounds['bomb_placed'] = pygame.mixer.Sound(os.path.join(ASSETS_DIR, 'bomb_placed.wav'))
-        sounds['explosion'] = pygame.mixer.Sound(os.path.join(ASSETS_DIR, 'explosion.wav'))
-        sounds['enemy_death'] = pygame.mixer.Sound(os.path.join(ASSETS_DIR, 'enemy_death.wav'))
-        sounds['player_death'] = pygame.mixer.Sound(os.path.join(ASSETS_DIR, 'player_death.wav'))
+        # Sound effects on their reserved channels, each playable once decoded
+        sound_manager.open()
+        sound_manager.load(ASSETS_DIR)
         
         print("Sounds loaded successfully")
         return True
@@ -89,15 +95,26 @@ def load_sounds():
         print("Game will continue without sound")
         return False
 
-# Try to load sounds, but continue if files don't exist
-sound_enabled = False
-try:
-    sound_enabled = load_sounds()
-    if sound_enabled:
+# Start the mixer and load sounds (runs on a loader thread)
+def init_audio():
+    """
+    Returns:
+        True if sound is available, False if the game runs silently
+    """
+    try:
+        pygame.mixer.init()  # Initialize the mixer for audio support
+        if not load_sounds():
+            return False
         pygame.mixer.music.play(-1)  # Loop background music indefinitely
-except Exception as e:
-    print(f"Sound initialization error: {e}")
-    sound_enabled = False
+        return True
+    except Exception as e:
+        print(f"Sound initialization error: {e}")
+        return False
+
+# Find and open the system fonts (runs on a loader thread)
+def load_fonts():
+    pygame.font.init()
+    return {name: pygame.font.SysFont(face, size, bold=bold) for name, (face, size, bold) in FONT_SPECS.items()}
 
 # Function to create simple sprite images programmatically
 def create_sprite_images():
@@ -155,7 +172,7 @@ def create_sprite_images():
     try:
         # Try to load enemy sprites from files
         for i in range(1, 4):  # Assuming we have 3 different enemy sprites
-            enemy_img = pygame.image.load(os.path.join(ASSETS_DIR, f'enemy{i}.png'))
+            enemy_img = pygame.image.load(ENEMY_SPRITE_FILES[i - 1])
             enemy_img = pygame.transform.scale(enemy_img, (TILE_SIZE - 10, TILE_SIZE - 10))
             enemy_sprites.append(enemy_img)
         print("Loaded enemy sprites from files")
@@ -278,542 +295,315 @@ def create_sprite_images():
         'explosion_end': explosion_end
     }
 
-# Load or create sprites
-sprites = create_sprite_images()
+# Load sprites from the atlas cache (runs on a loader thread)
+def load_sprites():
+    """
+    Sprites as subsurfaces of the cached atlas, converted to the display format.
+    The atlas is rebuilt with create_sprite_images() when TILE_SIZE, the
+    drawing code or an enemy sprite file changes.
+    """
+    return atlas.load_sprites(create_sprite_images, SPRITE_CACHE_DIR, TILE_SIZE, ENEMY_SPRITE_FILES)
 
-# Create the grid
-# 0 = empty space, 1 = indestructible wall, 2 = destructible block, 3 = hidden gate
-def create_grid():
-    grid = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
-    
-    # Set borders as indestructible walls
-    for x in range(GRID_WIDTH):
-        grid[0][x] = 1  # Top border
-        grid[GRID_HEIGHT-1][x] = 1  # Bottom border
-    
-    for y in range(GRID_HEIGHT):
-        grid[y][0] = 1  # Left border
-        grid[y][GRID_WIDTH-1] = 1  # Right border
-    
-    # Set every second cell as indestructible wall
-    for y in range(2, GRID_HEIGHT-1, 2):
-        for x in range(2, GRID_WIDTH-1, 2):
-            grid[y][x] = 1
-    
-    # Add destructible blocks randomly
-    for y in range(1, GRID_HEIGHT):
-        for x in range(1, GRID_WIDTH):
-            # Skip indestructible walls
-            if grid[y][x] == 1:
-                continue
-                
-            # Keep starting area clear (3x3 area from top-left)
-            if (x <= 2 and y <= 2):
-                continue
-                
-            # Random chance to place a destructible block
-            if random.random() < DESTRUCTIBLE_BLOCK_CHANCE:
-                grid[y][x] = 2
+# ===== STARTUP =====
+# Nothing below runs at import time: main() opens the window, starts the
+# background loader and shows a first frame before the assets are ready.
+startup_timer = StartupTimer()
+loader = None  # AssetLoader with the 'audio', 'fonts' and 'sprites' jobs
+hud = None     # Hud, created by get_hud()
+
+def init_display(vsync=VSYNC, render_fps=RENDER_FPS):
+    """
+    Open the game window. The only pygame subsystem needed for a first frame.
     
-    # Place a hidden gate under one of the destructible blocks
-    # Choose a random destructible block
-    gate_placed = False
-    while not gate_placed:
-        gate_x = random.randint(1, GRID_WIDTH-2)
-        gate_y = random.randint(1, GRID_HEIGHT-2)
-        
-        # Make sure it's a destructible block and not in the starting area
-        if grid[gate_y][gate_x] == 2 and not (gate_x <= 2 and gate_y <= 2):
-            grid[gate_y][gate_x] = 3  # Mark as hidden gate (covered by destructible block)
-            gate_placed = True
+    Args:
+        vsync: Ask for a vsynced window (pygame only offers it on SCALED windows)
+        render_fps: Frame rate cap, 0 for none
     
-    return grid
+    Returns:
+        The window surface
+    """
+    global window, clock, frame_limit
+    with startup_timer.step('display'):
+        pygame.display.init()
+        frame_limit = render_fps
+        window = None
+        if vsync:
+            # Without a hardware renderer pygame does not raise: it warns "no
+            # fast renderer available" and opens a window that never waits
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always')
+                try:
+                    window = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SCALED, vsync=1)
+                except pygame.error:
+                    window = None
+            if window is None or caught:
+                # No vsync here: cap the frame rate instead of spinning the CPU
+                frame_limit = render_fps or FALLBACK_FPS
+        if window is None:
+            window = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+        pygame.display.set_caption("Bomberman Game")
+        # Clock for measuring and capping the frame rate
+        clock = pygame.time.Clock()
+    return window
 
-# Global grid variable
-grid = create_grid()
+def start_loading():
+    """Start loading audio, fonts and sprites in the background (once)"""
+    global loader
+    if loader is None:
+        # Create assets directory if it doesn't exist
+        os.makedirs(ASSETS_DIR, exist_ok=True)
+        loader = AssetLoader(startup_timer)
+        loader.submit('audio', init_audio)
+        loader.submit('fonts', load_fonts)
+        loader.submit('sprites', load_sprites)
+    return loader
 
-# Enemy class
-class Enemy:
-    def __init__(self, grid_x, grid_y):
-        """
-        Initialize an enemy at the specified grid position.
-        
-        Args:
-            grid_x: X position on the grid
-            grid_y: Y position on the grid
-        """
-        self.grid_x = grid_x
-        self.grid_y = grid_y
-        # Calculate pixel position from grid position
-        self.x = grid_x * TILE_SIZE + TILE_SIZE // 2 - (TILE_SIZE - 10) // 2
-        self.y = grid_y * TILE_SIZE + TILE_SIZE // 2 - (TILE_SIZE - 10) // 2
-        self.width = TILE_SIZE - 10  # Slightly smaller than tile
-        self.height = TILE_SIZE - 10
-        self.last_move_time = time.time()
-        self.directions = [(0, -1), (0, 1), (-1, 0), (1, 0)]  # Up, Down, Left, Right
-        # Choose a random enemy sprite from available ones
-        self.sprite_index = random.randint(0, len(sprites['enemies']) - 1)
-        # Animation properties
-        self.animation_frame = 0
-        self.animation_speed = 0.2  # Seconds per frame
-        self.last_animation_time = time.time()
-    
-    def update(self):
-        """Update enemy position and animation"""
-        current_time = time.time()
-        # Move the enemy at regular intervals
-        if current_time - self.last_move_time >= ENEMY_MOVE_INTERVAL:
-            self.move_randomly()
-            self.last_move_time = current_time
-        
-        # Update animation frame
-        if current_time - self.last_animation_time >= self.animation_speed:
-            self.animation_frame = (self.animation_frame + 1) % 2  # Simple 2-frame animation
-            self.last_animation_time = current_time
-    
-    def move_randomly(self):
-        """Move the enemy in a random valid direction"""
-        # Try all directions in random order
-        directions = self.directions.copy()
-        random.shuffle(directions)
-        
-        for dx, dy in directions:
-            new_grid_x = self.grid_x + dx
-            new_grid_y = self.grid_y + dy
-            
-            # Check if the new position is valid (within bounds and not a wall)
-            if (0 <= new_grid_x < GRID_WIDTH and 0 <= new_grid_y < GRID_HEIGHT and 
-                grid[new_grid_y][new_grid_x] == 0):
-                # Update grid position
-                self.grid_x = new_grid_x
-                self.grid_y = new_grid_y
-                
-                # Update pixel position
-                self.x = self.grid_x * TILE_SIZE + TILE_SIZE // 2 - self.width // 2
-                self.y = self.grid_y * TILE_SIZE + TILE_SIZE // 2 - self.height // 2
-                break
-    
-    def draw(self):
-        """Draw the enemy on the screen with animation"""
-        # Get the appropriate enemy sprite
-        enemy_sprite = sprites['enemies'][self.sprite_index]
-        
-        # Apply a simple bounce effect for animation
-        bounce_offset = 0
-        if self.animation_frame == 1:
-            bounce_offset = 2  # Move up 2 pixels in second frame
-        
-        window.blit(enemy_sprite, (self.x, self.y - bounce_offset))
-    
-    def is_in_explosion(self, affected_tiles):
-        """
-        Check if the enemy is in the explosion area
-        
-        Args:
-            affected_tiles: List of (x,y) grid positions affected by explosion
-            
-        Returns:
-            True if enemy is in explosion area, False otherwise
-        """
-        for x, y in affected_tiles:
-            if x == self.grid_x and y == self.grid_y:
-                return True
-        return False
-    
-    def get_rect(self):
-        """Get the enemy's collision rectangle for collision detection"""
-        return pygame.Rect(self.x, self.y, self.width, self.height)
+def get_sprites():
+    """Sprite dictionary, waiting for the loader if it is not done yet"""
+    return start_loading().resources['sprites'].get()
 
-# Bomb class
-class Bomb:
-    def __init__(self, grid_x, grid_y):
-        """
-        Initialize a bomb at the specified grid position
-        
-        Args:
-            grid_x: X position on the grid
-            grid_y: Y position on the grid
-        """
-        self.grid_x = grid_x
-        self.grid_y = grid_y
-        # Calculate pixel position from grid position
-        self.x = grid_x * TILE_SIZE + TILE_SIZE // 2 - (TILE_SIZE - 10) // 2
-        self.y = grid_y * TILE_SIZE + TILE_SIZE // 2 - (TILE_SIZE - 10) // 2
-        self.placed_time = time.time()
-        self.exploded = False
-        self.explosion_time = 0
-        self.explosion_duration = 0.5  # seconds
-        self.affected_tiles = []  # Store tiles affected by explosion
-        self.explosion_frames = 0  # For animation
-        
-        # Play bomb placed sound if enabled
-        if sound_enabled:
-            sounds['bomb_placed'].play()
-    
-    def update(self, enemies, player):
-        current_time = time.time()
-        # Check if bomb should explode
-        if not self.exploded and current_time - self.placed_time >= BOMB_TIMER:
-            self.exploded = True
-            self.explosion_time = current_time
-            self.calculate_explosion_area()
-            self.destroy_blocks()
-            
-            # Play explosion sound
-            if sound_enabled:
-                sounds['explosion'].play()
-            
-            # Check for enemies in explosion
-            enemies_to_remove = []
-            for enemy in enemies:
-                if enemy.is_in_explosion(self.affected_tiles):
-                    enemies_to_remove.append(enemy)
-                    # Play enemy death sound
-                    if sound_enabled:
-                        sounds['enemy_death'].play()
-            
-            # Check if player is in explosion
-            player_hit = False
-            player_grid_x, player_grid_y = player.get_grid_position()
-            for x, y in self.affected_tiles:
-                if x == player_grid_x and y == player_grid_y:
-                    player_hit = True
-                    # Play player death sound
-                    if sound_enabled:
-                        sounds['player_death'].play()
-                    break
-            
-            # Return list of enemies to remove and player hit status
-            return enemies_to_remove, player_hit
-        
-        # Animate explosion
-        if self.exploded:
-            self.explosion_frames += 1
-            
-        return [], False
-    
-    def calculate_explosion_area(self):
-        # Add center tile
-        self.affected_tiles.append((self.grid_x, self.grid_y))
-        
-        # Check in four directions
-        directions = [(0, -1), (0, 1), (-1, 0), (1, 0)]
-        for dx, dy in directions:
-            # Check each direction up to 3 tiles
-            for i in range(1, 4):  # Explosion range of 3 tiles
-                x = self.grid_x + dx * i
-                y = self.grid_y + dy * i
-                
-                # Check if position is within grid bounds
-                if not (0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT):
-                    break  # Stop this direction if out of bounds
-                
-                # Check if there's an indestructible wall
-                if grid[y][x] == 1:
-                    break  # Stop this direction if it hits an indestructible wall
-                
-                # Add to affected tiles
-                self.affected_tiles.append((x, y))
-                
-                # Stop this direction if it hits a destructible block or hidden gate
-                # (but include the destructible block in the affected tiles)
-                if grid[y][x] in [2, 3]:
-                    break
-    
-    def destroy_blocks(self):
-        global grid
-        # Check all affected tiles and destroy destructible blocks
-        for x, y in self.affected_tiles:
-            if grid[y][x] == 2:  # Destructible block
-                grid[y][x] = 0  # Convert to empty space
-            elif grid[y][x] == 3:  # Hidden gate
-                grid[y][x] = 4  # Reveal the gate
-    
-    def draw(self):
-        if not self.exploded:
-            # Calculate bomb pulsing effect based on time remaining
-            time_ratio = (time.time() - self.placed_time) / BOMB_TIMER
-            scale_factor = 1.0 + abs(math.sin(time_ratio * 10)) * 0.2
-            
-            # Scale the bomb sprite for pulsing effect
-            scaled_size = int((TILE_SIZE - 10) * scale_factor)
-            scaled_bomb = pygame.transform.scale(sprites['bomb'], (scaled_size, scaled_size))
-            
-            # Center the scaled bomb
-            offset = (scaled_size - (TILE_SIZE - 10)) // 2
-            window.blit(scaled_bomb, (self.x - offset, self.y - offset))
-        else:
-            # Don't draw anything if explosion is over
-            if time.time() - self.explosion_time > self.explosion_duration:
-                return
-            
-            # Draw explosion
-            self.draw_explosion()
-    
-    def draw_explosion(self):
-        # Draw center explosion
-        window.blit(sprites['explosion_center'], 
-                   (self.grid_x * TILE_SIZE, self.grid_y * TILE_SIZE))
-        
-        # Draw explosion in four directions
-        directions = [(0, -1, 'vertical'), (0, 1, 'vertical'), 
-                     (-1, 0, 'horizontal'), (1, 0, 'horizontal')]
-        
-        for dx, dy, sprite_type in directions:
-            # Check each direction
-            for i in range(1, 4):  # Explosion range of 3 tiles
-                x = self.grid_x + dx * i
-                y = self.grid_y + dy * i
-                
-                # Check if position is within affected tiles
-                if (x, y) not in self.affected_tiles:
-                    break
-                
-                # Draw explosion segment
-                if i == 3 or (x + dx, y + dy) not in self.affected_tiles:  # End of explosion
-                    window.blit(sprites['explosion_end'], 
-                               (x * TILE_SIZE, y * TILE_SIZE))
-                else:  # Middle of explosion
-                    window.blit(sprites[f'explosion_{sprite_type}'], 
-                               (x * TILE_SIZE, y * TILE_SIZE))
-                
-                # Stop if this is a destructible block (it will be destroyed but stops the explosion)
-                if grid[y][x] == 2:
-                    break
-    
-    def is_finished(self):
-        return self.exploded and time.time() - self.explosion_time > self.explosion_duration
+def get_font(name):
+    """Font by FONT_SPECS name, waiting for the loader if it is not done yet"""
+    return start_loading().resources['fonts'].get()[name]
 
-# Player class
-class Player:
-    def __init__(self, x, y):
-        self.x = x
-        self.y = y
-        self.width = TILE_SIZE - 10  # Slightly smaller than tile
-        self.height = TILE_SIZE - 10
-        self.vel = PLAYER_SPEED
-        self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
-        self.can_place_bomb = True
-        self.direction = 'down'  # Default direction
-        self.grid_x = (self.x + self.width // 2) // TILE_SIZE
-        self.grid_y = (self.y + self.height // 2) // TILE_SIZE
-        self.target_x = self.x
-        self.target_y = self.y
-        self.moving = False
-        self.is_dead = False
-        self.death_time = 0
-    
-    def draw(self):
-        # Center the player in the tile
-        self.rect = pygame.Rect(self.x, self.y, self.width, self.height)
-        
-        # If player is dead, draw with transparency effect
-        if self.is_dead:
-            # Create a copy of the sprite with transparency
-            alpha = max(0, 255 - int((time.time() - self.death_time) * 255))
-            sprite_copy = sprites['player'][self.direction].copy()
-            sprite_copy.set_alpha(alpha)
-            window.blit(sprite_copy, (self.x, self.y))
-        else:
-            window.blit(sprites['player'][self.direction], (self.x, self.y))
-    
-    def move(self, dx, dy, grid):
-        # Don't move if dead
-        if self.is_dead:
-            return
-            
-        # Set direction based on movement
-        if dx < 0:
-            self.direction = 'left'
-        elif dx > 0:
-            self.direction = 'right'
-        elif dy < 0:
-            self.direction = 'up'
-        elif dy > 0:
-            self.direction = 'down'
-        
-        # If already moving, continue current movement
-        if self.moving:
-            return
-        
-        # Calculate new position
-        new_x = self.x + dx
-        new_y = self.y + dy
-        
-        # Calculate target grid position
-        if dx != 0 or dy != 0:
-            # Calculate the target grid position
-            target_grid_x = self.grid_x
-            target_grid_y = self.grid_y
-            
-            if dx < 0:
-                target_grid_x -= 1
-            elif dx > 0:
-                target_grid_x += 1
-            elif dy < 0:
-                target_grid_y -= 1
-            elif dy > 0:
-                target_grid_y += 1
-            
-            # Check if target position is valid (empty space or gate)
-            if (0 <= target_grid_x < GRID_WIDTH and 0 <= target_grid_y < GRID_HEIGHT and 
-                (grid[target_grid_y][target_grid_x] == 0 or grid[target_grid_y][target_grid_x] == 4)):
-                # Set target pixel position (center of the target tile)
-                self.target_x = target_grid_x * TILE_SIZE + (TILE_SIZE - self.width) // 2
-                self.target_y = target_grid_y * TILE_SIZE + (TILE_SIZE - self.height) // 2
-                self.grid_x = target_grid_x
-                self.grid_y = target_grid_y
-                self.moving = True
-    
-    def update(self):
-        # If moving, continue movement toward target position
-        if self.moving:
-            # Calculate direction to target
-            dx = self.target_x - self.x
-            dy = self.target_y - self.y
-            
-            # Calculate distance to move this frame
-            distance = min(self.vel, max(abs(dx), abs(dy)))
-            
-            # Move toward target
-            if abs(dx) > 0:
-                self.x += (dx / abs(dx)) * distance
-            if abs(dy) > 0:
-                self.y += (dy / abs(dy)) * distance
-            
-            # Check if we've reached the target
-            if abs(self.x - self.target_x) < self.vel and abs(self.y - self.target_y) < self.vel:
-                self.x = self.target_x
-                self.y = self.target_y
-                self.moving = False
-    
-    def check_collision(self, rect, grid):
-        # Get the grid cells that the player might be colliding with
-        grid_x1 = max(0, rect.left // TILE_SIZE)
-        grid_y1 = max(0, rect.top // TILE_SIZE)
-        grid_x2 = min(GRID_WIDTH - 1, rect.right // TILE_SIZE)
-        grid_y2 = min(GRID_HEIGHT - 1, rect.bottom // TILE_SIZE)
-        
-        # Check each potential grid cell for collision
-        for y in range(grid_y1, grid_y2 + 1):
-            for x in range(grid_x1, grid_x2 + 1):
-                if grid[y][x] in [1, 2]:  # Wall or destructible block
-                    wall_rect = pygame.Rect(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE)
-                    if rect.colliderect(wall_rect):
-                        return True
-        return False
-    
-    def get_grid_position(self):
-        # Return the current grid position
-        return self.grid_x, self.grid_y
-    
-    def check_enemy_collision(self, enemies):
-        # Don't check collisions if already dead
-        if self.is_dead:
-            return False
-            
-        for enemy in enemies:
-            enemy_rect = enemy.get_rect()
-            if self.rect.colliderect(enemy_rect):
-                self.is_dead = True
-                self.death_time = time.time()
-                # Play death sound
-                if sound_enabled:
-                    sounds['player_death'].play()
-                return True
-        return False
+def get_hud():
+    """HUD layer with cached text, panels and overlays (created on first use)"""
+    global hud
+    if hud is None:
+        hud = Hud(get_font, WINDOW_WIDTH, WINDOW_HEIGHT)
+    return hud
 
-# Find a valid position for an enemy (empty space)
-def find_enemy_position():
-    while True:
-        x = random.randint(1, GRID_WIDTH - 2)
-        y = random.randint(1, GRID_HEIGHT - 2)
-        
-        # Check if position is empty and not near the player start
-        if grid[y][x] == 0 and not (x <= 3 and y <= 3):
-            return x, y
+def sound_enabled():
+    """True once the mixer is up and the sounds are loaded (never waits)"""
+    return loader is not None and loader.resources['audio'].get_nowait(False)
 
-# Draw the grid
-def draw_grid(grid):
-    # Draw green background first
-    window.fill(GREEN)
-    
-    # Draw ground tiles
-    for y in range(GRID_HEIGHT):
-        for x in range(GRID_WIDTH):
-            window.blit(sprites['ground'], (x * TILE_SIZE, y * TILE_SIZE))
-    
-    # Get current time for gate animation
-    current_time = time.time()
-    pulse = (math.sin(current_time * 8) + 1) / 2  # Value between 0 and 1
-            
-    # Draw walls, blocks and gate
-    for y in range(GRID_HEIGHT):
-        for x in range(GRID_WIDTH):
-            if grid[y][x] == 1:  # Indestructible wall
-                window.blit(sprites['wall'], (x * TILE_SIZE, y * TILE_SIZE))
-            elif grid[y][x] == 2:  # Destructible block
-                window.blit(sprites['block'], (x * TILE_SIZE, y * TILE_SIZE))
-            elif grid[y][x] == 3:  # Hidden gate (covered by destructible block)
-                window.blit(sprites['block'], (x * TILE_SIZE, y * TILE_SIZE))
-            elif grid[y][x] == 4:  # Visible gate
-                # Apply pulsing effect to make gate more noticeable
-                scale = 1.0 + pulse * 0.1  # Scale between 1.0 and 1.1
-                
-                # Create a scaled copy of the gate sprite
-                gate_size = int(TILE_SIZE * scale)
-                scaled_gate = pygame.transform.scale(sprites['gate'], (gate_size, gate_size))
-                
-                # Center the scaled gate in the tile
-                offset = (gate_size - TILE_SIZE) // 2
-                window.blit(scaled_gate, (x * TILE_SIZE - offset, y * TILE_SIZE - offset))
+def __getattr__(name):
+    """Lazy module attributes: main.sprites is created on first access"""
+    if name == 'sprites':
+        return get_sprites()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def draw_loading_screen():
+    """First frame, drawn with pygame's built-in font while the assets load"""
+    pygame.font.init()
+    window.fill(BLACK)
+    text = pygame.font.Font(None, 48).render("Loading...", True, WHITE)
+    window.blit(text, text.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2)))
+    pygame.display.flip()
+
+def wait_for(resource):
+    """Wait for a loader job while keeping the window responsive"""
+    while not resource.ready():
+        pygame.event.pump()
+        time.sleep(0.005)
+    return resource.get()
 
 # Draw game over screen
-def draw_game_over():
-    # Semi-transparent overlay
-    overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
-    overlay.fill((0, 0, 0, 180))  # Black with 70% opacity
-    window.blit(overlay, (0, 0))
+def draw_game_over(renderer):
+    renderer.blit(get_hud().game_over(), (0, 0))
+
+# Frame timing overlay (toggled with F3)
+class TimingOverlay:
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self.visible = False
+        self.surface = None
+        self.frames_until_refresh = 0
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.frames_until_refresh = 0
+
+    def refresh(self):
+        """Render the p50/p95/p99 table for every phase"""
+        font = get_font('small')
+        lines = [f"{'phase':<8}{'p50':>7}{'p95':>7}{'p99':>7}  ms"]
+        for name, p50, p95, p99 in self.profiler.summary():
+            lines.append(f"{name:<8}{p50:>7.2f}{p95:>7.2f}{p99:>7.2f}")
+        line_height = font.get_linesize()
+        width = max(font.size(line)[0] for line in lines) + 16
+        self.surface = pygame.Surface((width, line_height * len(lines) + 12), pygame.SRCALPHA)
+        self.surface.fill((0, 0, 0, 190))  # Semi-transparent black
+        for i, line in enumerate(lines):
+            self.surface.blit(font.render(line, True, WHITE), (8, 6 + i * line_height))
+
+    def draw(self, renderer):
+        """Draw the overlay below the status panel, refreshing it a few times a second"""
+        if not self.visible:
+            return
+        if self.frames_until_refresh <= 0:
+            self.refresh()
+            self.frames_until_refresh = TIMING_OVERLAY_REFRESH
+        self.frames_until_refresh -= 1
+        renderer.blit(self.surface, (10, 50))
+
+# Queue sounds for the events reported by a simulation step; they start
+# together at the end of the frame (see SoundManager.flush())
+def play_event_sounds(events):
+    for kind, _ in events:
+        if kind == EVENT_BOMB_PLACED:
+            sound_manager.play('bomb_placed')
+        elif kind == EVENT_EXPLOSION:
+            sound_manager.play('explosion')
+        elif kind == EVENT_ENEMY_KILLED:
+            sound_manager.play('enemy_death')
+        elif kind == EVENT_PLAYER_KILLED:
+            sound_manager.play('player_death')
+        elif kind == EVENT_GAME_OVER and sound_enabled():
+            # Stop background music on game over
+            pygame.mixer.music.stop()
+
+# Restart background music if it was stopped
+def restart_music():
+    if sound_enabled():
+        if not pygame.mixer.music.get_busy():
+            pygame.mixer.music.play(-1)  # Loop indefinitely
+
+# Translate keyboard state into simulation actions
+def read_actions(timing_overlay=None):
+    """
+    Collect this frame's input.
     
-    # Game Over text
-    text = font_large.render("GAME OVER", True, RED)
-    text_rect = text.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 - 40))
-    window.blit(text, text_rect)
+    Args:
+        timing_overlay: TimingOverlay to toggle when F3 is pressed
     
-    # Restart instructions
-    restart_text = font_medium.render("Press R to Restart", True, WHITE)
-    restart_rect = restart_text.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 + 40))
-    window.blit(restart_text, restart_rect)
+    Returns:
+        Tuple of (ACTION_* bitmask, False if the player asked to quit)
+    """
+    running = True
+    actions = 0
+    for event in pygame.event.get():
+        if event.type == pygame.QUIT:
+            running = False
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                running = False
+            elif event.key == pygame.K_r:
+                actions |= ACTION_RESTART
+            elif event.key == pygame.K_i:
+                actions |= ACTION_ENTER_GATE
+            elif event.key == pygame.K_F3 and timing_overlay is not None:
+                timing_overlay.toggle()
+    
+    # Held keys for movement and bomb placement
+    keys = pygame.key.get_pressed()
+    if keys[pygame.K_LEFT]:
+        actions |= ACTION_LEFT
+    if keys[pygame.K_RIGHT]:
+        actions |= ACTION_RIGHT
+    if keys[pygame.K_UP]:
+        actions |= ACTION_UP
+    if keys[pygame.K_DOWN]:
+        actions |= ACTION_DOWN
+    if keys[pygame.K_x]:
+        actions |= ACTION_BOMB
+    return actions, running
 
-# Draw level complete screen
-def draw_level_complete():
-    # Semi-transparent overlay
-    overlay = pygame.Surface((WINDOW_WIDTH, WINDOW_HEIGHT), pygame.SRCALPHA)
-    overlay.fill((0, 0, 0, 180))  # Black with 70% opacity
-    window.blit(overlay, (0, 0))
+# Step the simulation and react to what happened
+def update_game(sim, renderer, actions, recorder=None):
+    """
+    Advance the game by one tick.
     
-    # Level complete text
-    text = font_large.render(f"LEVEL {CURRENT_LEVEL} COMPLETE!", True, YELLOW)
-    text_rect = text.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 - 40))
-    window.blit(text, text_rect)
+    Args:
+        recorder: InputRecorder that logs the actions for replays
     
-    # Next level instructions
-    next_level_text = font_medium.render("Press I to continue to next level", True, WHITE)
-    next_level_rect = next_level_text.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT // 2 + 40))
-    window.blit(next_level_text, next_level_rect)
+    Returns:
+        List of (kind, data) events from the simulation
+    """
+    events = recorder.step(sim, actions) if recorder is not None else sim.step(actions)
+    play_event_sounds(events)
+    # Restarting after game over brings the music back
+    if any(kind == EVENT_RESTART for kind, _ in events):
+        restart_music()
+    
+    # Re-render background tiles changed by explosions
+    for kind, cells in events:
+        if kind == EVENT_CELLS_CHANGED:
+            renderer.update_cells(cells)
+    return events
+
+# Draw the world, overlays and status panel
+def draw_frame(sim, renderer, profiler=None, timing_overlay=None, transition=None, motion=None):
+    """
+    Render one frame of the game.
+    
+    Args:
+        sim: Simulation to draw
+        renderer: Renderer drawing to the window (or an off-screen surface)
+        profiler: FrameProfiler that times the world and HUD phases
+        timing_overlay: TimingOverlay drawn on top of everything
+        transition: LevelTransition whose fade overlay is drawn while it runs
+        motion: MotionSnapshot to draw moving entities between ticks with
+    
+    Returns:
+        List of rectangles that changed, for pygame.display.update()
+    """
+    now = sim.now()
+    
+    # Follow the player, restore the background under last frame's drawing,
+    # then draw the world
+    player = sim.player
+    x, y = motion.player_position(player) if motion is not None else (player.x, player.y)
+    renderer.begin_frame(sim.grid, (x + player.width // 2, y + player.height // 2))
+    renderer.draw_world(sim, now, motion)
+    
+    if profiler is not None:
+        profiler.mark('world')
+    
+    # Game over and gate overlays plus the status panel, composited in advance
+    get_hud().draw(renderer, sim)
+    if transition is not None and transition.active:
+        get_hud().draw_transition(renderer, transition, sim.level)
+    
+    if timing_overlay is not None:
+        timing_overlay.draw(renderer)
+    
+    rects = renderer.end_frame()
+    if profiler is not None:
+        profiler.mark('hud')
+    return rects
 
 # Main game loop
-def main():
+def main(map_width=GRID_WIDTH, map_height=GRID_HEIGHT, vsync=VSYNC, render_fps=RENDER_FPS):
     """
-    Main game loop - handles initialization, input, updates, and rendering
+    Main game loop - handles input, steps the simulation and renders it
+    
+    The simulation runs FPS fixed ticks per second of real time, however
+    many frames that takes: a slow frame runs several ticks, a fast one may
+    run none, and the player and enemies are drawn between their last two
+    positions.
+    
+    Args:
+        map_width: Map width in tiles (maps larger than the window scroll)
+        map_height: Map height in tiles
+        vsync: Pace frames by the display's refresh
+        render_fps: Frame rate cap, 0 for none
     """
-    global CURRENT_LEVEL
     running = True
-    game_over = False
-    win = False
-    gate_found = False
-    next_level = False
-    game_over_time = 0
+    
+    # Show something right away, then wait only for what the game screen needs
+    init_display(vsync, render_fps)
+    start_loading()
+    draw_loading_screen()
+    startup_timer.mark('first frame')
+    wait_for(loader.resources['fonts'])
+    sprites = wait_for(loader.resources['sprites'])
+    
+    # Enemies far off-screen only need to update at full rate on maps that scroll
+    large_map = map_width > GRID_WIDTH or map_height > GRID_HEIGHT
+    # A fixed step per tick and a recorded seed make every session replayable
+    sim = Simulation(clock=FixedStepClock(dt=1 / FPS), width=map_width, height=map_height,
+                     far_radius=FAR_ENTITY_RADIUS if large_map else None,
+                     pursuit=ENEMY_PURSUIT, pregenerate=True)
+    recorder = InputRecorder(sim, FPS)
+    with startup_timer.step('renderer'):
+        renderer = Renderer(window, sprites)
+    profiler = FrameProfiler(FRAME_PHASES)
+    timing_overlay = TimingOverlay(profiler)
+    transition = LevelTransition()
+    stepper = StepAccumulator(dt=1 / FPS)
+    motion = MotionSnapshot()
+    pending_actions = 0  # Key presses waiting for the next tick
     
     # Initialize game function - called at start and when moving to next level
     def init_game(new_level=False):
@@ -822,218 +612,97 @@ def main():
         
         Args:
             new_level: If True, increment level counter
-            
-        Returns:
-            Tuple of (player, enemies, bombs) objects
         """
-        nonlocal game_over, win, gate_found, next_level, game_over_time
-        global grid
-        
-        # Reset game state
-        game_over = False
-        win = False
-        gate_found = False
-        next_level = False
-        game_over_time = 0
-        
-        # Increment level if starting a new level
-        global CURRENT_LEVEL
-        if new_level:
-            CURRENT_LEVEL += 1
-        
-        # Create a new grid layout
-        grid = create_grid()
-        
-        # Create player at position (1, 1) - first open cell
-        # Position player exactly in the center of the tile
-        player_x = TILE_SIZE + (TILE_SIZE - (TILE_SIZE - 10)) // 2
-        player_y = TILE_SIZE + (TILE_SIZE - (TILE_SIZE - 10)) // 2
-        player = Player(player_x, player_y)
-        
-        # Create enemies (more enemies on higher levels)
-        enemies = []
-        num_enemies = 3 + CURRENT_LEVEL - 1  # 3 enemies on level 1, 4 on level 2, etc.
-        for _ in range(num_enemies):
-            enemy_x, enemy_y = find_enemy_position()
-            enemies.append(Enemy(enemy_x, enemy_y))
-        
-        # List to store active bombs
-        bombs = []
-        
-        # Restart background music if it was stopped
-        if sound_enabled:
-            if not pygame.mixer.music.get_busy():
-                pygame.mixer.music.play(-1)  # Loop indefinitely
-        
-        return player, enemies, bombs
+        sim.reset(new_level=new_level)
+        recorder.mark_reset(new_level)
+        restart_music()
     
     # Initialize game objects
-    player, enemies, bombs = init_game()
+    init_game()
     
     # Main game loop
-    while running:
-        # ===== EVENT HANDLING =====
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                running = False
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
-                    running = False
-                elif event.key == pygame.K_r and (game_over or win):
-                    # Only allow restart after delay if game over
-                    if not game_over or (time.time() - game_over_time >= GAME_OVER_DELAY):
-                        # Restart the game
-                        player, enemies, bombs = init_game()
-                elif event.key == pygame.K_i and gate_found:
-                    # Press I to move to next level when on the gate
-                    next_level = True
-                    print("Moving to next level!")  # Debug message
-            elif event.type == pygame.KEYUP:
-                if event.key == pygame.K_x:
-                    player.can_place_bomb = True
-        
-        # ===== GAME LOGIC =====
-        if not game_over and not win and not next_level:
-            # Handle player movement
-            keys = pygame.key.get_pressed()
-            
-            # Only process movement input if player is not already moving and not dead
-            if not player.moving and not player.is_dead:
-                if keys[pygame.K_LEFT]:
-                    player.move(-player.vel, 0, grid)
-                elif keys[pygame.K_RIGHT]:
-                    player.move(player.vel, 0, grid)
-                elif keys[pygame.K_UP]:
-                    player.move(0, -player.vel, grid)
-                elif keys[pygame.K_DOWN]:
-                    player.move(0, player.vel, grid)
+    startup_reported = False
+    try:
+        while running:
+            profiler.begin_frame()
             
-            # Update player position (smooth movement)
-            player.update()
+            # ===== EVENT HANDLING =====
+            actions, running = read_actions(timing_overlay)
+            profiler.mark('input')
             
-            # Check for player collision with enemies
-            if player.check_enemy_collision(enemies):
-                game_over = True
-                game_over_time = time.time()
-                # Stop background music on game over
-                if sound_enabled:
-                    pygame.mixer.music.stop()
+            # Restarts go through a transition too instead of resetting inside step()
+            if actions & ACTION_RESTART:
+                actions &= ~ACTION_RESTART
+                if sim.can_restart():
+                    transition.start(KIND_RESTART, init_game, sim.levels.has_ready)
             
-            # Check if player is on the gate and all enemies are defeated
-            player_grid_x, player_grid_y = player.get_grid_position()
-            if grid[player_grid_y][player_grid_x] == 4 and len(enemies) == 0:  # Visible gate and all enemies defeated
-                gate_found = True
-                # Don't automatically go to next level - wait for 'I' key press
-            else:
-                gate_found = False  # Reset if player moves off the gate or if enemies still exist
+            # ===== GAME LOGIC =====
+            # Run the ticks that real time calls for. Held keys apply to every
+            # tick; a key press goes to one tick, the next one if none runs now
+            steps = stepper.steps()
+            pending_actions |= actions & ACTION_ENTER_GATE
+            actions &= ~ACTION_ENTER_GATE
+            # The finished level stays frozen on screen until the next one is swapped in
+            if transition.frozen:
+                steps = 0
+            for step in range(steps):
+                if step == steps - 1:
+                    motion.capture(sim)
+                update_game(sim, renderer, actions | pending_actions, recorder)
+                pending_actions = 0
+                if sim.level_complete:
+                    break
+            motion.alpha = stepper.alpha
             
-            # Update enemies
-            for enemy in enemies:
-                enemy.update()
+            # Handle next level transition without blocking the loop: the next
+            # level is prepared in the background and swapped in between frames
+            if sim.level_complete:
+                transition.start(KIND_NEXT_LEVEL, lambda: init_game(new_level=True), sim.levels.has_ready)
+            transition.update()
+            profiler.mark('update')
             
-            # Handle bomb placement with keyboard state
-            keys = pygame.key.get_pressed()
-            if keys[pygame.K_x] and player.can_place_bomb and not player.is_dead:
-                grid_x, grid_y = player.get_grid_position()
-                
-                # Check if there's already a bomb at this position
-                bomb_exists = False
-                for bomb in bombs:
-                    if bomb.grid_x == grid_x and bomb.grid_y == grid_y:
-                        bomb_exists = True
-                        break
-                
-                if not bomb_exists:
-                    bombs.append(Bomb(grid_x, grid_y))
-                    player.can_place_bomb = False
+            # Start this frame's sounds in one go, coalescing repeats
+            sound_manager.flush()
+            profiler.mark('audio')
             
-            # Reset bomb placement ability when X key is released
-            if not keys[pygame.K_x]:
-                player.can_place_bomb = True
+            # ===== RENDERING =====
+            # Update only the parts of the display that changed
+            rects = draw_frame(sim, renderer, profiler, timing_overlay, transition, motion)
+            pygame.display.update(rects)
+            profiler.mark('display')
             
-            # Update bombs
-            for bomb in bombs[:]:
-                enemies_to_remove, player_hit = bomb.update(enemies, player)
-                
-                # Check if player was hit
-                if player_hit and not player.is_dead:
-                    player.is_dead = True
-                    player.death_time = time.time()
-                    game_over = True
-                    game_over_time = time.time()
-                    # Stop background music on game over
-                    if sound_enabled:
-                        pygame.mixer.music.stop()
-                
-                # Remove enemies caught in explosion
-                for enemy in enemies_to_remove:
-                    if enemy in enemies:
-                        enemies.remove(enemy)
-                
-                if bomb.is_finished():
-                    bombs.remove(bomb)
-        
-        # Draw the grid
-        draw_grid(grid)
-        
-        # Draw bombs
-        for bomb in bombs:
-            bomb.draw()
-        
-        # Draw enemies
-        for enemy in enemies:
-            enemy.draw()
-        
-        # Draw the player
-        player.draw()
-        
-        # Draw game over screen if needed
-        if game_over:
-            draw_game_over()
-        
-        # Draw gate found message if on gate and all enemies are defeated
-        if gate_found:
-            # Draw a message to press I to enter the gate
-            overlay = pygame.Surface((WINDOW_WIDTH, 60), pygame.SRCALPHA)
-            overlay.fill((0, 0, 0, 150))  # Semi-transparent black
-            window.blit(overlay, (0, WINDOW_HEIGHT - 60))
+            # Report the startup breakdown once audio has finished loading too
+            if not startup_reported:
+                if profiler.frame_count == 0:
+                    startup_timer.mark('game frame')
+                if loader.done():
+                    print(startup_timer.report())
+                    startup_reported = True
             
-            gate_text = font_medium.render("Press I to enter the gate", True, YELLOW)
-            gate_rect = gate_text.get_rect(center=(WINDOW_WIDTH // 2, WINDOW_HEIGHT - 30))
-            window.blit(gate_text, gate_rect)
-        
-        # Handle next level transition
-        if next_level:
-            # Short delay before starting next level
-            pygame.time.delay(1000)
-            player, enemies, bombs = init_game(new_level=True)
-            next_level = False
-        
-        # Draw status panel at the top
-        status_height = 40
-        status_panel = pygame.Surface((WINDOW_WIDTH, status_height), pygame.SRCALPHA)
-        status_panel.fill((0, 0, 0, 180))  # Semi-transparent black
-        window.blit(status_panel, (0, 0))
-        
-        # Draw level indicator with better styling
-        level_text = font_medium.render(f"LEVEL: {CURRENT_LEVEL}", True, (255, 215, 0))  # Gold color
-        level_rect = level_text.get_rect(midleft=(20, status_height // 2))
-        window.blit(level_text, level_rect)
-        
-        # Draw enemies remaining indicator with color based on count
-        enemy_count = len(enemies)
-        enemy_color = (0, 255, 0) if enemy_count == 0 else (255, 100, 100)  # Green if all defeated, red otherwise
-        enemies_text = font_medium.render(f"ENEMIES: {enemy_count}", True, enemy_color)
-        enemies_rect = enemies_text.get_rect(midright=(WINDOW_WIDTH - 20, status_height // 2))
-        window.blit(enemies_text, enemies_rect)
-        
-        # Update the display
-        pygame.display.flip()
-        
-        # Control the frame rate
-        clock.tick(FPS)
+            # Cap the frame rate if asked to (a vsynced display.update() already waited)
+            clock.tick(frame_limit)
+            profiler.mark('idle')
+            profiler.end_frame()
+    finally:
+        # Keep the recorded frame times for offline analysis
+        frames = profiler.export_csv(FRAME_TIMES_CSV)
+        print(f"Wrote {frames} frame timings to {FRAME_TIMES_CSV}")
+        # Keep the session's inputs so it can be replayed with replay.py
+        recorder.save(sim, REPLAY_PATH)
+        print(f"Wrote {len(recorder.log)} recorded steps to {REPLAY_PATH}")
+        sim.levels.close()
+        loader.shutdown()
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Bomberman")
+    parser.add_argument('--map', default=f"{GRID_WIDTH}x{GRID_HEIGHT}",
+                        help="map size in tiles as WIDTHxHEIGHT, e.g. 201x201 for an arena")
+    parser.add_argument('--fps', type=int, default=RENDER_FPS,
+                        help="frame rate cap, 0 for none (the game speed does not depend on it)")
+    parser.add_argument('--no-vsync', dest='vsync', action='store_false',
+                        help="draw frames as fast as the cap allows instead of at the display's refresh")
+    args = parser.parse_args()
+    map_width, map_height = (int(size) for size in args.map.lower().split('x'))
+    main(map_width, map_height, args.vsync, args.fps)
     pygame.quit()
     sys.exit()
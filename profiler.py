@@ -0,0 +1,124 @@
+"""
+Per-phase frame timing.
+
+The main loop marks the end of each phase (input, simulation, world drawing,
+HUD, display update, frame pacing) and the profiler stores how long every
+phase took in a fixed-size ring buffer, so the cost of keeping the history
+never grows no matter how long the game runs. From the buffer it reports
+p50/p95/p99 per phase for the in-game overlay and writes the recorded frames
+to a CSV file on exit, which is enough to attribute stutter to a phase
+without attaching an external profiler.
+"""
+import csv
+import time
+
+FRAME_HISTORY = 3600  # Frames kept in the ring buffer (one minute at 60 FPS)
+PERCENTILES = (50, 95, 99)
+
+
+class FrameProfiler:
+    def __init__(self, phases, capacity=FRAME_HISTORY, timer=time.perf_counter):
+        """
+        Args:
+            phases: Phase names in the order the loop runs them
+            capacity: Number of frames kept in the ring buffer
+            timer: Function returning the current time in seconds
+        """
+        self.phases = list(phases)
+        self.capacity = capacity
+        self.timer = timer
+        # One preallocated row of durations (seconds) per phase
+        self.samples = {phase: [0.0] * capacity for phase in self.phases}
+        self.frame_numbers = [0] * capacity
+        self.frame_count = 0     # Frames recorded since the start
+        self.current = {}        # Durations of the frame being recorded
+        self.frame_start = None
+        self.last_mark = None
+
+    def __len__(self):
+        """Number of frames currently held in the buffer"""
+        return min(self.frame_count, self.capacity)
+
+    def begin_frame(self):
+        """Start timing a new frame"""
+        self.frame_start = self.last_mark = self.timer()
+        self.current = {}
+
+    def mark(self, phase):
+        """Record the time since the previous mark as the duration of a phase"""
+        now = self.timer()
+        self.current[phase] = self.current.get(phase, 0.0) + now - self.last_mark
+        self.last_mark = now
+
+    def end_frame(self):
+        """Store the finished frame in the ring buffer"""
+        if self.frame_start is None:
+            return
+        slot = self.frame_count % self.capacity
+        for phase in self.phases:
+            self.samples[phase][slot] = self.current.get(phase, 0.0)
+        self.frame_numbers[slot] = self.frame_count
+        self.frame_count += 1
+        self.frame_start = None
+
+    def ordered_slots(self):
+        """Buffer slots from the oldest to the newest recorded frame"""
+        if self.frame_count <= self.capacity:
+            return range(self.frame_count)
+        start = self.frame_count % self.capacity
+        return [(start + i) % self.capacity for i in range(self.capacity)]
+
+    def values(self, phase):
+        """Recorded durations of a phase in seconds (in buffer order)"""
+        return self.samples[phase][:len(self)]
+
+    def frame_totals(self):
+        """Total recorded time per frame in seconds (in buffer order)"""
+        count = len(self)
+        return [sum(self.samples[phase][slot] for phase in self.phases) for slot in range(count)]
+
+    def percentiles(self, values, percentiles=PERCENTILES):
+        """
+        Nearest-rank percentiles of a list of durations.
+
+        Returns:
+            Tuple with one value per requested percentile (zeros if empty)
+        """
+        if not values:
+            return tuple(0.0 for _ in percentiles)
+        ordered = sorted(values)
+        last = len(ordered) - 1
+        return tuple(ordered[min(last, int(round(p / 100 * last)))] for p in percentiles)
+
+    def summary(self):
+        """
+        Percentiles per phase and for the whole frame.
+
+        Returns:
+            List of (name, p50, p95, p99) with times in milliseconds
+        """
+        rows = []
+        for phase in self.phases:
+            rows.append((phase, *(value * 1000 for value in self.percentiles(self.values(phase)))))
+        rows.append(('frame', *(value * 1000 for value in self.percentiles(self.frame_totals()))))
+        return rows
+
+    def export_csv(self, path):
+        """
+        Write the buffered frames to a CSV file, oldest first.
+
+        Each row holds the frame number, the duration of each phase and the
+        frame total in milliseconds.
+
+        Returns:
+            Number of frames written
+        """
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', *(f'{phase}_ms' for phase in self.phases), 'total_ms'])
+            slots = self.ordered_slots()
+            for slot in slots:
+                durations = [self.samples[phase][slot] * 1000 for phase in self.phases]
+                writer.writerow([self.frame_numbers[slot], *(f'{d:.3f}' for d in durations),
+                                 f'{sum(durations):.3f}'])
+        return len(slots)
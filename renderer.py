@@ -0,0 +1,409 @@
+"""
+Dirty-rectangle renderer for the game world.
+
+Ground, walls and destructible blocks never move, so they are pre-rendered
+into chunk surfaces of CHUNK_TILES x CHUNK_TILES tiles. A camera follows the
+player over maps larger than the window; the chunks in view are composited
+into a window-sized background, so the cost of a frame depends on the window
+size and not on the map size. Chunks are rendered the first time they come
+into view and the least recently used ones are dropped.
+
+While the camera stands still, each frame only restores the background under
+whatever was drawn in the previous frame, draws the moving parts (gate,
+bombs, explosions, enemies, player) and reports the changed rectangles so
+the caller can push just those with pygame.display.update(). When the camera
+scrolls the whole window is redrawn. Pulsing and fading sprites come from
+pre-baked AnimationCache frames.
+
+Frames are drawn at the display's rate, not the simulation's tick rate, so a
+frame usually falls between two ticks. A MotionSnapshot holds the player and
+enemy positions from before the latest tick, and the player and enemies are
+drawn part of the way from there to where they are now.
+"""
+import math
+from array import array
+from collections import OrderedDict
+
+import pygame
+
+from animation import AnimationCache
+from simulation import TILE_SIZE, ENTITY_OFFSET, WALL, BLOCK, HIDDEN_GATE, GATE, BOMB_TIMER, BOMB_RANGE
+
+GATE_SCALE = (1.0, 1.1)  # Gate pulses between 100% and 110% of a tile
+BOMB_SCALE = (1.0, 1.2)  # Bombs pulse between 100% and 120% of their size
+CHUNK_TILES = 8          # Background chunks are CHUNK_TILES x CHUNK_TILES tiles
+MAX_CHUNKS = 48          # Chunk surfaces kept before the least recently used one is dropped
+
+
+class MotionSnapshot:
+    """Player and enemy positions before the latest simulation tick"""
+
+    def __init__(self):
+        self.alpha = 1.0         # Fraction of a tick the frame is past the latest one
+        self.players = {}        # Player -> (x, y) in pixels before the tick
+        self.enemy_store = None  # Enemy store the grid columns were copied from
+        self.enemy_x = array('i')
+        self.enemy_y = array('i')
+
+    def capture(self, sim):
+        """Remember the current positions (call right before a frame's last tick)"""
+        self.players = {player: (player.x, player.y) for player in sim.players}
+        store = sim.enemy_store
+        self.enemy_store = store
+        # Copying a whole column is one memcpy, cheaper than a lookup per enemy
+        self.enemy_x = array('i', store.columns['grid_x'])
+        self.enemy_y = array('i', store.columns['grid_y'])
+
+    def player_position(self, player):
+        """Pixel position to draw a player at"""
+        previous = self.players.get(player)
+        if previous is None:
+            return player.x, player.y
+        return blend(previous[0], player.x, self.alpha), blend(previous[1], player.y, self.alpha)
+
+    def enemy_position(self, enemy):
+        """Pixel position to draw an enemy at"""
+        store = enemy.store
+        # A new level brings a new store, and a kill moves rows around: draw
+        # those frames without blending rather than blend the wrong rows
+        if store is not self.enemy_store or len(store) != len(self.enemy_x):
+            return enemy.x, enemy.y
+        row = enemy.row
+        return (blend(self.enemy_x[row] * TILE_SIZE, enemy.grid_x * TILE_SIZE, self.alpha) + ENTITY_OFFSET,
+                blend(self.enemy_y[row] * TILE_SIZE, enemy.grid_y * TILE_SIZE, self.alpha) + ENTITY_OFFSET)
+
+
+def blend(previous, current, alpha):
+    """Whole pixel position alpha of the way from previous to current"""
+    return round(previous + (current - previous) * alpha)
+
+
+class Camera:
+    """Window-sized view onto the map, in world pixels"""
+
+    def __init__(self, view_width, view_height):
+        self.view_width = view_width
+        self.view_height = view_height
+        self.world_width = view_width
+        self.world_height = view_height
+        self.x = 0
+        self.y = 0
+
+    def set_world(self, world_width, world_height):
+        self.world_width = world_width
+        self.world_height = world_height
+        self.move_to(self.x, self.y)
+
+    def move_to(self, x, y):
+        """Put the view's top-left corner at (x, y), kept inside the map"""
+        self.x = int(max(0, min(x, self.world_width - self.view_width)))
+        self.y = int(max(0, min(y, self.world_height - self.view_height)))
+
+    def follow(self, x, y):
+        """Center the view on a world position"""
+        self.move_to(x - self.view_width // 2, y - self.view_height // 2)
+
+    def visible_tiles(self, margin=0):
+        """
+        Tile range covered by the view.
+
+        Returns:
+            Tuple of (first x, first y, last x + 1, last y + 1), widened by margin tiles
+        """
+        return (self.x // TILE_SIZE - margin, self.y // TILE_SIZE - margin,
+                (self.x + self.view_width - 1) // TILE_SIZE + 1 + margin,
+                (self.y + self.view_height - 1) // TILE_SIZE + 1 + margin)
+
+
+class Renderer:
+    def __init__(self, surface, sprites):
+        """
+        Args:
+            surface: Surface to draw on (usually the display window)
+            sprites: Sprite dictionary from create_sprite_images()
+        """
+        self.surface = surface
+        self.sprites = sprites
+        self.camera = Camera(*surface.get_size())
+        self.background = pygame.Surface(surface.get_size()).convert()  # Chunks in view, composited
+        self.background_origin = None  # Camera position the background was composited for
+        self.chunks = OrderedDict()    # (chunk x, chunk y) -> pre-rendered chunk surface
+        self.spare_chunks = {}         # (width, height) -> chunk surfaces to reuse
+        self.grid = None            # Grid the background was built from
+        self.gate_cells = []        # Revealed gates, drawn every frame because they pulse
+        self.previous_rects = []    # Rectangles drawn in the previous frame
+        self.dirty_rects = []       # Rectangles drawn on in the current frame
+        self.restored_rects = []    # Rectangles restored from the background in the current frame
+        self.full_redraw = True     # Redraw the whole surface on the next frame
+        self.animations = AnimationCache()
+        self.prebake_animations()
+
+    def prebake_animations(self):
+        """Render every animation frame up front so no frame pays for it"""
+        self.animations.scale_frames('gate', self.sprites['gate'], *GATE_SCALE)
+        self.animations.scale_frames('bomb', self.sprites['bomb'], *BOMB_SCALE)
+        for direction, image in self.sprites['player'].items():
+            self.animations.alpha_frames(f'player_{direction}', image)
+
+    # ===== BACKGROUND LAYER =====
+
+    def build_background(self, grid):
+        """Start drawing a new grid: drop the old chunks and find the revealed gates"""
+        self.grid = grid
+        # Keep the old chunk surfaces: writing to freshly allocated pixels is much
+        # slower than redrawing surfaces that are already in memory
+        for surface in self.chunks.values():
+            self.spare_chunks.setdefault(surface.get_size(), []).append(surface)
+        self.chunks.clear()
+        self.camera.set_world(grid.width * TILE_SIZE, grid.height * TILE_SIZE)
+        self.gate_cells = [(x, y) for y, row in enumerate(grid) for x, cell in enumerate(row) if cell == GATE]
+        self.background_origin = None
+        self.full_redraw = True
+
+    def chunk(self, chunk_x, chunk_y):
+        """Pre-rendered background chunk, rendered on first use"""
+        key = (chunk_x, chunk_y)
+        surface = self.chunks.get(key)
+        if surface is None:
+            first_x, first_y = chunk_x * CHUNK_TILES, chunk_y * CHUNK_TILES
+            width = min(CHUNK_TILES, self.grid.width - first_x)
+            height = min(CHUNK_TILES, self.grid.height - first_y)
+            size = (width * TILE_SIZE, height * TILE_SIZE)
+            spares = self.spare_chunks.get(size)
+            surface = spares.pop() if spares else pygame.Surface(size).convert()
+            for y in range(first_y, first_y + height):
+                row = self.grid[y]
+                for x in range(first_x, first_x + width):
+                    self.draw_tile(surface, row[x], ((x - first_x) * TILE_SIZE, (y - first_y) * TILE_SIZE))
+            self.chunks[key] = surface
+            # Evict the least recently used chunk when the cache is full
+            while len(self.chunks) > MAX_CHUNKS:
+                _, evicted = self.chunks.popitem(last=False)
+                self.spare_chunks.setdefault(evicted.get_size(), []).append(evicted)
+        else:
+            self.chunks.move_to_end(key)
+        return surface
+
+    def draw_tile(self, surface, cell, position):
+        """Draw the ground, wall or block of one cell (walls and blocks are opaque tiles)"""
+        if cell == WALL:  # Indestructible wall
+            surface.blit(self.sprites['wall'], position)
+        elif cell in (BLOCK, HIDDEN_GATE):  # Destructible block, possibly hiding the gate
+            surface.blit(self.sprites['block'], position)
+        else:
+            surface.blit(self.sprites['ground'], position)
+
+    def compose_background(self):
+        """Composite the chunks in view into the window-sized background"""
+        camera = self.camera
+        span = CHUNK_TILES * TILE_SIZE
+        for chunk_y in range(camera.y // span, (camera.y + camera.view_height - 1) // span + 1):
+            for chunk_x in range(camera.x // span, (camera.x + camera.view_width - 1) // span + 1):
+                if chunk_x * CHUNK_TILES < self.grid.width and chunk_y * CHUNK_TILES < self.grid.height:
+                    self.background.blit(self.chunk(chunk_x, chunk_y),
+                                         (chunk_x * span - camera.x, chunk_y * span - camera.y))
+        self.background_origin = (camera.x, camera.y)
+
+    def draw_background_tile(self, x, y):
+        """Redraw a single background tile from the current grid"""
+        cell = self.grid[y][x]
+        if cell == GATE and (x, y) not in self.gate_cells:  # Visible gate
+            self.gate_cells.append((x, y))
+
+        # Update the chunk if it is rendered (otherwise it picks the change up when it is)
+        chunk = self.chunks.get((x // CHUNK_TILES, y // CHUNK_TILES))
+        if chunk is not None:
+            self.draw_tile(chunk, cell, ((x % CHUNK_TILES) * TILE_SIZE, (y % CHUNK_TILES) * TILE_SIZE))
+        if self.background_origin is not None:
+            origin_x, origin_y = self.background_origin
+            self.draw_tile(self.background, cell, (x * TILE_SIZE - origin_x, y * TILE_SIZE - origin_y))
+
+    def update_cells(self, cells):
+        """
+        Re-render background tiles after the grid changed (e.g. destroyed blocks).
+
+        Args:
+            cells: List of (x, y) grid positions that changed
+        """
+        for x, y in cells:
+            self.draw_background_tile(x, y)
+            # Restored from the new background and pushed on the next frame
+            self.previous_rects.append(self.world_rect(x * TILE_SIZE, y * TILE_SIZE, TILE_SIZE, TILE_SIZE))
+
+    def world_rect(self, x, y, width, height):
+        """Window rectangle of an area given in world pixels"""
+        return pygame.Rect(x - self.camera.x, y - self.camera.y, width, height)
+
+    # ===== FRAME LIFECYCLE =====
+
+    def begin_frame(self, grid, focus=None):
+        """
+        Restore the background under everything drawn in the previous frame.
+
+        Args:
+            grid: The current grid - a new grid object rebuilds the background
+            focus: World position (x, y) the camera should center on
+        """
+        if grid is not self.grid:
+            self.build_background(grid)
+        if focus is not None:
+            self.camera.follow(*focus)
+        if self.background_origin != (self.camera.x, self.camera.y):
+            # The camera scrolled: recomposite the background and redraw everything
+            self.compose_background()
+            self.full_redraw = True
+
+        self.dirty_rects = []
+        self.restored_rects = []
+        if self.full_redraw:
+            self.surface.blit(self.background, (0, 0))
+        else:
+            for rect in self.previous_rects:
+                self.surface.blit(self.background, rect, rect)
+            # The restored areas have to reach the screen too, but only this
+            # frame - they are not drawn on, so they are not restored again
+            self.restored_rects = self.previous_rects
+
+    def end_frame(self):
+        """
+        Finish the frame.
+
+        Returns:
+            List of rectangles to pass to pygame.display.update()
+        """
+        if self.full_redraw:
+            rects = [self.surface.get_rect()]
+        else:
+            rects = self.restored_rects + self.dirty_rects
+        self.previous_rects = [rect for rect in self.dirty_rects if rect.width and rect.height]
+        self.full_redraw = False
+        return rects
+
+    def mark_dirty(self, rect):
+        """Record an area drawn this frame so it is restored and updated"""
+        self.dirty_rects.append(pygame.Rect(rect))
+
+    def invalidate(self):
+        """Redraw the whole surface on the next frame (e.g. for full-screen overlays)"""
+        self.full_redraw = True
+
+    def blit(self, image, position):
+        """Draw an image on the surface and mark its area dirty"""
+        self.mark_dirty(self.surface.blit(image, position))
+
+    def blit_world(self, image, position):
+        """Draw an image at a world position, skipping it when it is out of view"""
+        x = position[0] - self.camera.x
+        y = position[1] - self.camera.y
+        width, height = image.get_size()
+        if x < self.camera.view_width and y < self.camera.view_height and x + width > 0 and y + height > 0:
+            self.mark_dirty(self.surface.blit(image, (x, y)))
+
+    # ===== WORLD DRAWING =====
+
+    def draw_world(self, sim, now, motion=None):
+        """
+        Draw everything that moves or animates on top of the background.
+
+        Args:
+            motion: MotionSnapshot to draw the player and enemies between
+                ticks with (None draws them where they are)
+        """
+        self.draw_gates(now)
+
+        # Draw bombs
+        for bomb in sim.bombs:
+            self.draw_bomb(bomb, now)
+
+        # Draw the enemies in view, found through the occupancy index
+        first_x, first_y, end_x, end_y = self.camera.visible_tiles(margin=1)
+        enemy_cells = sim.enemy_index.cells
+        for y in range(first_y, end_y):
+            for x in range(first_x, end_x):
+                for enemy in enemy_cells.get((x, y), ()):
+                    self.draw_enemy(enemy, motion.enemy_position(enemy) if motion is not None else None)
+
+        # Draw the player
+        player = sim.player
+        self.draw_player(player, now, motion.player_position(player) if motion is not None else None)
+
+    def draw_gates(self, now):
+        # Use the simulation time for gate animation
+        pulse = (math.sin(now * 8) + 1) / 2  # Value between 0 and 1
+
+        # Apply pulsing effect to make gate more noticeable
+        scaled_gate, offset = self.animations.scaled('gate', self.sprites['gate'], *GATE_SCALE, pulse)
+
+        for x, y in self.gate_cells:
+            # Center the scaled gate in the tile
+            self.blit_world(scaled_gate, (x * TILE_SIZE - offset, y * TILE_SIZE - offset))
+
+    def draw_enemy(self, enemy, position=None):
+        """Draw the enemy on the screen with animation, at position if given"""
+        # Get the appropriate enemy sprite
+        enemy_sprite = self.sprites['enemies'][enemy.sprite_index % len(self.sprites['enemies'])]
+
+        # Apply a simple bounce effect for animation
+        bounce_offset = 0
+        if enemy.animation_frame == 1:
+            bounce_offset = 2  # Move up 2 pixels in second frame
+
+        x, y = position if position is not None else (enemy.x, enemy.y)
+        self.blit_world(enemy_sprite, (x, y - bounce_offset))
+
+    def draw_bomb(self, bomb, now):
+        """Draw a bomb, or its explosion once it has gone off"""
+        if not bomb.exploded:
+            # Calculate bomb pulsing effect based on time remaining
+            time_ratio = (now - bomb.placed_time) / BOMB_TIMER
+            pulse = abs(math.sin(time_ratio * 10))
+
+            # Pick the pre-scaled bomb frame and center it
+            scaled_bomb, offset = self.animations.scaled('bomb', self.sprites['bomb'], *BOMB_SCALE, pulse)
+            self.blit_world(scaled_bomb, (bomb.x - offset, bomb.y - offset))
+        else:
+            # Don't draw anything if explosion is over
+            if now - bomb.explosion_time > bomb.explosion_duration:
+                return
+
+            # Draw explosion
+            self.draw_explosion(bomb)
+
+    def draw_explosion(self, bomb):
+        # Draw center explosion
+        self.blit_world(self.sprites['explosion_center'],
+                        (bomb.grid_x * TILE_SIZE, bomb.grid_y * TILE_SIZE))
+
+        # Draw explosion in four directions
+        directions = [(0, -1, 'vertical'), (0, 1, 'vertical'),
+                      (-1, 0, 'horizontal'), (1, 0, 'horizontal')]
+
+        for dx, dy, sprite_type in directions:
+            # Check each direction
+            for i in range(1, BOMB_RANGE + 1):
+                x = bomb.grid_x + dx * i
+                y = bomb.grid_y + dy * i
+
+                # Check if position is within affected tiles
+                if (x, y) not in bomb.affected_tiles:
+                    break
+
+                # Draw explosion segment
+                if i == BOMB_RANGE or (x + dx, y + dy) not in bomb.affected_tiles:  # End of explosion
+                    self.blit_world(self.sprites['explosion_end'], (x * TILE_SIZE, y * TILE_SIZE))
+                else:  # Middle of explosion
+                    self.blit_world(self.sprites[f'explosion_{sprite_type}'], (x * TILE_SIZE, y * TILE_SIZE))
+
+    def draw_player(self, player, now, position=None):
+        """Draw the player, fading out after death, at position if given"""
+        if position is None:
+            position = (player.x, player.y)
+        # If player is dead, draw with transparency effect
+        if player.is_dead:
+            # Fade out over one second using the pre-baked alpha frames
+            opacity = 1.0 - (now - player.death_time)
+            faded = self.animations.faded(f'player_{player.direction}',
+                                          self.sprites['player'][player.direction], opacity)
+            self.blit_world(faded, position)
+        else:
+            self.blit_world(self.sprites['player'][player.direction], position)
@@ -0,0 +1,318 @@
+"""
+Session recording and replay.
+
+A session is recorded as the simulation's master seed and settings plus one
+byte per simulation step: the ACTION_* bits main() passed to step() (arrow
+keys, X and I) and two marker bits for the level resets that happened before
+that step (a restart with R, or the move to the next level). Steps are
+run-length encoded, since keys are held for many ticks in a row, so a minute
+of play takes a few hundred bytes to a few KB. Every CHECKPOINT_INTERVAL
+steps the recorder also stores a short hash of the game state.
+
+Because the game runs on a fixed-step clock and every random number comes
+from the seeded streams, replaying the bytes into a fresh simulation gives
+the same game. The player checks the state hashes on the way, so a replay
+that went out of sync is reported at the first checkpoint that differs.
+Headless playback runs as fast as the CPU allows; --render shows it in the
+game window.
+
+Usage:
+    python replay.py last_session.replay            # headless, verify checkpoints
+    python replay.py last_session.replay --render   # watch it (add --fast to skip pacing)
+"""
+import argparse
+import hashlib
+import struct
+import sys
+import time
+
+from clock import FixedStepClock
+from simulation import (
+    Simulation, ACTION_LEFT, ACTION_RIGHT, ACTION_UP, ACTION_DOWN, ACTION_BOMB, ACTION_ENTER_GATE,
+    ACTION_RESTART, EVENT_CELLS_CHANGED,
+)
+
+REPLAY_MAGIC = b'BMRP'
+REPLAY_VERSION = 2  # Bumped when a rule change makes old logs play out differently (2: enemies avoid pending blasts)
+CHECKPOINT_INTERVAL = 600  # Steps between state hashes (10 seconds at 60 FPS)
+HASH_SIZE = 8              # Bytes per state hash
+
+# Magic, version, flags, seed, start level, width, height, steps per second, far radius (0 = none)
+HEADER = struct.Struct('<4sBBQHHHHH')
+FLAG_PURSUIT = 1
+
+# Bits of a recorded step: the actions passed to step() plus reset markers
+ACTION_MASK = (ACTION_LEFT | ACTION_RIGHT | ACTION_UP | ACTION_DOWN | ACTION_BOMB | ACTION_ENTER_GATE)
+MARK_RESTART = ACTION_RESTART  # The level was (re)started before this step
+MARK_NEXT_LEVEL = 128          # The next level was started before this step
+
+
+def write_varint(out, value):
+    """Append an unsigned integer in 7-bit groups, low group first"""
+    while value >= 0x80:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def read_varint(data, offset):
+    """
+    Read an integer written by write_varint().
+
+    Returns:
+        Tuple of (value, offset after it)
+    """
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def state_hash(sim):
+    """Short hash of everything that decides how the game goes on"""
+    grid = sim.grid
+    player = sim.player
+    digest = hashlib.blake2b(digest_size=HASH_SIZE)
+    digest.update(bytes(grid.cell(x, y) for y in range(grid.height) for x in range(grid.width)))
+    state = (sim.level, sim.tick, sim.clock.now(), sim.game_over, sim.level_complete,
+             player.x, player.y, player.is_dead,
+             [(enemy.grid_x, enemy.grid_y) for enemy in sim.enemies],
+             [(bomb.grid_x, bomb.grid_y, bomb.exploded) for bomb in sim.bombs])
+    digest.update(repr(state).encode())
+    return digest.digest()
+
+
+class InputLog:
+    def __init__(self, seed, level, width, height, fps, far_radius=None, pursuit=False):
+        """
+        Args:
+            seed: Master seed of the simulation's random streams
+            level: Level the session started at
+            width: Map width in tiles
+            height: Map height in tiles
+            fps: Simulation steps per second (the fixed clock step is 1 / fps)
+            far_radius: Simulation far_radius setting
+            pursuit: Simulation pursuit setting
+        """
+        self.seed = seed
+        self.level = level
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.far_radius = far_radius
+        self.pursuit = pursuit
+        self.runs = []         # [step byte, repeat count] pairs
+        self.steps = 0
+        self.checkpoints = []  # (step number, state hash) pairs
+
+    def __len__(self):
+        """Number of recorded steps"""
+        return self.steps
+
+    def append(self, byte):
+        """Add one step, extending the last run if it repeats"""
+        if self.runs and self.runs[-1][0] == byte:
+            self.runs[-1][1] += 1
+        else:
+            self.runs.append([byte, 1])
+        self.steps += 1
+
+    def step_bytes(self):
+        """Recorded step bytes in order"""
+        for byte, count in self.runs:
+            for _ in range(count):
+                yield byte
+
+    def simulation(self):
+        """Fresh simulation with the recorded settings (reset by the first step's marker)"""
+        return Simulation(level=self.level, clock=FixedStepClock(dt=1 / self.fps), seed=self.seed,
+                          width=self.width, height=self.height, far_radius=self.far_radius,
+                          pursuit=self.pursuit)
+
+    def to_bytes(self):
+        flags = FLAG_PURSUIT if self.pursuit else 0
+        out = bytearray(HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, flags, self.seed, self.level,
+                                    self.width, self.height, self.fps, self.far_radius or 0))
+        write_varint(out, len(self.runs))
+        for byte, count in self.runs:
+            out.append(byte)
+            write_varint(out, count)
+        write_varint(out, len(self.checkpoints))
+        for step, digest in self.checkpoints:
+            write_varint(out, step)
+            out += digest
+        return bytes(out)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Parse a log written by to_bytes().
+
+        Raises:
+            ValueError: If the data is not a replay of this version
+        """
+        if len(data) < HEADER.size:
+            raise ValueError("not a replay file: too short")
+        magic, version, flags, seed, level, width, height, fps, far_radius = HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError("not a replay file or an unsupported replay version")
+        log = cls(seed, level, width, height, fps, far_radius or None, bool(flags & FLAG_PURSUIT))
+        offset = HEADER.size
+        run_count, offset = read_varint(data, offset)
+        for _ in range(run_count):
+            byte = data[offset]
+            count, offset = read_varint(data, offset + 1)
+            log.runs.append([byte, count])
+            log.steps += count
+        checkpoint_count, offset = read_varint(data, offset)
+        for _ in range(checkpoint_count):
+            step, offset = read_varint(data, offset)
+            log.checkpoints.append((step, bytes(data[offset:offset + HASH_SIZE])))
+            offset += HASH_SIZE
+        return log
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+
+class InputRecorder:
+    def __init__(self, sim, fps):
+        """
+        Args:
+            sim: Simulation being recorded, before its first reset (it must
+                run on a FixedStepClock with dt = 1 / fps)
+            fps: Simulation steps per second
+        """
+        self.log = InputLog(sim.rng.master_seed, sim.level, sim.width, sim.height, fps,
+                            sim.far_radius, sim.pursuit)
+        self.pending = 0  # Reset markers for the next recorded step
+
+    def mark_reset(self, new_level=False):
+        """Note that the front end reset the level (call after sim.reset())"""
+        self.pending |= MARK_NEXT_LEVEL if new_level else MARK_RESTART
+
+    def step(self, sim, actions):
+        """
+        Record the actions and step the simulation with them.
+
+        Returns:
+            The events returned by sim.step()
+        """
+        actions &= ACTION_MASK
+        self.log.append(actions | self.pending)
+        self.pending = 0
+        events = sim.step(actions)
+        if len(self.log) % CHECKPOINT_INTERVAL == 0:
+            self.log.checkpoints.append((len(self.log), state_hash(sim)))
+        return events
+
+    def save(self, sim, path):
+        """Add a checkpoint for the final state and write the log"""
+        # A reset after the last step is not in the log, so neither is its state
+        if self.pending:
+            self.log.save(path)
+            return
+        if self.log.steps and (not self.log.checkpoints or self.log.checkpoints[-1][0] != self.log.steps):
+            self.log.checkpoints.append((self.log.steps, state_hash(sim)))
+        self.log.save(path)
+
+
+def play(log, on_step=None):
+    """
+    Re-run a recorded session.
+
+    Args:
+        log: InputLog to play
+        on_step: Optional function (sim, events) called after every step; a
+            False return value stops the playback
+
+    Returns:
+        Tuple of (simulation in its final state, list of step numbers whose
+        state hash did not match the recording)
+    """
+    sim = log.simulation()
+    checkpoints = dict(log.checkpoints)
+    mismatches = []
+    for step, byte in enumerate(log.step_bytes(), 1):
+        if byte & MARK_NEXT_LEVEL:
+            sim.reset(new_level=True)
+        elif byte & MARK_RESTART:
+            sim.reset()
+        events = sim.step(byte & ACTION_MASK)
+        expected = checkpoints.get(step)
+        if expected is not None and state_hash(sim) != expected:
+            mismatches.append(step)
+        if on_step is not None and on_step(sim, events) is False:
+            break
+    return sim, mismatches
+
+
+def rendered_player(fps, fast=False):
+    """
+    Step callback that draws every step in the game window.
+
+    Args:
+        fps: Steps per second to pace the playback at
+        fast: If True, draw as fast as possible instead
+    """
+    import pygame
+    import main as game
+    from renderer import Renderer
+
+    game.init_display()
+    game.start_loading()
+    window = pygame.display.get_surface()
+    renderer = Renderer(window, game.wait_for(game.loader.resources['sprites']))
+    game.wait_for(game.loader.resources['fonts'])
+    clock = pygame.time.Clock()
+
+    def draw(sim, events):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                return False
+        for kind, cells in events:
+            if kind == EVENT_CELLS_CHANGED:
+                renderer.update_cells(cells)
+        pygame.display.update(game.draw_frame(sim, renderer))
+        if not fast:
+            clock.tick(fps)
+        return True
+    return draw
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded Bomberman session")
+    parser.add_argument('path', help="replay file written by the game")
+    parser.add_argument('--render', action='store_true', help="show the replay in the game window")
+    parser.add_argument('--fast', action='store_true', help="with --render, do not pace to the recorded speed")
+    args = parser.parse_args()
+
+    log = InputLog.load(args.path)
+    on_step = rendered_player(log.fps, args.fast) if args.render else None
+    start = time.perf_counter()
+    sim, mismatches = play(log, on_step)
+    elapsed = time.perf_counter() - start
+
+    minutes, seconds = divmod(len(log) / log.fps, 60)
+    print(f"Replayed {len(log)} steps ({int(minutes)}:{seconds:04.1f} of game time) in {elapsed:.2f}s, "
+          f"seed {log.seed}, ended on level {sim.level}")
+    if mismatches:
+        print(f"Out of sync: {len(mismatches)} of {len(log.checkpoints)} checkpoints differ, "
+              f"first at step {mismatches[0]}")
+        return 1
+    print(f"All {len(log.checkpoints)} checkpoints match")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
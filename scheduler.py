@@ -0,0 +1,92 @@
+"""
+Central event scheduler.
+
+Instead of every bomb and enemy comparing its own timestamp with the clock
+on every tick, timed work is registered here once ("bomb fuse expired at
+t=12.0", "enemy move due at t=3.0") and the simulation only handles the
+events that are due. Events are kept in a binary heap ordered by
+(time, sequence number), so events due at the same time always fire in the
+order they were scheduled, and cancelled events are skipped lazily.
+"""
+import heapq
+
+
+class Timer:
+    """Handle for a scheduled event"""
+    __slots__ = ('time', 'seq', 'kind', 'target', 'cancelled')
+
+    def __init__(self, time, seq, kind, target):
+        self.time = time
+        self.seq = seq
+        self.kind = kind
+        self.target = target
+        self.cancelled = False
+
+    def __repr__(self):
+        return f"Timer({self.kind!r}, time={self.time}, cancelled={self.cancelled})"
+
+
+class Scheduler:
+    def __init__(self):
+        self.heap = []
+        self.seq = 0
+        self.live = 0  # Scheduled events that are not cancelled yet
+
+    def __len__(self):
+        return self.live
+
+    def clear(self):
+        """Drop every scheduled event"""
+        for _, _, timer in self.heap:
+            timer.cancelled = True
+        self.heap = []
+        self.live = 0
+
+    def schedule(self, time, kind, target=None):
+        """
+        Schedule an event.
+
+        Args:
+            time: Simulation time at which the event is due
+            kind: What happens (e.g. 'fuse', 'enemy_move')
+            target: Object the event applies to
+
+        Returns:
+            Timer handle that can be passed to cancel()
+        """
+        timer = Timer(time, self.seq, kind, target)
+        self.seq += 1
+        heapq.heappush(self.heap, (time, timer.seq, timer))
+        self.live += 1
+        return timer
+
+    def cancel(self, timer):
+        """Cancel a scheduled event (does nothing if it already fired)"""
+        if timer is not None and not timer.cancelled:
+            timer.cancelled = True
+            self.live -= 1
+
+    def next_time(self):
+        """Time of the next live event, or None if nothing is scheduled"""
+        while self.heap and self.heap[0][2].cancelled:
+            heapq.heappop(self.heap)
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, now):
+        """
+        Remove and return the events due at or before now.
+
+        Returns:
+            List of Timer objects in (time, scheduling order) order
+        """
+        due = []
+        heap = self.heap
+        while heap and heap[0][0] <= now:
+            timer = heapq.heappop(heap)[2]
+            if timer.cancelled:
+                continue
+            # A fired timer counts as done, so cancelling it later is a no-op
+            timer.cancelled = True
+            self.live -= 1
+            due.append(timer)
+        return due
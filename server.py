@@ -0,0 +1,844 @@
+"""
+Authoritative multiplayer server for 2-4 player matches.
+
+The server owns the game: every match is a Simulation with one player per
+client, stepped on a fixed tick by a single asyncio task that drives all the
+matches in the process. Clients only send their keys (an input message with a
+sequence number whenever the keys change); the server applies them on the
+next tick and sends each client only what changed during that tick:
+
+    cells changed by explosions, player and enemy moves, bombs placed,
+    exploded and removed, enemies killed, the game-over/gate flags, and the
+    sequence number of the client's last input it applied
+
+A tick where nothing changed for a client sends it nothing. The whole state
+goes out only when a match starts and when it moves to a new level.
+
+Messages are small struct-packed records, each framed with a varint length.
+The tick loop runs on an absolute schedule, so slow ticks do not make the
+rate drift, and a client whose unsent data piles up is dropped instead of
+slowing its match down.
+
+The loopback harness runs the same server with simulated clients in one
+process, connected through in-memory links with an optional delay, and
+reports bytes per tick, input latency and tick timing. At the end it checks
+that every client's copy of its match matches the server's.
+
+Usage:
+    python server.py --port 7777 --players 2           # serve matches over TCP
+    python server.py --connect localhost:7777           # a random bot client
+    python server.py --loopback --matches 50 --players 4 --latency 30
+"""
+import argparse
+import asyncio
+import random
+import struct
+import sys
+import time
+
+from clock import FixedStepClock
+from gamestate import DIRECTION_NAMES
+from replay import write_varint, read_varint
+from simulation import (
+    Simulation, ListGrid, MAX_PLAYERS,
+    ACTION_LEFT, ACTION_RIGHT, ACTION_UP, ACTION_DOWN, ACTION_BOMB, ACTION_ENTER_GATE, ACTION_RESTART,
+    EVENT_BOMB_PLACED, EVENT_EXPLOSION, EVENT_CELLS_CHANGED, EVENT_ENEMY_KILLED,
+)
+
+TICK_RATE = 60             # Server ticks per second
+DEFAULT_PORT = 7777
+NEXT_LEVEL_DELAY = 1.0     # Seconds between completing a level and starting the next one
+MAX_SEND_BACKLOG = 256 * 1024  # Unsent bytes after which a client is dropped
+MAX_INPUT_FRAME = 64       # Longest message a client may send
+
+# Keys held down (sent as they are) and keys pressed (applied once)
+HELD_ACTIONS = ACTION_LEFT | ACTION_RIGHT | ACTION_UP | ACTION_DOWN | ACTION_BOMB
+PRESSED_ACTIONS = ACTION_ENTER_GATE | ACTION_RESTART
+
+# Message types (first byte of a message)
+MSG_WELCOME = 1  # Server: your player number, players in the match, tick rate
+MSG_LEVEL = 2    # Server: the whole state of a new level
+MSG_DELTA = 3    # Server: what changed during one tick
+MSG_INPUT = 16   # Client: input sequence number and ACTION_* bits
+
+WELCOME = struct.Struct('<BBBH')         # Type, player number, player count, tick rate
+LEVEL = struct.Struct('<BIHHHB')         # Type, tick, level, width, height, status flags
+DELTA = struct.Struct('<BIH')            # Type, tick, last applied input sequence number
+INPUT = struct.Struct('<BHB')            # Type, sequence number, actions
+COUNT = struct.Struct('<H')
+PLAYER = struct.Struct('<HHB')           # Pixel x, pixel y, flags (direction | dead)
+ENTITY = struct.Struct('<HHH')           # Id, grid x, grid y
+
+# Delta records (a tag byte, then the record's fields)
+REC_CELL = 1           # x, y, new cell code
+REC_PLAYER = 2         # player number, then a PLAYER
+REC_ENEMY = 3          # an ENTITY: enemy moved
+REC_ENEMY_KILLED = 4   # enemy id
+REC_BOMB = 5           # an ENTITY: bomb placed
+REC_EXPLOSION = 6      # bomb id (its blast tiles follow from the grid)
+REC_BOMB_GONE = 7      # bomb id
+REC_STATUS = 8         # status flags
+CELL = struct.Struct('<BHHB')
+PLAYER_RECORD = struct.Struct('<BBHHB')
+ENTITY_RECORD = struct.Struct('<BHHH')
+ID_RECORD = struct.Struct('<BH')
+STATUS_RECORD = struct.Struct('<BB')
+
+# Status flags
+STATUS_GAME_OVER = 1
+STATUS_GATE_FOUND = 2
+STATUS_LEVEL_COMPLETE = 4
+PLAYER_DEAD = 4  # Player flags: bits 0-1 are the direction
+
+
+def frame(message):
+    """A message with its varint length prefix"""
+    out = bytearray()
+    write_varint(out, len(message))
+    out += message
+    return bytes(out)
+
+
+async def read_frame(reader, limit=None):
+    """
+    Read one length-prefixed message from a stream.
+
+    Raises:
+        asyncio.IncompleteReadError: If the stream ended
+        ValueError: If the message is longer than limit
+    """
+    length = shift = 0
+    while True:
+        byte = (await reader.readexactly(1))[0]
+        length |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            break
+        shift += 7
+        if shift > 28:
+            raise ValueError("bad frame length")
+    if limit is not None and length > limit:
+        raise ValueError(f"message of {length} bytes is over the {limit} byte limit")
+    return await reader.readexactly(length)
+
+
+def status_flags(sim):
+    return ((STATUS_GAME_OVER if sim.game_over else 0) | (STATUS_GATE_FOUND if sim.gate_found else 0) |
+            (STATUS_LEVEL_COMPLETE if sim.level_complete else 0))
+
+
+def player_fields(player):
+    """What clients see of a player: pixel position, direction and whether it is dead"""
+    flags = DIRECTION_NAMES.index(player.direction) | (PLAYER_DEAD if player.is_dead else 0)
+    return int(player.x), int(player.y), flags
+
+
+# ===== SERVER SIDE =====
+
+class DeltaEncoder:
+    """
+    Turns a simulation's ticks into messages.
+
+    Enemies and bombs get small numeric ids. The encoder remembers what it
+    last sent about every entity and only encodes differences.
+    """
+
+    def __init__(self, sim):
+        self.sim = sim
+        self.grid = None     # Grid of the level the clients have; a new grid means a new level
+        self.enemy_ids = {}  # enemy -> id
+        self.bomb_ids = {}   # bomb -> id
+        self.next_bomb_id = 0
+        self.players = []    # Last sent player_fields() per player
+        self.enemies = {}    # enemy -> last sent grid position
+        self.status = 0
+
+    def level_message(self):
+        """The whole state of the current level (resets what the encoder has sent)"""
+        sim = self.sim
+        grid = self.grid = sim.grid
+        self.enemy_ids = {enemy: i for i, enemy in enumerate(sim.enemies)}
+        self.bomb_ids = {bomb: i for i, bomb in enumerate(sim.bombs)}
+        self.next_bomb_id = len(sim.bombs)
+        self.players = [player_fields(player) for player in sim.players]
+        self.enemies = {enemy: (enemy.grid_x, enemy.grid_y) for enemy in sim.enemies}
+        self.status = status_flags(sim)
+
+        out = bytearray(LEVEL.pack(MSG_LEVEL, sim.tick, sim.level, grid.width, grid.height, self.status))
+        out += bytes(grid.cell(x, y) for y in range(grid.height) for x in range(grid.width))
+        out.append(len(self.players))
+        for fields in self.players:
+            out += PLAYER.pack(*fields)
+        out += COUNT.pack(len(sim.enemies))
+        for enemy, enemy_id in self.enemy_ids.items():
+            out += ENTITY.pack(enemy_id, enemy.grid_x, enemy.grid_y)
+        out += COUNT.pack(len(sim.bombs))
+        for bomb, bomb_id in self.bomb_ids.items():
+            out += ENTITY.pack(bomb_id, bomb.grid_x, bomb.grid_y)
+            out.append(bomb.exploded)
+        return bytes(out)
+
+    def records(self, events):
+        """
+        Delta records for a tick that ran on the level the clients have.
+
+        Args:
+            events: Events returned by sim.step() for the tick
+
+        Returns:
+            bytes of records (empty if nothing the clients see changed)
+        """
+        sim = self.sim
+        out = bytearray()
+        # Events first, in the order they happened: an explosion comes before
+        # the cells it changed, so clients can work out its tiles
+        for kind, data in events:
+            if kind == EVENT_BOMB_PLACED:
+                bomb_id = self.bomb_ids[data] = self.next_bomb_id
+                self.next_bomb_id = (self.next_bomb_id + 1) & 0xFFFF
+                out += ENTITY_RECORD.pack(REC_BOMB, bomb_id, data.grid_x, data.grid_y)
+            elif kind == EVENT_EXPLOSION:
+                out += ID_RECORD.pack(REC_EXPLOSION, self.bomb_ids[data])
+            elif kind == EVENT_CELLS_CHANGED:
+                grid = sim.grid
+                for x, y in data:
+                    out += CELL.pack(REC_CELL, x, y, grid.cell(x, y))
+            elif kind == EVENT_ENEMY_KILLED:
+                out += ID_RECORD.pack(REC_ENEMY_KILLED, self.enemy_ids.pop(data))
+                del self.enemies[data]
+
+        # Bombs whose explosion ended since the last tick
+        if len(self.bomb_ids) > len(sim.bombs):
+            live = set(sim.bombs)
+            for bomb in [bomb for bomb in self.bomb_ids if bomb not in live]:
+                out += ID_RECORD.pack(REC_BOMB_GONE, self.bomb_ids.pop(bomb))
+
+        # Moves
+        for number, player in enumerate(sim.players):
+            fields = player_fields(player)
+            if fields != self.players[number]:
+                self.players[number] = fields
+                out += PLAYER_RECORD.pack(REC_PLAYER, number, *fields)
+        last = self.enemies
+        for enemy in sim.enemies:
+            position = (enemy.grid_x, enemy.grid_y)
+            if last[enemy] != position:
+                last[enemy] = position
+                out += ENTITY_RECORD.pack(REC_ENEMY, self.enemy_ids[enemy], *position)
+
+        status = status_flags(sim)
+        if status != self.status:
+            self.status = status
+            out += STATUS_RECORD.pack(REC_STATUS, status)
+        return bytes(out)
+
+
+class Match:
+    def __init__(self, peers, tick_rate=TICK_RATE, seed=None, **sim_options):
+        """
+        Args:
+            peers: Connected clients, one per player in player order
+            tick_rate: Ticks per second (the simulation clock steps 1 / tick_rate)
+            seed: Master seed of the match's simulation
+            sim_options: Further Simulation arguments (width, height, pursuit, ...)
+        """
+        self.tick_rate = tick_rate
+        self.sim = Simulation(clock=FixedStepClock(dt=1 / tick_rate), seed=seed, players=len(peers),
+                              **sim_options)
+        self.sim.reset()
+        self.encoder = DeltaEncoder(self.sim)
+        self.peers = list(peers)              # None once a client left
+        self.held = [0] * len(peers)          # Keys each player holds
+        self.pressed = [0] * len(peers)       # Keys pressed since the last tick
+        self.applied = [0] * len(peers)       # Sequence number of each player's latest input
+        self.acknowledged = [0] * len(peers)  # ... and the one last sent back to it
+        self.complete_ticks = 0               # Ticks since the level was completed
+        for number, peer in enumerate(self.peers):
+            peer.match, peer.number = self, number
+            peer.send(frame(WELCOME.pack(MSG_WELCOME, number, len(peers), tick_rate)))
+        self.broadcast_level()
+
+    @property
+    def empty(self):
+        return all(peer is None for peer in self.peers)
+
+    def receive_input(self, number, seq, actions):
+        """Take a player's input; it is applied on the next tick"""
+        self.held[number] = actions & HELD_ACTIONS
+        self.pressed[number] |= actions & PRESSED_ACTIONS
+        self.applied[number] = seq
+
+    def leave(self, number):
+        """A client left: its player stands still from now on"""
+        self.peers[number] = None
+        self.held[number] = self.pressed[number] = 0
+
+    def tick(self):
+        """
+        Advance the match by one tick and send every client what changed.
+
+        Returns:
+            Clients whose send backlog grew over MAX_SEND_BACKLOG
+        """
+        sim = self.sim
+        if sim.level_complete:
+            self.complete_ticks += 1
+            if self.complete_ticks >= NEXT_LEVEL_DELAY * self.tick_rate:
+                self.complete_ticks = 0
+                sim.reset(new_level=True)
+        actions = [held | pressed for held, pressed in zip(self.held, self.pressed)]
+        self.pressed = [0] * len(self.pressed)
+        events = sim.step(actions)
+
+        if sim.grid is not self.encoder.grid:
+            # Restarted or moved on: the clients need the whole new level
+            self.broadcast_level()
+            records = b''
+        else:
+            records = self.encoder.records(events)
+
+        slow = []
+        for number, peer in enumerate(self.peers):
+            if peer is None:
+                continue
+            ack = self.applied[number]
+            if records or ack != self.acknowledged[number]:
+                self.acknowledged[number] = ack
+                peer.send(frame(DELTA.pack(MSG_DELTA, sim.tick, ack) + records))
+                if peer.backlog() > MAX_SEND_BACKLOG:
+                    slow.append(peer)
+        return slow
+
+    def broadcast_level(self):
+        message = frame(self.encoder.level_message())
+        for peer in self.peers:
+            if peer is not None:
+                peer.send(message)
+
+
+class StreamPeer:
+    """A client connected over an asyncio stream"""
+
+    def __init__(self, writer):
+        self.writer = writer
+        self.match = None
+        self.number = None
+        self.bytes_sent = 0
+
+    def send(self, data):
+        self.bytes_sent += len(data)
+        self.writer.write(data)
+
+    def backlog(self):
+        """Bytes written but not yet handed to the OS"""
+        return self.writer.transport.get_write_buffer_size()
+
+    def close(self):
+        self.writer.close()
+
+
+class MatchServer:
+    def __init__(self, players=2, tick_rate=TICK_RATE, seed=None, **sim_options):
+        """
+        Args:
+            players: Players per match (2 to MAX_PLAYERS)
+            tick_rate: Ticks per second
+            seed: Seed for the match seeds (None for random matches)
+            sim_options: Simulation arguments for every match
+        """
+        if not 2 <= players <= MAX_PLAYERS:
+            raise ValueError(f"matches need 2 to {MAX_PLAYERS} players, not {players}")
+        self.players = players
+        self.tick_rate = tick_rate
+        self.rng = random.Random(seed)
+        self.sim_options = sim_options
+        self.lobby = []    # Clients waiting for a match to fill
+        self.matches = []
+        self.closed = False
+        self.ticks = 0
+        self.tick_times = []  # Seconds spent in each tick
+        self.lateness = []    # Seconds each tick started after its scheduled time
+
+    def connect(self, peer):
+        """A client connected: start a match once enough are waiting"""
+        self.lobby.append(peer)
+        if len(self.lobby) >= self.players:
+            peers, self.lobby = self.lobby[:self.players], self.lobby[self.players:]
+            self.matches.append(Match(peers, self.tick_rate, self.rng.getrandbits(64), **self.sim_options))
+
+    def disconnect(self, peer):
+        if peer in self.lobby:
+            self.lobby.remove(peer)
+        elif peer.match is not None:
+            peer.match.leave(peer.number)
+            peer.match = None
+
+    def receive(self, peer, message):
+        """
+        Handle a message from a client.
+
+        Raises:
+            ValueError: If the message is not a valid input message
+        """
+        if len(message) != INPUT.size or message[0] != MSG_INPUT:
+            raise ValueError("unexpected message from client")
+        if peer.match is not None:
+            _, seq, actions = INPUT.unpack(message)
+            peer.match.receive_input(peer.number, seq, actions)
+
+    def tick(self):
+        """Step every match once, dropping slow clients and finished matches"""
+        for match in self.matches:
+            for peer in match.tick():
+                self.disconnect(peer)
+                peer.close()
+        if any(match.empty for match in self.matches):
+            self.matches = [match for match in self.matches if not match.empty]
+        self.ticks += 1
+
+    async def run(self):
+        """
+        Tick all matches until close() is called.
+
+        Ticks follow an absolute schedule, so a slow tick is caught up by
+        sleeping less afterwards; if the server falls more than a second
+        behind it skips ahead instead of running a burst of ticks.
+        """
+        loop = asyncio.get_running_loop()
+        dt = 1 / self.tick_rate
+        next_tick = loop.time()
+        while not self.closed:
+            start = loop.time()
+            self.lateness.append(start - next_tick)
+            self.tick()
+            self.tick_times.append(loop.time() - start)
+            next_tick += dt
+            now = loop.time()
+            if now - next_tick > 1.0:
+                next_tick = now
+            await asyncio.sleep(max(0.0, next_tick - now))
+
+    def close(self):
+        self.closed = True
+
+    async def serve_stream(self, reader, writer):
+        """asyncio.start_server() callback: one TCP client"""
+        peer = StreamPeer(writer)
+        self.connect(peer)
+        try:
+            while True:
+                self.receive(peer, await read_frame(reader, MAX_INPUT_FRAME))
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self.disconnect(peer)
+            writer.close()
+
+
+# ===== CLIENT SIDE =====
+
+class MatchClient:
+    """
+    A client's copy of its match, kept up to date from the server's messages.
+
+    Also numbers the inputs it sends and measures the time until the server
+    reports having applied them.
+    """
+
+    def __init__(self, send, timer=time.perf_counter):
+        """
+        Args:
+            send: Function taking a framed message for the server
+            timer: Function returning the current time in seconds
+        """
+        self.send_frame = send
+        self.timer = timer
+        self.number = None         # Player number, from the welcome message
+        self.tick_rate = None
+        self.tick = 0
+        self.level = 0
+        self.grid = None           # ListGrid of cell codes
+        self.status = 0
+        self.players = []          # [x, y, flags] per player
+        self.enemies = {}          # id -> (x, y)
+        self.bombs = {}            # id -> [x, y, exploded]
+        self.explosions = {}       # id -> tiles of a bomb that went off
+        self.actions = 0
+        self.seq = 0
+        self.sent = {}             # seq -> time sent, until applied
+        self.latencies = []        # Seconds from sending an input to seeing it applied
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.level_bytes = 0       # Part of bytes_received that were whole levels
+
+    @property
+    def game_over(self):
+        return bool(self.status & STATUS_GAME_OVER)
+
+    @property
+    def gate_found(self):
+        return bool(self.status & STATUS_GATE_FOUND)
+
+    @property
+    def level_complete(self):
+        return bool(self.status & STATUS_LEVEL_COMPLETE)
+
+    def set_actions(self, actions):
+        """Send the keys if they changed (pressed keys are always sent)"""
+        if actions == self.actions and not actions & PRESSED_ACTIONS:
+            return
+        self.actions = actions & HELD_ACTIONS
+        self.seq = (self.seq + 1) & 0xFFFF
+        self.sent[self.seq] = self.timer()
+        message = frame(INPUT.pack(MSG_INPUT, self.seq, actions))
+        self.bytes_sent += len(message)
+        self.send_frame(message)
+
+    def receive(self, message):
+        """Apply one (unframed) message from the server"""
+        self.bytes_received += len(message) + 1  # Plus the length byte(s)
+        kind = message[0]
+        if kind == MSG_DELTA:
+            self.apply_delta(message)
+        elif kind == MSG_LEVEL:
+            self.level_bytes += len(message) + 1
+            self.apply_level(message)
+        elif kind == MSG_WELCOME:
+            _, self.number, _, self.tick_rate = WELCOME.unpack(message)
+
+    def apply_level(self, message):
+        _, self.tick, self.level, width, height, self.status = LEVEL.unpack_from(message)
+        offset = LEVEL.size
+        self.grid = ListGrid(list(message[offset + y * width:offset + (y + 1) * width]) for y in range(height))
+        offset += width * height
+        self.players = []
+        for _ in range(message[offset]):
+            self.players.append(list(PLAYER.unpack_from(message, offset + 1)))
+            offset += PLAYER.size
+        offset += 1
+        (count,) = COUNT.unpack_from(message, offset)
+        offset += COUNT.size
+        self.enemies = {}
+        for _ in range(count):
+            enemy_id, x, y = ENTITY.unpack_from(message, offset)
+            self.enemies[enemy_id] = (x, y)
+            offset += ENTITY.size
+        (count,) = COUNT.unpack_from(message, offset)
+        offset += COUNT.size
+        self.bombs = {}
+        self.explosions = {}
+        for _ in range(count):
+            bomb_id, x, y = ENTITY.unpack_from(message, offset)
+            exploded = bool(message[offset + ENTITY.size])
+            self.bombs[bomb_id] = [x, y, exploded]
+            if exploded:
+                self.explosions[bomb_id] = self.grid.explosion_area(x, y)
+            offset += ENTITY.size + 1
+
+    def apply_delta(self, message):
+        _, self.tick, ack = DELTA.unpack_from(message)
+        sent = self.sent.pop(ack, None)
+        if sent is not None:
+            self.latencies.append(self.timer() - sent)
+            # Inputs the server skipped (superseded before a tick) never come back
+            for seq in [seq for seq in self.sent if (ack - seq) & 0xFFFF < 0x8000]:
+                del self.sent[seq]
+        offset = DELTA.size
+        end = len(message)
+        while offset < end:
+            tag = message[offset]
+            if tag == REC_CELL:
+                _, x, y, code = CELL.unpack_from(message, offset)
+                self.grid.set_cell(x, y, code)
+                offset += CELL.size
+            elif tag == REC_PLAYER:
+                _, number, x, y, flags = PLAYER_RECORD.unpack_from(message, offset)
+                self.players[number] = [x, y, flags]
+                offset += PLAYER_RECORD.size
+            elif tag == REC_ENEMY:
+                _, enemy_id, x, y = ENTITY_RECORD.unpack_from(message, offset)
+                self.enemies[enemy_id] = (x, y)
+                offset += ENTITY_RECORD.size
+            elif tag == REC_BOMB:
+                _, bomb_id, x, y = ENTITY_RECORD.unpack_from(message, offset)
+                self.bombs[bomb_id] = [x, y, False]
+                offset += ENTITY_RECORD.size
+            elif tag == REC_STATUS:
+                self.status = message[offset + 1]
+                offset += STATUS_RECORD.size
+            else:
+                _, entity_id = ID_RECORD.unpack_from(message, offset)
+                offset += ID_RECORD.size
+                if tag == REC_ENEMY_KILLED:
+                    del self.enemies[entity_id]
+                elif tag == REC_EXPLOSION:
+                    bomb = self.bombs[entity_id]
+                    bomb[2] = True
+                    # The grid still holds the blocks this blast destroys (the cells follow)
+                    self.explosions[entity_id] = self.grid.explosion_area(bomb[0], bomb[1])
+                elif tag == REC_BOMB_GONE:
+                    del self.bombs[entity_id]
+                    self.explosions.pop(entity_id, None)
+                else:
+                    raise ValueError(f"unknown delta record {tag}")
+
+
+class RandomBot:
+    """Simulated player: holds random keys for a while, drops bombs, restarts and takes the gate"""
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.actions = 0
+        self.hold = 0  # Ticks left before picking new keys
+
+    def act(self, client):
+        if client.level_complete:
+            return 0
+        if client.game_over or client.gate_found:
+            # Press the key now and then, like a person would
+            if self.rng.random() < 0.05:
+                return ACTION_RESTART if client.game_over else ACTION_ENTER_GATE
+            return 0
+        if self.hold <= 0:
+            self.hold = self.rng.randint(5, 30)
+            self.actions = self.rng.choice((ACTION_LEFT, ACTION_RIGHT, ACTION_UP, ACTION_DOWN, 0))
+            if self.rng.random() < 0.1:
+                self.actions |= ACTION_BOMB
+        self.hold -= 1
+        return self.actions
+
+
+# ===== LOOPBACK HARNESS =====
+
+class LoopbackLink:
+    """
+    One direction of an in-memory connection: messages arrive after a delay
+    (plus random jitter) and in the order they were sent, like over TCP.
+    """
+
+    def __init__(self, deliver, latency=0.0, jitter=0.0, rng=random):
+        """
+        Args:
+            deliver: Function taking each (unframed) message on arrival
+            latency: One-way delay in seconds
+            jitter: Extra random delay of up to this many seconds
+        """
+        self.deliver = deliver
+        self.latency = latency
+        self.jitter = jitter
+        self.rng = rng
+        self.last_arrival = 0.0
+        self.in_flight = 0  # Bytes sent but not yet delivered
+        self.bytes = 0
+
+    def send(self, data):
+        """Send framed data: the frame is checked and stripped on arrival"""
+        length, offset = read_varint(data, 0)
+        if offset + length != len(data):
+            raise ValueError("loopback links carry exactly one frame per send")
+        self.bytes += len(data)
+        self.in_flight += len(data)
+        loop = asyncio.get_running_loop()
+        arrival = loop.time() + self.latency + self.rng.random() * self.jitter
+        self.last_arrival = arrival = max(arrival, self.last_arrival)
+        loop.call_at(arrival, self.arrive, data, offset)
+
+    def arrive(self, data, offset):
+        self.in_flight -= len(data)
+        self.deliver(data[offset:])
+
+
+class LoopbackPeer:
+    """The server's end of a loopback client"""
+
+    def __init__(self, link):
+        self.link = link
+        self.match = None
+        self.number = None
+        self.closed = False
+
+    def send(self, data):
+        if not self.closed:
+            self.link.send(data)
+
+    def backlog(self):
+        return self.link.in_flight
+
+    def close(self):
+        self.closed = True
+
+
+def percentile(values, fraction):
+    """Value below which the given fraction of values lie (0 for no values)"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def loopback_client(server, latency=0.0, jitter=0.0, rng=random):
+    """
+    Connect a new MatchClient to a server through a pair of loopback links.
+
+    Returns:
+        Tuple of (client, the server's peer for it)
+    """
+    client = MatchClient(None)
+    peer = LoopbackPeer(LoopbackLink(client.receive, latency, jitter, rng))
+    uplink = LoopbackLink(lambda message: server.receive(peer, message), latency, jitter, rng)
+    client.send_frame = uplink.send
+    server.connect(peer)
+    return client, peer
+
+
+def client_matches(client, sim):
+    """True if a client's copy of its match agrees with the server's simulation"""
+    grid = sim.grid
+    cells = [[grid.cell(x, y) for x in range(grid.width)] for y in range(grid.height)]
+    return (client.level == sim.level and [list(row) for row in client.grid] == cells and
+            client.players == [list(player_fields(player)) for player in sim.players] and
+            sorted(client.enemies.values()) == sorted((enemy.grid_x, enemy.grid_y) for enemy in sim.enemies) and
+            sorted(tuple(bomb) for bomb in client.bombs.values()) ==
+            sorted((bomb.grid_x, bomb.grid_y, bomb.exploded) for bomb in sim.bombs) and
+            client.status == status_flags(sim))
+
+
+async def drive_bots(clients, bots, tick_rate, running):
+    """Let each bot pick its client's keys once per tick while running() is True"""
+    loop = asyncio.get_running_loop()
+    next_tick = loop.time()
+    while running():
+        for client, bot in zip(clients, bots):
+            if client.grid is not None:
+                client.set_actions(bot.act(client))
+        next_tick += 1 / tick_rate
+        await asyncio.sleep(max(0.0, next_tick - loop.time()))
+
+
+async def loopback(matches=10, players=2, seconds=5.0, latency=0.0, jitter=0.0, seed=0, **sim_options):
+    """
+    Run a server with simulated clients over in-memory links.
+
+    Args:
+        matches: Matches to fill
+        players: Players per match
+        seconds: Wall-clock seconds to run
+        latency: One-way link delay in seconds
+        jitter: Extra random one-way delay of up to this many seconds
+        seed: Seed for the matches, the bots and the jitter
+        sim_options: Simulation arguments for every match
+
+    Returns:
+        Tuple of (server, list of MatchClient, number of clients whose copy
+        matches the server at the end)
+    """
+    rng = random.Random(seed)
+    server = MatchServer(players, seed=seed, **sim_options)
+    connections = [loopback_client(server, latency, jitter, rng) for _ in range(matches * players)]
+    clients = [client for client, _ in connections]
+    bots = [RandomBot(rng.getrandbits(32)) for _ in clients]
+
+    ticking = asyncio.ensure_future(server.run())
+    driving = asyncio.ensure_future(drive_bots(clients, bots, server.tick_rate, lambda: not server.closed))
+    await asyncio.sleep(seconds)
+    server.close()
+    await asyncio.gather(ticking, driving)
+
+    # Let everything in flight arrive, then compare every copy with its match
+    await asyncio.sleep(latency + jitter + 0.1)
+    in_sync = sum(client_matches(client, peer.match.sim) for client, peer in connections
+                  if peer.match is not None)
+    return server, clients, in_sync
+
+
+async def run_bot(host, port, seconds, seed=None):
+    """
+    Play a match on a TCP server with a RandomBot.
+
+    Returns:
+        The MatchClient after the given number of seconds
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    client = MatchClient(writer.write)
+    bot = RandomBot(seed)
+
+    async def receive():
+        while True:
+            client.receive(await read_frame(reader))
+
+    receiving = asyncio.ensure_future(receive())
+    deadline = time.perf_counter() + seconds
+    try:
+        await drive_bots([client], [bot], TICK_RATE, lambda: time.perf_counter() < deadline and
+                         not receiving.done())
+    finally:
+        receiving.cancel()
+        writer.close()
+    return client
+
+
+def report(server, clients, seconds):
+    """Print traffic, latency and tick timing"""
+    ticks = max(1, server.ticks)
+    received = sum(client.bytes_received for client in clients)
+    levels = sum(client.level_bytes for client in clients)
+    sent = sum(client.bytes_sent for client in clients)
+    latencies = [latency for client in clients for latency in client.latencies]
+    budget = 1 / server.tick_rate
+    print(f"{len(server.matches)} matches, {len(clients)} clients, {server.ticks} ticks in {seconds:.1f}s "
+          f"({server.ticks / seconds:.1f} per second, target {server.tick_rate})")
+    print(f"Down: {received / ticks / len(clients):.1f} bytes per tick per client "
+          f"({(received - levels) / ticks / len(clients):.1f} in deltas, the rest in whole levels)")
+    print(f"Up:   {sent / ticks / len(clients):.1f} bytes per tick per client")
+    print(f"Input latency: p50 {percentile(latencies, 0.5) * 1000:.1f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.1f} ms ({len(latencies)} inputs)")
+    print(f"Tick time: mean {sum(server.tick_times) / ticks * 1000:.2f} ms, "
+          f"p99 {percentile(server.tick_times, 0.99) * 1000:.2f} ms of {budget * 1000:.1f} ms; "
+          f"start lateness p99 {percentile(server.lateness, 0.99) * 1000:.2f} ms, "
+          f"{sum(late > budget for late in server.lateness)} ticks started over a tick late")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Authoritative Bomberman match server")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--players', type=int, default=2, help="players per match (2-4)")
+    parser.add_argument('--connect', metavar='HOST:PORT', help="play on a server with a random bot")
+    parser.add_argument('--loopback', action='store_true', help="run simulated clients in-process")
+    parser.add_argument('--matches', type=int, default=10, help="with --loopback, matches to run")
+    parser.add_argument('--seconds', type=float, default=5.0, help="with --loopback or --connect, run time")
+    parser.add_argument('--latency', type=float, default=0.0, help="with --loopback, one-way delay in ms")
+    parser.add_argument('--jitter', type=float, default=0.0, help="with --loopback, extra random delay in ms")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.loopback:
+        server, clients, in_sync = asyncio.run(loopback(args.matches, args.players, args.seconds,
+                                                        args.latency / 1000, args.jitter / 1000,
+                                                        args.seed or 0))
+        report(server, clients, args.seconds)
+        print(f"Client copies matching the server: {in_sync} of {len(clients)}")
+        return 0 if in_sync == len(clients) else 1
+
+    if args.connect:
+        host, _, port = args.connect.rpartition(':')
+        client = asyncio.run(run_bot(host, int(port), args.seconds, args.seed))
+        print(f"Player {client.number}, level {client.level}, tick {client.tick}: received "
+              f"{client.bytes_received} bytes, sent {client.bytes_sent}")
+        return 0
+
+    async def serve():
+        server = MatchServer(args.players, seed=args.seed)
+        listener = await asyncio.start_server(server.serve_stream, args.host, args.port)
+        print(f"Serving {args.players}-player matches on {args.host}:{args.port}")
+        async with listener:
+            await server.run()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,1063 @@
+"""
+Headless Bomberman simulation.
+
+This module holds the game rules - grid generation, player, enemies, bombs
+and the win/lose conditions - without touching pygame, the window, sprites
+or the mixer. The pygame front end in main.py renders on top of it, and batch
+jobs or tests can import it directly to run thousands of ticks per second.
+
+All timers read the simulation clock (see clock.py) and all randomness comes
+from seeded per-subsystem streams, so a run with a FixedStepClock and a seed
+is reproducible and can go as fast as the CPU allows.
+
+Usage:
+    sim = Simulation(clock=FixedStepClock(), seed=42)
+    sim.reset()
+    events = sim.step(ACTION_RIGHT | ACTION_BOMB)
+"""
+import random
+
+from clock import WallClock
+from scheduler import Scheduler
+from danger import DangerMap
+from entities import EntityStore, field, flag
+from flowfield import FlowField
+from levelgen import LevelQueue, open_components
+from spatial import OccupancyIndex
+
+# Game constants - these define the game's basic parameters
+GRID_WIDTH = 15      # Number of grid cells horizontally
+GRID_HEIGHT = 13     # Number of grid cells vertically
+TILE_SIZE = 50       # Size of each grid cell in world units (pixels on screen)
+PLAYER_SPEED = 5     # Player movement speed
+BOMB_TIMER = 2       # Seconds before a bomb explodes
+BOMB_RANGE = 3       # Number of tiles an explosion reaches in each direction
+EXPLOSION_DURATION = 0.5  # Seconds an explosion stays on screen
+DESTRUCTIBLE_BLOCK_CHANCE = 0.4  # 40% chance for a destructible block to appear
+ENEMY_MOVE_INTERVAL = 1.0  # Seconds between enemy movements
+ENEMY_ANIMATION_SPEED = 0.2  # Seconds per enemy animation frame
+ENEMY_SPRITE_COUNT = 3  # Number of enemy sprite variants the front end provides
+GAME_OVER_DELAY = 2.0  # Seconds to wait after game over before allowing restart
+FAR_UPDATE_FACTOR = 4  # Enemies far from the player move this many times less often (and do not animate)
+PLAYER_START = (1, 1)  # Grid cell the player starts on
+MAX_PLAYERS = 4  # Players a simulation can hold, one per corner of the map
+MAX_LEVEL_ATTEMPTS = 20  # Layouts tried before level generation gives up
+
+# Cell codes used in the grid
+EMPTY = 0        # Empty space
+WALL = 1         # Indestructible wall
+BLOCK = 2        # Destructible block
+HIDDEN_GATE = 3  # Gate covered by a destructible block
+GATE = 4         # Revealed gate
+
+# Up, Down, Left, Right
+DIRECTIONS = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+
+# Action bits passed to Simulation.step().
+# Movement and bomb bits describe keys held during the tick; ENTER_GATE and
+# RESTART describe keys pressed during the tick (like the KEYDOWN events
+# handled by the original main loop).
+ACTION_LEFT = 1
+ACTION_RIGHT = 2
+ACTION_UP = 4
+ACTION_DOWN = 8
+ACTION_BOMB = 16
+ACTION_ENTER_GATE = 32
+ACTION_RESTART = 64
+
+# Event kinds returned by Simulation.step()
+EVENT_BOMB_PLACED = 'bomb_placed'
+EVENT_EXPLOSION = 'explosion'
+EVENT_CELLS_CHANGED = 'cells_changed'
+EVENT_ENEMY_KILLED = 'enemy_killed'
+EVENT_PLAYER_KILLED = 'player_killed'
+EVENT_GAME_OVER = 'game_over'
+EVENT_GATE_FOUND = 'gate_found'
+EVENT_LEVEL_COMPLETE = 'level_complete'
+EVENT_RESTART = 'restart'
+
+# Scheduled event kinds (see scheduler.py)
+TIMER_FUSE = 'fuse'                      # Bomb fuse burnt down
+TIMER_EXPLOSION_OVER = 'explosion_over'  # Explosion finished, bomb can be removed
+TIMER_ENEMY_MOVE = 'enemy_move'          # Enemy takes a step
+TIMER_ENEMY_ANIMATION = 'enemy_animation'  # Enemy animation frame flips
+
+# Causes of death reported with EVENT_PLAYER_KILLED
+DEATH_BY_ENEMY = 'enemy'
+DEATH_BY_EXPLOSION = 'explosion'
+
+# Pixel size of the player, enemies and bombs - slightly smaller than a tile
+ENTITY_SIZE = TILE_SIZE - 10
+ENTITY_OFFSET = (TILE_SIZE - ENTITY_SIZE) // 2  # Pixels between a tile's corner and a centered entity's
+
+# Numeric fields of enemies and bombs kept in an EntityStore (see entities.py)
+ENEMY_FIELDS = (('grid_x', 'i'), ('grid_y', 'i'), ('last_move_time', 'd'), ('sprite_index', 'B'),
+                ('animation_frame', 'B'), ('animation_speed', 'd'), ('last_animation_time', 'd'))
+BOMB_FIELDS = (('grid_x', 'i'), ('grid_y', 'i'), ('placed_time', 'd'), ('exploded', 'B'),
+               ('explosion_time', 'd'), ('explosion_frames', 'i'))
+
+
+def tile_to_pixel(grid_x, grid_y):
+    """
+    Convert a grid position to the top-left pixel position of an entity
+    centered in that tile.
+    """
+    return grid_x * TILE_SIZE + ENTITY_OFFSET, grid_y * TILE_SIZE + ENTITY_OFFSET
+
+
+class RandomStreams:
+    """
+    Independent random number generators for each subsystem.
+
+    Giving every subsystem its own stream keeps runs reproducible for a seed
+    even when one subsystem draws a different amount of numbers (for example
+    when enemies are added or removed).
+    """
+
+    NAMES = ('grid', 'spawn', 'ai')
+
+    def __init__(self, seed=None):
+        """
+        Args:
+            seed: Master seed, or None for a random one
+        """
+        self.seed(seed)
+
+    def seed(self, seed=None):
+        """Reseed every stream from the master seed"""
+        if seed is None:
+            seed = random.getrandbits(64)
+        self.master_seed = seed
+        for name in self.NAMES:
+            setattr(self, name, random.Random(f"{seed}:{name}"))
+
+
+# Create the grid
+# 0 = empty space, 1 = indestructible wall, 2 = destructible block, 3 = hidden gate
+def create_grid(rng=random, width=GRID_WIDTH, height=GRID_HEIGHT, block_chance=DESTRUCTIBLE_BLOCK_CHANCE):
+    grid = [[EMPTY for _ in range(width)] for _ in range(height)]
+
+    # Set borders as indestructible walls
+    for x in range(width):
+        grid[0][x] = WALL  # Top border
+        grid[height-1][x] = WALL  # Bottom border
+
+    for y in range(height):
+        grid[y][0] = WALL  # Left border
+        grid[y][width-1] = WALL  # Right border
+
+    # Set every second cell as indestructible wall
+    for y in range(2, height-1, 2):
+        for x in range(2, width-1, 2):
+            grid[y][x] = WALL
+
+    # Add destructible blocks randomly, remembering the candidate cells and
+    # the blocks so the gate can be picked from a list instead of by retrying
+    candidates = []
+    blocks = []
+    for y in range(1, height):
+        for x in range(1, width):
+            # Skip indestructible walls
+            if grid[y][x] == WALL:
+                continue
+
+            # Keep starting area clear (3x3 area from top-left)
+            if (x <= 2 and y <= 2):
+                continue
+
+            candidates.append((x, y))
+
+            # Random chance to place a destructible block
+            if rng.random() < block_chance:
+                grid[y][x] = BLOCK
+                blocks.append((x, y))
+
+    # Place a hidden gate under one of the destructible blocks (on the rare
+    # board without blocks, under a new block on any candidate cell)
+    if not candidates:
+        raise ValueError("cannot place the gate: the board has no cell outside the start area")
+    gate_x, gate_y = rng.choice(blocks or candidates)
+    grid[gate_y][gate_x] = HIDDEN_GATE  # Mark as hidden gate (covered by destructible block)
+
+    return grid
+
+
+def player_starts(width=GRID_WIDTH, height=GRID_HEIGHT, count=1):
+    """
+    Start cells of the first count players: PLAYER_START, then the other
+    corners (top-right, bottom-left, bottom-right) on the nearest odd cell,
+    since cells with two even coordinates are walls.
+    """
+    if not 1 <= count <= MAX_PLAYERS:
+        raise ValueError(f"a simulation holds 1 to {MAX_PLAYERS} players, not {count}")
+    right = width - 2 if width % 2 else width - 3
+    bottom = height - 2 if height % 2 else height - 3
+    return [PLAYER_START, (right, 1), (1, bottom), (right, bottom)][:count]
+
+
+def near_start(x, y, starts):
+    """True if (x, y) is within two cells of a player start (no enemy spawns there)"""
+    return any(abs(x - start_x) <= 2 and abs(y - start_y) <= 2 for start_x, start_y in starts)
+
+
+def clear_start_area(grid, start_x, start_y):
+    """Remove the destructible blocks next to a start cell, like the 3x3 area left clear at the top-left"""
+    for y in range(start_y - 1, start_y + 2):
+        for x in range(start_x - 1, start_x + 2):
+            if grid.cell(x, y) == BLOCK:
+                grid.set_cell(x, y, EMPTY)
+
+
+def spawn_cells(grid):
+    """Empty cells away from the player start where enemies may spawn, row by row"""
+    return [(x, y) for y in range(1, grid.height - 1) for x in range(1, grid.width - 1)
+            if grid.cell(x, y) == EMPTY and not (x <= 3 and y <= 3)]
+
+
+# Find a valid position for an enemy (empty space)
+def find_enemy_position(grid, rng=random):
+    candidates = spawn_cells(grid)
+    if not candidates:
+        raise ValueError("no free cell left for an enemy")
+    return rng.choice(candidates)
+
+
+def generate_level(grid_factory, rng=random, width=GRID_WIDTH, height=GRID_HEIGHT, starts=(PLAYER_START,),
+                   block_chance=None):
+    """
+    Generate a level the player can finish.
+
+    Every cell that is not an indestructible wall is joined with its open
+    neighbours in a union-find structure. A layout is accepted when the gate
+    and every other start can be reached from the first player start once the
+    blocks are cleared and at least one spawn cell can be too; enemies only
+    spawn on the reachable ones.
+
+    Args:
+        grid_factory: Callable taking a random generator, a width and a height
+        rng: Random generator the layout is drawn from
+        starts: Player start cells (see player_starts()); the blocks around
+            all but the first are cleared, since the generator only keeps the
+            top-left corner free
+        block_chance: Chance of a destructible block on each free cell,
+            passed to grid_factory as a keyword (None keeps the factory's
+            default, DESTRUCTIBLE_BLOCK_CHANCE for the built-in grids)
+
+    Returns:
+        Tuple of (grid, list of reachable (x, y) enemy spawn cells)
+
+    Raises:
+        ValueError: If none of MAX_LEVEL_ATTEMPTS layouts was solvable
+    """
+    for _ in range(MAX_LEVEL_ATTEMPTS):
+        if block_chance is None:
+            grid = grid_factory(rng, width, height)
+        else:
+            grid = grid_factory(rng, width, height, block_chance=block_chance)
+        for start_x, start_y in starts[1:]:
+            clear_start_area(grid, start_x, start_y)
+        components = open_components(width, height, lambda x, y: grid.cell(x, y) != WALL)
+        start = starts[0][1] * width + starts[0][0]
+        starts_connected = all(components.connected(start, y * width + x) for x, y in starts[1:])
+        gate_reachable = False
+        spawns = []
+        for y in range(1, height - 1):
+            for x in range(1, width - 1):
+                cell = grid.cell(x, y)
+                if cell == HIDDEN_GATE:
+                    gate_reachable = components.connected(start, y * width + x)
+                elif cell == EMPTY and not near_start(x, y, starts) and components.connected(start, y * width + x):
+                    spawns.append((x, y))
+        if gate_reachable and starts_connected and spawns:
+            return grid, spawns
+    raise ValueError(f"no solvable {width}x{height} level in {MAX_LEVEL_ATTEMPTS} attempts")
+
+
+class ListGrid(list):
+    """
+    Grid stored as a list of rows of cell codes, indexed as grid[y][x].
+
+    This is the default grid backend. Other backends (see bitboard.py) provide
+    the same methods and the same grid[y][x] view of the 0-4 cell codes.
+    """
+
+    @classmethod
+    def generate(cls, rng=random, width=GRID_WIDTH, height=GRID_HEIGHT, block_chance=DESTRUCTIBLE_BLOCK_CHANCE):
+        """Create a new random level layout"""
+        return cls(create_grid(rng, width, height, block_chance))
+
+    @property
+    def width(self):
+        return len(self[0])
+
+    @property
+    def height(self):
+        return len(self)
+
+    def cell(self, x, y):
+        """Cell code at a grid position"""
+        return self[y][x]
+
+    def set_cell(self, x, y, code):
+        """Change the cell code at a grid position"""
+        self[y][x] = code
+
+    def is_empty(self, x, y):
+        """True if (x, y) is on the board and enemies may walk there"""
+        return 0 <= y < len(self) and 0 <= x < len(self[y]) and self[y][x] == EMPTY
+
+    def is_walkable(self, x, y):
+        """True if (x, y) is on the board and the player may walk there (empty space or gate)"""
+        return 0 <= y < len(self) and 0 <= x < len(self[y]) and self[y][x] in (EMPTY, GATE)
+
+    def explosion_area(self, center_x, center_y, reach=BOMB_RANGE):
+        """
+        Tiles reached by an explosion at the given position.
+
+        Returns:
+            List of (x, y) grid positions, starting with the center tile
+        """
+        # Add center tile
+        affected_tiles = [(center_x, center_y)]
+
+        # Check in four directions
+        for dx, dy in DIRECTIONS:
+            # Check each direction up to reach tiles
+            for i in range(1, reach + 1):
+                x = center_x + dx * i
+                y = center_y + dy * i
+
+                # Check if position is within grid bounds
+                if not (0 <= x < self.width and 0 <= y < self.height):
+                    break  # Stop this direction if out of bounds
+
+                # Check if there's an indestructible wall
+                if self[y][x] == WALL:
+                    break  # Stop this direction if it hits an indestructible wall
+
+                # Add to affected tiles
+                affected_tiles.append((x, y))
+
+                # Stop this direction if it hits a destructible block or hidden gate
+                # (but include the destructible block in the affected tiles)
+                if self[y][x] in (BLOCK, HIDDEN_GATE):
+                    break
+
+        return affected_tiles
+
+    def destroy_blocks(self, tiles):
+        """
+        Destroy destructible blocks and reveal hidden gates on the given tiles.
+
+        Returns:
+            List of (x, y) grid positions whose cell code changed
+        """
+        changed = []
+        for x, y in tiles:
+            if self[y][x] == BLOCK:  # Destructible block
+                self[y][x] = EMPTY  # Convert to empty space
+                changed.append((x, y))
+            elif self[y][x] == HIDDEN_GATE:  # Hidden gate
+                self[y][x] = GATE  # Reveal the gate
+                changed.append((x, y))
+        return changed
+
+    def find_enemy_position(self, rng=random):
+        """Pick a random empty cell away from the player start"""
+        return find_enemy_position(self, rng)
+
+
+def rects_overlap(ax, ay, bx, by, size=ENTITY_SIZE):
+    """Check whether two entity-sized squares at the given positions overlap"""
+    return ax < bx + size and bx < ax + size and ay < by + size and by < ay + size
+
+
+# Enemy class: a facade over one row of an EntityStore
+class Enemy:
+    __slots__ = ('store', 'row', 'occupancy', 'move_timer', 'animation_timer')
+
+    width = ENTITY_SIZE  # Slightly smaller than tile
+    height = ENTITY_SIZE
+    directions = DIRECTIONS  # Shared, move_randomly() shuffles a copy
+
+    grid_x = field('grid_x')
+    grid_y = field('grid_y')
+    last_move_time = field('last_move_time')
+    sprite_index = field('sprite_index')
+    animation_frame = field('animation_frame')
+    animation_speed = field('animation_speed')  # Seconds per frame
+    last_animation_time = field('last_animation_time')
+
+    def __init__(self, grid_x, grid_y, now, rng=random, store=None, sprite_index=None):
+        """
+        Initialize an enemy at the specified grid position.
+
+        Args:
+            grid_x: X position on the grid
+            grid_y: Y position on the grid
+            now: Current simulation time in seconds
+            rng: Random generator used to pick the sprite
+            store: EntityStore of ENEMY_FIELDS to keep the enemy in (a new
+                one-row store if not given)
+            sprite_index: Sprite to use instead of a random one
+        """
+        # Choose a random enemy sprite from available ones
+        if sprite_index is None:
+            sprite_index = rng.randint(0, ENEMY_SPRITE_COUNT - 1)
+        if store is None:
+            store = EntityStore(ENEMY_FIELDS)
+        store.add(self, {'grid_x': grid_x, 'grid_y': grid_y, 'last_move_time': now,
+                         'sprite_index': sprite_index, 'animation_frame': 0,
+                         'animation_speed': ENEMY_ANIMATION_SPEED, 'last_animation_time': now})
+        # Occupancy index to keep up to date when moving (set by the simulation)
+        self.occupancy = None
+        # Scheduled move and animation events (set by the simulation)
+        self.move_timer = None
+        self.animation_timer = None
+
+    @property
+    def x(self):
+        """Pixel position, derived from the grid position"""
+        return self.grid_x * TILE_SIZE + ENTITY_OFFSET
+
+    @property
+    def y(self):
+        return self.grid_y * TILE_SIZE + ENTITY_OFFSET
+
+    def update(self, grid, now, rng=random):
+        """Update enemy position and animation"""
+        # Move the enemy at regular intervals
+        if now >= self.last_move_time + ENEMY_MOVE_INTERVAL:
+            self.move_randomly(grid, rng)
+            self.last_move_time = now
+
+        # Update animation frame
+        if now >= self.last_animation_time + self.animation_speed:
+            self.animate(now)
+
+    def animate(self, now):
+        """Flip to the next animation frame"""
+        self.animation_frame = (self.animation_frame + 1) % 2  # Simple 2-frame animation
+        self.last_animation_time = now
+
+    def move_randomly(self, grid, rng=random, danger=None):
+        """
+        Move the enemy in a random valid direction
+
+        Args:
+            grid: The level grid
+            rng: Random generator used to pick the direction
+            danger: Optional DangerMap; cells a pending bomb will hit are avoided
+        """
+        # Try all directions in random order
+        directions = list(self.directions)
+        rng.shuffle(directions)
+
+        grid_x, grid_y = self.grid_x, self.grid_y
+        for dx, dy in directions:
+            new_grid_x = grid_x + dx
+            new_grid_y = grid_y + dy
+
+            # Check if the new position is valid (within bounds and empty)
+            if (grid.is_empty(new_grid_x, new_grid_y) and
+                    (danger is None or danger.is_safe(new_grid_x, new_grid_y))):
+                self.step_to(new_grid_x, new_grid_y)
+                break
+
+    def move_towards(self, grid, flow_field, rng=random, danger=None):
+        """Step towards the player along the flow field, or wander if out of its range"""
+        step = flow_field.next_step(self.grid_x, self.grid_y)
+        # The player's own cell may be one enemies cannot enter (the gate),
+        # and enemies do not walk into a blast that is about to go off
+        if (step is None or not grid.is_empty(*step) or
+                (danger is not None and not danger.is_safe(*step))):
+            self.move_randomly(grid, rng, danger)
+        else:
+            self.step_to(*step)
+
+    def step_to(self, new_grid_x, new_grid_y):
+        """Move to a neighbouring cell (the pixel position follows from it)"""
+        if self.occupancy is not None:
+            self.occupancy.move(self, self.grid_x, self.grid_y, new_grid_x, new_grid_y)
+        self.grid_x = new_grid_x
+        self.grid_y = new_grid_y
+
+    def is_in_explosion(self, affected_tiles):
+        """
+        Check if the enemy is in the explosion area
+
+        Args:
+            affected_tiles: List of (x,y) grid positions affected by explosion
+
+        Returns:
+            True if enemy is in explosion area, False otherwise
+        """
+        for x, y in affected_tiles:
+            if x == self.grid_x and y == self.grid_y:
+                return True
+        return False
+
+
+# Bomb class: a facade over one row of an EntityStore
+class Bomb:
+    __slots__ = ('store', 'row', 'affected_tiles', 'changed_cells', 'timer')
+
+    explosion_duration = EXPLOSION_DURATION  # seconds
+
+    grid_x = field('grid_x')
+    grid_y = field('grid_y')
+    placed_time = field('placed_time')
+    exploded = flag('exploded')
+    explosion_time = field('explosion_time')
+    explosion_frames = field('explosion_frames')  # For animation
+
+    def __init__(self, grid_x, grid_y, now, store=None):
+        """
+        Initialize a bomb at the specified grid position
+
+        Args:
+            grid_x: X position on the grid
+            grid_y: Y position on the grid
+            now: Current simulation time in seconds
+            store: EntityStore of BOMB_FIELDS to keep the bomb in (a new
+                one-row store if not given)
+        """
+        if store is None:
+            store = EntityStore(BOMB_FIELDS)
+        store.add(self, {'grid_x': grid_x, 'grid_y': grid_y, 'placed_time': now, 'exploded': False,
+                         'explosion_time': 0, 'explosion_frames': 0})
+        self.affected_tiles = []  # Store tiles affected by explosion
+        self.changed_cells = []  # Grid cells the explosion changed
+        self.timer = None  # Scheduled fuse or explosion-over event (set by the simulation)
+
+    @property
+    def x(self):
+        """Pixel position, derived from the grid position"""
+        return self.grid_x * TILE_SIZE + ENTITY_OFFSET
+
+    @property
+    def y(self):
+        return self.grid_y * TILE_SIZE + ENTITY_OFFSET
+
+    def update(self, grid, enemy_index, player, now):
+        """
+        Advance the bomb's fuse and explode it when the timer runs out.
+
+        Args:
+            grid: The level grid
+            enemy_index: OccupancyIndex of the live enemies
+            player: The player
+            now: Current simulation time in seconds
+
+        Returns:
+            Tuple of (enemies caught in the explosion, player hit status)
+        """
+        # Check if bomb should explode
+        if not self.exploded and now >= self.placed_time + BOMB_TIMER:
+            return self.explode(grid, enemy_index, player, now)
+
+        # Animate explosion
+        if self.exploded:
+            self.explosion_frames += 1
+
+        return [], False
+
+    def explode(self, grid, enemy_index, player, now):
+        """
+        Explode the bomb: destroy blocks and find what the blast hits.
+
+        Returns:
+            Tuple of (enemies caught in the explosion, player hit status)
+        """
+        self.exploded = True
+        self.explosion_time = now
+        self.calculate_explosion_area(grid)
+        self.changed_cells = self.destroy_blocks(grid)
+
+        # Check for enemies in explosion
+        enemies_hit = enemy_index.in_tiles(self.affected_tiles)
+
+        # Check if player is in explosion
+        player_hit = player.get_grid_position() in self.affected_tiles
+
+        return enemies_hit, player_hit
+
+    def calculate_explosion_area(self, grid):
+        self.affected_tiles.extend(grid.explosion_area(self.grid_x, self.grid_y))
+
+    def destroy_blocks(self, grid):
+        """
+        Destroy destructible blocks and reveal hidden gates in the explosion.
+
+        Returns:
+            List of (x, y) grid positions whose cell code changed
+        """
+        return grid.destroy_blocks(self.affected_tiles)
+
+    def explosion_end_time(self):
+        return self.explosion_time + self.explosion_duration
+
+    def is_finished(self, now):
+        return self.exploded and now >= self.explosion_end_time()
+
+
+# Player class (at most MAX_PLAYERS of them, so plain slots rather than a store)
+class Player:
+    __slots__ = ('x', 'y', 'vel', 'can_place_bomb', 'direction', 'grid_x', 'grid_y', 'target_x', 'target_y',
+                 'moving', 'is_dead', 'death_time')
+
+    width = ENTITY_SIZE  # Slightly smaller than tile
+    height = ENTITY_SIZE
+
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.vel = PLAYER_SPEED
+        self.can_place_bomb = True
+        self.direction = 'down'  # Default direction
+        self.grid_x = int(self.x + self.width // 2) // TILE_SIZE
+        self.grid_y = int(self.y + self.height // 2) // TILE_SIZE
+        self.target_x = self.x
+        self.target_y = self.y
+        self.moving = False
+        self.is_dead = False
+        self.death_time = 0
+
+    def move(self, dx, dy, grid):
+        # Don't move if dead
+        if self.is_dead:
+            return
+
+        # Set direction based on movement
+        if dx < 0:
+            self.direction = 'left'
+        elif dx > 0:
+            self.direction = 'right'
+        elif dy < 0:
+            self.direction = 'up'
+        elif dy > 0:
+            self.direction = 'down'
+
+        # If already moving, continue current movement
+        if self.moving:
+            return
+
+        # Calculate target grid position
+        if dx != 0 or dy != 0:
+            target_grid_x = self.grid_x
+            target_grid_y = self.grid_y
+
+            if dx < 0:
+                target_grid_x -= 1
+            elif dx > 0:
+                target_grid_x += 1
+            elif dy < 0:
+                target_grid_y -= 1
+            elif dy > 0:
+                target_grid_y += 1
+
+            # Check if target position is valid (empty space or gate)
+            if grid.is_walkable(target_grid_x, target_grid_y):
+                # Set target pixel position (center of the target tile)
+                self.target_x, self.target_y = tile_to_pixel(target_grid_x, target_grid_y)
+                self.grid_x = target_grid_x
+                self.grid_y = target_grid_y
+                self.moving = True
+
+    def update(self):
+        # If moving, continue movement toward target position
+        if self.moving:
+            # Calculate direction to target
+            dx = self.target_x - self.x
+            dy = self.target_y - self.y
+
+            # Calculate distance to move this tick
+            distance = min(self.vel, max(abs(dx), abs(dy)))
+
+            # Move toward target
+            if abs(dx) > 0:
+                self.x += (dx / abs(dx)) * distance
+            if abs(dy) > 0:
+                self.y += (dy / abs(dy)) * distance
+
+            # Check if we've reached the target
+            if abs(self.x - self.target_x) < self.vel and abs(self.y - self.target_y) < self.vel:
+                self.x = self.target_x
+                self.y = self.target_y
+                self.moving = False
+
+    def get_grid_position(self):
+        # Return the current grid position
+        return self.grid_x, self.grid_y
+
+    def covered_tiles(self):
+        """Grid cells the player's rectangle currently overlaps"""
+        left = int(self.x) // TILE_SIZE
+        top = int(self.y) // TILE_SIZE
+        right = int(self.x + self.width) // TILE_SIZE
+        bottom = int(self.y + self.height) // TILE_SIZE
+        return [(x, y) for y in range(top, bottom + 1) for x in range(left, right + 1)]
+
+    def check_enemy_collision(self, enemies):
+        """Return the first enemy touching the player, or None"""
+        # Don't check collisions if already dead
+        if self.is_dead:
+            return None
+
+        for enemy in enemies:
+            if rects_overlap(self.x, self.y, enemy.x, enemy.y):
+                return enemy
+        return None
+
+
+class Simulation:
+    """
+    The complete game state and rules for one to MAX_PLAYERS players.
+
+    The simulation never draws or plays sounds. step() returns a list of
+    (kind, data) events that a front end can turn into sounds and effects.
+    """
+
+    def __init__(self, level=1, clock=None, seed=None, grid_factory=None,
+                 width=GRID_WIDTH, height=GRID_HEIGHT, far_radius=None, pursuit=False,
+                 pregenerate=False, players=1, block_chance=None):
+        """
+        Args:
+            level: Level number to start at
+            clock: Time source (defaults to the wall clock)
+            seed: Master seed for the random streams, or None for a random one
+            grid_factory: Callable taking a random generator, a width and a height
+                and returning a new grid (defaults to ListGrid.generate, see also
+                BitboardGrid.generate)
+            width: Map width in tiles
+            height: Map height in tiles
+            far_radius: Enemies more than this many tiles from the player move
+                FAR_UPDATE_FACTOR times less often and stop animating (None
+                updates all of them at full rate)
+            pursuit: If True, enemies near the player chase it along a shared
+                flow field instead of wandering randomly
+            pregenerate: If True, a worker thread generates the next levels
+                ahead of time so reset() does not wait for generation
+            players: Number of players, each starting in a corner of the map
+                (see player_starts()); sim.player is the first of sim.players
+            block_chance: Chance of a destructible block on each free cell
+                (None uses DESTRUCTIBLE_BLOCK_CHANCE; see generate_level())
+        """
+        self.level = level
+        self.width = width
+        self.height = height
+        self.far_radius = far_radius
+        self.pursuit = pursuit
+        self.starts = player_starts(width, height, players)
+        self.block_chance = block_chance
+        self.flow_field = None  # Distances to the player, used when pursuit is on
+        self.danger = None      # DangerMap of the pending blasts, for the enemy AI and bots
+        self.clock = clock if clock is not None else WallClock()
+        self.rng = RandomStreams(seed)
+        self.grid_factory = grid_factory if grid_factory is not None else ListGrid.generate
+        # Levels drawn from the grid stream in order, possibly ahead of time
+        self.levels = LevelQueue(self.generate_level, self.rng.grid, background=pregenerate)
+        self.grid = None
+        self.players = []
+        self.player = None  # The first player (the only one in single-player games)
+        self.enemies = []
+        self.bombs = []
+        self.enemy_store = EntityStore(ENEMY_FIELDS)  # Enemy fields, one row per live enemy
+        self.bomb_store = EntityStore(BOMB_FIELDS)    # Bomb fields, one row per bomb on the board
+        self.enemy_index = OccupancyIndex()  # Enemies by grid cell
+        self.bomb_index = OccupancyIndex()   # Bombs by grid cell
+        self.scheduler = Scheduler()         # Fuses, explosions, enemy moves and animations
+        self.game_over = False
+        self.game_over_time = 0
+        self.gate_found = False
+        self.level_complete = False
+        self.tick = 0
+
+    def now(self):
+        """Current simulation time in seconds"""
+        return self.clock.now()
+
+    def reset(self, new_level=False, seed=None):
+        """
+        Initialize or reset the game state
+
+        Args:
+            new_level: If True, increment level counter
+            seed: If given, reseed the random streams before building the level
+        """
+        if seed is not None:
+            self.rng.seed(seed)
+            self.levels.restart(self.rng.grid)
+        if new_level:
+            self.level += 1
+
+        # Reset game state
+        self.game_over = False
+        self.game_over_time = 0
+        self.gate_found = False
+        self.level_complete = False
+        self.tick = 0
+
+        # Take the next grid layout (already generated when pregenerating)
+        self.grid, spawns = self.levels.next()
+        self.danger = DangerMap(self.grid, BOMB_RANGE)
+
+        # Enemies chase the player along a distance field over the cells they may walk on
+        if self.pursuit:
+            self.flow_field = FlowField(self.enemy_walkable)
+
+        # Create the players on their start cells - the first one at (1, 1)
+        self.players = [Player(*tile_to_pixel(x, y)) for x, y in self.starts]
+        self.player = self.players[0]
+
+        # Create enemies (more enemies on higher levels)
+        now = self.now()
+        self.scheduler.clear()
+        self.enemies = []
+        self.enemy_store = EntityStore(ENEMY_FIELDS)  # Fresh stores leave the old level's facades intact
+        self.enemy_index = OccupancyIndex()
+        num_enemies = 3 + self.level - 1  # 3 enemies on level 1, 4 on level 2, etc.
+        # Larger arenas get the same enemy density as the standard map
+        num_enemies *= max(1, (self.width * self.height) // (GRID_WIDTH * GRID_HEIGHT))
+        for _ in range(num_enemies):
+            enemy_x, enemy_y = self.rng.spawn.choice(spawns)
+            enemy = Enemy(enemy_x, enemy_y, now, self.rng.spawn, self.enemy_store)
+            enemy.occupancy = self.enemy_index
+            self.enemy_index.add(enemy, enemy_x, enemy_y)
+            self.enemies.append(enemy)
+            self.schedule_enemy(enemy)
+
+        # List to store active bombs
+        self.bombs = []
+        self.bomb_store = EntityStore(BOMB_FIELDS)
+        self.bomb_index = OccupancyIndex()
+
+    def generate_level(self, rng):
+        """Generate a level for this simulation's map size (see generate_level())"""
+        return generate_level(self.grid_factory, rng, self.width, self.height, self.starts, self.block_chance)
+
+    def schedule_enemy(self, enemy):
+        """Schedule an enemy's next move and animation frame"""
+        enemy.move_timer = self.scheduler.schedule(
+            enemy.last_move_time + ENEMY_MOVE_INTERVAL, TIMER_ENEMY_MOVE, enemy)
+        enemy.animation_timer = self.scheduler.schedule(
+            enemy.last_animation_time + enemy.animation_speed, TIMER_ENEMY_ANIMATION, enemy)
+
+    def enemy_walkable(self, x, y):
+        """Enemies only walk on empty cells"""
+        return self.grid.is_empty(x, y)
+
+    def is_far(self, enemy):
+        """True if an enemy is more than far_radius tiles from every player"""
+        if self.far_radius is None:
+            return False
+        for player in self.players:
+            player_x, player_y = player.get_grid_position()
+            if max(abs(enemy.grid_x - player_x), abs(enemy.grid_y - player_y)) <= self.far_radius:
+                return False
+        return True
+
+    def pursuit_target(self):
+        """Grid cell the pursuit field leads to: the first living player's"""
+        for player in self.players:
+            if not player.is_dead:
+                return player.get_grid_position()
+        return self.player.get_grid_position()
+
+    def remove_enemy(self, enemy):
+        """Take an enemy off the board and cancel its pending events"""
+        self.enemy_index.remove(enemy, enemy.grid_x, enemy.grid_y)
+        self.enemy_store.remove(enemy)
+        self.scheduler.cancel(enemy.move_timer)
+        self.scheduler.cancel(enemy.animation_timer)
+
+    def kill_player(self, cause, events, player=None):
+        """Mark a player (the first one by default) as dead and end the game once all are"""
+        player = player if player is not None else self.player
+        now = self.now()
+        player.is_dead = True
+        player.death_time = now
+        events.append((EVENT_PLAYER_KILLED, cause))
+        if all(other.is_dead for other in self.players):
+            self.game_over = True
+            self.game_over_time = now
+            events.append((EVENT_GAME_OVER, cause))
+
+    def can_restart(self):
+        """Only allow restart after a delay once the game is over"""
+        return self.game_over and self.now() - self.game_over_time >= GAME_OVER_DELAY
+
+    def step(self, actions=0):
+        """
+        Advance the game by one tick.
+
+        Args:
+            actions: Bitmask of ACTION_* flags for this tick, or a sequence
+                with one bitmask per player (missing players do nothing)
+
+        Returns:
+            List of (kind, data) events that happened during the tick
+        """
+        events = []
+        players = self.players
+        grid = self.grid
+        self.clock.advance()
+        now = self.now()
+        self.tick += 1
+
+        if isinstance(actions, int):
+            actions = (actions,)
+        actions = tuple(actions) + (0,) * (len(players) - len(actions))
+        pressed = 0  # Keys pressed by any player
+        for player_actions in actions:
+            pressed |= player_actions
+
+        if pressed & ACTION_RESTART and self.can_restart():
+            self.reset()
+            events.append((EVENT_RESTART, self.level))
+            return events
+
+        if pressed & ACTION_ENTER_GATE and self.gate_found:
+            self.level_complete = True
+            events.append((EVENT_LEVEL_COMPLETE, self.level))
+
+        if self.game_over or self.level_complete:
+            return events
+
+        for player, player_actions in zip(players, actions):
+            # Only process movement input if player is not already moving and not dead
+            if not player.moving and not player.is_dead:
+                if player_actions & ACTION_LEFT:
+                    player.move(-player.vel, 0, grid)
+                elif player_actions & ACTION_RIGHT:
+                    player.move(player.vel, 0, grid)
+                elif player_actions & ACTION_UP:
+                    player.move(0, -player.vel, grid)
+                elif player_actions & ACTION_DOWN:
+                    player.move(0, player.vel, grid)
+
+            # Update player position (smooth movement)
+            player.update()
+
+            # Check for player collision with enemies standing on the cells the player covers
+            nearby_enemies = self.enemy_index.in_tiles(player.covered_tiles())
+            if player.check_enemy_collision(nearby_enemies) is not None:
+                self.kill_player(DEATH_BY_ENEMY, events, player)
+
+        # Check if a player is on the gate and all enemies are defeated
+        gate_position = None
+        if len(self.enemies) == 0:
+            for player in players:
+                position = player.get_grid_position()
+                if grid.cell(*position) == GATE:
+                    gate_position = position
+                    break
+        gate_found = gate_position is not None
+        if gate_found and not self.gate_found:
+            events.append((EVENT_GATE_FOUND, gate_position))
+        self.gate_found = gate_found
+
+        # Handle the events that are due: enemies act right away, bomb events
+        # wait until after bomb placement like the per-bomb updates used to
+        bomb_timers = []
+        target_x, target_y = self.pursuit_target() if self.flow_field is not None else (0, 0)
+        for timer in self.scheduler.pop_due(now):
+            if timer.kind == TIMER_ENEMY_MOVE:
+                enemy = timer.target
+                if self.flow_field is not None:
+                    # Recomputed at most once per player cell, shared by every enemy
+                    self.flow_field.set_target(target_x, target_y)
+                    enemy.move_towards(grid, self.flow_field, self.rng.ai, self.danger)
+                else:
+                    # Wandering enemies keep out of pending blasts too
+                    enemy.move_randomly(grid, self.rng.ai, self.danger)
+                enemy.last_move_time = now
+                if self.is_far(enemy):
+                    # Far off-screen: move less often and stop animating
+                    interval = ENEMY_MOVE_INTERVAL * FAR_UPDATE_FACTOR
+                else:
+                    interval = ENEMY_MOVE_INTERVAL
+                    if enemy.animation_timer is None:
+                        enemy.animation_timer = self.scheduler.schedule(
+                            now + enemy.animation_speed, TIMER_ENEMY_ANIMATION, enemy)
+                enemy.move_timer = self.scheduler.schedule(now + interval, TIMER_ENEMY_MOVE, enemy)
+            elif timer.kind == TIMER_ENEMY_ANIMATION:
+                enemy = timer.target
+                enemy.animate(now)
+                if self.is_far(enemy):
+                    enemy.animation_timer = None  # Picked up again by a move near the player
+                else:
+                    enemy.animation_timer = self.scheduler.schedule(
+                        now + enemy.animation_speed, TIMER_ENEMY_ANIMATION, enemy)
+            else:
+                bomb_timers.append(timer)
+
+        for player, player_actions in zip(players, actions):
+            # Handle bomb placement
+            if player_actions & ACTION_BOMB and player.can_place_bomb and not player.is_dead:
+                grid_x, grid_y = player.get_grid_position()
+
+                # Check if there's already a bomb at this position
+                if not self.bomb_index.occupied(grid_x, grid_y):
+                    bomb = Bomb(grid_x, grid_y, now, self.bomb_store)
+                    bomb.timer = self.scheduler.schedule(now + BOMB_TIMER, TIMER_FUSE, bomb)
+                    self.bombs.append(bomb)
+                    self.bomb_index.add(bomb, grid_x, grid_y)
+                    self.danger.add(bomb, grid_x, grid_y, now + BOMB_TIMER)
+                    player.can_place_bomb = False
+                    events.append((EVENT_BOMB_PLACED, bomb))
+
+            # Reset bomb placement ability when the bomb key is released
+            if not player_actions & ACTION_BOMB:
+                player.can_place_bomb = True
+
+        # Animate explosions, a pass over two columns of the bomb store
+        frames = self.bomb_store.columns['explosion_frames']
+        for row, exploded in enumerate(self.bomb_store.columns['exploded']):
+            if exploded:
+                frames[row] += 1
+
+        # Explode bombs whose fuse burnt down and clear finished explosions
+        killed = set()
+        finished = False
+        for timer in bomb_timers:
+            bomb = timer.target
+            if timer.kind == TIMER_EXPLOSION_OVER:
+                self.bomb_index.remove(bomb, bomb.grid_x, bomb.grid_y)
+                self.bomb_store.remove(bomb)
+                finished = True
+                continue
+
+            self.danger.remove(bomb)
+            enemies_hit, player_hit = bomb.explode(grid, self.enemy_index, self.player, now)
+            bomb.timer = self.scheduler.schedule(bomb.explosion_end_time(), TIMER_EXPLOSION_OVER, bomb)
+            events.append((EVENT_EXPLOSION, bomb))
+            if bomb.changed_cells:
+                events.append((EVENT_CELLS_CHANGED, bomb.changed_cells))
+                for x, y in bomb.changed_cells:
+                    # Cleared blocks let the other pending blasts reach further
+                    self.danger.cell_cleared(x, y)
+                    if self.flow_field is not None:
+                        # ... and open new paths: patch the pursuit field around them
+                        self.flow_field.cell_cleared(x, y)
+
+            # Take enemies caught in the explosion off the board
+            for enemy in enemies_hit:
+                self.remove_enemy(enemy)
+                killed.add(enemy)
+                events.append((EVENT_ENEMY_KILLED, enemy))
+
+            # Check if a player was hit (explode() only looks at the first one)
+            for player in players:
+                if player is not self.player:
+                    player_hit = player.get_grid_position() in bomb.affected_tiles
+                if player_hit and not player.is_dead:
+                    self.kill_player(DEATH_BY_EXPLOSION, events, player)
+
+        # Drop killed enemies and finished bombs in one pass each
+        if killed:
+            self.enemies = [enemy for enemy in self.enemies if enemy not in killed]
+        if finished:
+            self.bombs = [bomb for bomb in self.bombs if not bomb.is_finished(now)]
+
+        return events
@@ -0,0 +1,64 @@
+"""
+Cell-keyed occupancy index.
+
+Keeps track of which entities stand on which grid cell, so questions like
+"which enemies are inside this blast?", "is there already a bomb here?" or
+"is an enemy touching the player?" are answered by looking at a few cells
+instead of scanning every entity. Entities update the index when they move.
+"""
+
+
+class OccupancyIndex:
+    def __init__(self):
+        self.cells = {}  # (x, y) -> list of entities on that cell
+
+    def __len__(self):
+        return sum(len(entities) for entities in self.cells.values())
+
+    def clear(self):
+        self.cells.clear()
+
+    def add(self, entity, x, y):
+        """Register an entity on a cell"""
+        self.cells.setdefault((x, y), []).append(entity)
+
+    def remove(self, entity, x, y):
+        """Remove an entity from a cell"""
+        entities = self.cells.get((x, y))
+        if entities is None:
+            return
+        if entity in entities:
+            entities.remove(entity)
+        if not entities:
+            del self.cells[(x, y)]
+
+    def move(self, entity, old_x, old_y, new_x, new_y):
+        """Move an entity from one cell to another"""
+        self.remove(entity, old_x, old_y)
+        self.add(entity, new_x, new_y)
+
+    def at(self, x, y):
+        """Entities on a cell (an empty tuple if there are none)"""
+        return self.cells.get((x, y), ())
+
+    def occupied(self, x, y):
+        return (x, y) in self.cells
+
+    def in_tiles(self, tiles):
+        """
+        Entities standing on any of the given tiles.
+
+        Args:
+            tiles: Iterable of (x, y) grid positions
+
+        Returns:
+            List of entities, each listed once
+        """
+        found = []
+        seen = set()  # id() of every entity in found, so entities need not be hashable
+        for tile in tiles:
+            for entity in self.cells.get(tile, ()):
+                if id(entity) not in seen:
+                    seen.add(id(entity))
+                    found.append(entity)
+        return found
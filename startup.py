@@ -0,0 +1,110 @@
+"""
+Startup helpers: background asset loading and a startup timing breakdown.
+
+Opening the window is the only thing the game has to do before it can show
+a first frame. Everything else - starting the mixer and decoding the music
+and sound effects, finding system fonts, drawing the sprites - is submitted
+to a small thread pool and picked up when it is first needed. LazyResource
+wraps each job so callers can either wait for the value or just check
+whether it is ready yet (sounds are simply skipped until the mixer is up).
+StartupTimer records how long each step took and on which thread, so slow
+cold starts can be traced to a specific step.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+LOADER_THREADS = 3  # Audio, fonts and sprites load side by side
+
+
+class StartupTimer:
+    def __init__(self, timer=time.perf_counter):
+        self.timer = timer
+        self.start = timer()
+        self.steps = []  # (name, thread name, start offset, duration) in seconds
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def step(self, name):
+        """Time the body of a with block as a named startup step"""
+        begin = self.timer()
+        try:
+            yield
+        finally:
+            end = self.timer()
+            with self.lock:
+                self.steps.append((name, threading.current_thread().name, begin - self.start, end - begin))
+
+    def mark(self, name):
+        """Record a point in time (e.g. the first frame) as a zero-length step"""
+        with self.step(name):
+            pass
+
+    def report(self):
+        """
+        Startup breakdown, one line per step in the order the steps started.
+
+        Returns:
+            Multi-line string with start offset, duration and thread per step
+        """
+        with self.lock:
+            steps = sorted(self.steps, key=lambda step: step[2])
+        lines = ["Startup timing (ms):", f"  {'step':<14}{'start':>9}{'took':>9}  thread"]
+        for name, thread, offset, duration in steps:
+            lines.append(f"  {name:<14}{offset * 1000:>9.1f}{duration * 1000:>9.1f}  {thread}")
+        return "\n".join(lines)
+
+
+class LazyResource:
+    """Value produced by a background job"""
+
+    def __init__(self, future):
+        self.future = future
+
+    def ready(self):
+        """True once the job has finished (never blocks)"""
+        return self.future.done()
+
+    def get(self, timeout=None):
+        """Wait for the job and return its value (re-raises the job's exception)"""
+        return self.future.result(timeout)
+
+    def get_nowait(self, default=None):
+        """The value if the job has finished successfully, default otherwise"""
+        if not self.future.done() or self.future.exception() is not None:
+            return default
+        return self.future.result()
+
+
+class AssetLoader:
+    def __init__(self, startup_timer=None, workers=LOADER_THREADS):
+        """
+        Args:
+            startup_timer: StartupTimer that records how long each job took
+            workers: Number of loader threads
+        """
+        self.timer = startup_timer or StartupTimer()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='loader')
+        self.resources = {}
+
+    def submit(self, name, func, *args):
+        """
+        Start a loading job in the background.
+
+        Returns:
+            LazyResource for the job's return value
+        """
+        def job():
+            with self.timer.step(name):
+                return func(*args)
+        resource = LazyResource(self.executor.submit(job))
+        self.resources[name] = resource
+        return resource
+
+    def done(self):
+        """True once every submitted job has finished"""
+        return all(resource.ready() for resource in self.resources.values())
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,12 @@
+"""
+pytest configuration.
+
+The game modules live at the repository root and the shared helpers in
+tests/helpers.py, so both directories are put on sys.path here.
+"""
+import os
+import sys
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+sys.path.insert(0, TESTS_DIR)
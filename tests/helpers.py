@@ -0,0 +1,75 @@
+"""
+Shared helpers for the test suite.
+
+Every simulation in the tests runs on a FixedStepClock with a fixed seed, so
+runs are reproducible.
+"""
+import random
+
+from clock import FixedStepClock
+from simulation import (
+    Simulation, Enemy, ACTION_LEFT, ACTION_RIGHT, ACTION_UP, ACTION_DOWN, ACTION_BOMB,
+)
+
+FPS = 60
+SEED = 1234
+
+
+def make_simulation(seed=SEED, **kwargs):
+    """Seeded simulation on a fixed 1/60 s step, reset to its first level"""
+    sim = Simulation(clock=FixedStepClock(dt=1 / FPS), seed=seed, **kwargs)
+    sim.reset()
+    return sim
+
+
+def clear_enemies(sim):
+    """Take every enemy off the board"""
+    for enemy in list(sim.enemies):
+        sim.remove_enemy(enemy)
+    sim.enemies = []
+
+
+def place_enemy(sim, x, y, moving=True):
+    """
+    Put an enemy on a cell.
+
+    Args:
+        moving: False cancels its moves, so it stays on the cell
+    """
+    enemy = Enemy(x, y, sim.now(), sim.rng.spawn, sim.enemy_store)
+    enemy.occupancy = sim.enemy_index
+    sim.enemy_index.add(enemy, x, y)
+    sim.enemies.append(enemy)
+    sim.schedule_enemy(enemy)
+    if not moving:
+        sim.scheduler.cancel(enemy.move_timer)
+    return enemy
+
+
+def scripted_actions(count, seed=SEED):
+    """Reproducible input: walk in runs of one direction and drop bombs now and then"""
+    rng = random.Random(seed)
+    moves = (ACTION_LEFT, ACTION_RIGHT, ACTION_UP, ACTION_DOWN)
+    actions = []
+    while len(actions) < count:
+        action = rng.choice(moves)
+        if rng.random() < 0.2:
+            action |= ACTION_BOMB
+        actions.extend([action] * rng.randint(5, 30))
+    return actions[:count]
+
+
+def run_until(sim, predicate, actions=0, max_steps=10 * FPS):
+    """
+    Step until predicate(events) is true.
+
+    Returns:
+        Every event of the steps taken
+    """
+    events = []
+    for _ in range(max_steps):
+        step_events = sim.step(actions)
+        events.extend(step_events)
+        if predicate(step_events):
+            return events
+    raise AssertionError(f"condition not reached in {max_steps} steps")
@@ -0,0 +1,115 @@
+"""Coalescing, stealing and dropping in the sound channel pool, on stub channels"""
+import pytest
+
+pytest.importorskip("pygame")
+
+from audio import SoundManager, VOICE_VOLUME, COALESCE_BOOST  # noqa: E402
+
+# name -> (file name, priority, volume, most voices at once)
+SPECS = {
+    'high': ('high.wav', 2, 1.0, 1),
+    'mid': ('mid.wav', 1, 1.0, 2),
+    'low': ('low.wav', 0, 1.0, 2),
+}
+
+
+class StubChannel:
+    def __init__(self):
+        self.sound = None
+        self.volume = None
+        self.plays = 0
+
+    def get_busy(self):
+        return self.sound is not None
+
+    def play(self, sound):
+        self.sound = sound
+        self.plays += 1
+
+    def set_volume(self, volume):
+        self.volume = volume
+
+    def stop(self):
+        self.sound = None
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_manager(channels=3):
+    timer = FakeTimer()
+    manager = SoundManager(SPECS, channels, timer)
+    manager.channels = [StubChannel() for _ in range(channels)]
+    manager.voices = [None] * channels
+    manager.sounds = {name: name for name in SPECS}  # Stub channels only pass sounds along
+    return manager, timer
+
+
+def frame(manager, timer, *names):
+    """Request sounds and flush them as one frame, one second after the last"""
+    timer.now += 1.0
+    for name in names:
+        manager.play(name)
+    manager.flush()
+
+
+def playing(manager):
+    return [channel.sound for channel in manager.channels]
+
+
+def test_requests_in_one_frame_are_coalesced():
+    manager, timer = make_manager()
+    frame(manager, timer, 'low', 'low', 'low')
+    assert playing(manager) == ['low', None, None]
+    assert manager.channels[0].volume == pytest.approx(VOICE_VOLUME + 2 * COALESCE_BOOST)
+    assert manager.played == 1 and manager.coalesced == 2
+
+
+def test_voice_limit_restarts_the_oldest_voice():
+    manager, timer = make_manager()
+    frame(manager, timer, 'low')
+    frame(manager, timer, 'low')
+    frame(manager, timer, 'low')  # Over the limit of 2: takes the oldest voice's channel
+    assert playing(manager) == ['low', 'low', None]
+    assert manager.channels[0].plays == 2
+    assert manager.stolen == 0
+
+
+def test_full_pool_steals_the_lowest_priority_oldest_voice():
+    manager, timer = make_manager()
+    frame(manager, timer, 'mid')
+    frame(manager, timer, 'low')
+    frame(manager, timer, 'low')
+    frame(manager, timer, 'high')
+    assert playing(manager) == ['mid', 'high', 'low']
+    assert manager.stolen == 1
+
+
+def test_full_pool_drops_less_important_sounds():
+    manager, timer = make_manager(channels=2)
+    frame(manager, timer, 'mid', 'high')
+    frame(manager, timer, 'low', 'low')
+    assert playing(manager) == ['high', 'mid']
+    assert manager.dropped == 2
+
+
+def test_finished_voices_free_their_channel():
+    manager, timer = make_manager(channels=1)
+    frame(manager, timer, 'high')
+    manager.channels[0].stop()  # The sound ended
+    frame(manager, timer, 'low')
+    assert playing(manager) == ['low']
+    assert manager.stolen == manager.dropped == 0
+
+
+def test_sounds_not_loaded_are_dropped():
+    manager, timer = make_manager()
+    del manager.sounds['mid']
+    frame(manager, timer, 'mid', 'mid')
+    assert playing(manager) == [None, None, None]
+    assert manager.dropped == 2
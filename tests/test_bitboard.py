@@ -0,0 +1,74 @@
+"""Tests for the bitboard grid backend against the list-of-rows grid"""
+import random
+
+import pytest
+
+from bitboard import BitboardGrid
+from simulation import ListGrid, EMPTY, WALL, BLOCK, HIDDEN_GATE, GATE
+
+SEEDS = range(20)
+
+
+def grid_pair(seed):
+    """The same level generated by both backends"""
+    return ListGrid.generate(random.Random(seed)), BitboardGrid.generate(random.Random(seed))
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_generate_matches_list_grid(seed):
+    list_grid, bit_grid = grid_pair(seed)
+    assert bit_grid.to_rows() == [list(row) for row in list_grid]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_explosion_area_matches_list_grid(seed):
+    list_grid, bit_grid = grid_pair(seed)
+    for y in range(list_grid.height):
+        for x in range(list_grid.width):
+            if list_grid.cell(x, y) != WALL:
+                assert bit_grid.explosion_area(x, y) == list_grid.explosion_area(x, y)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_destroy_blocks_matches_list_grid(seed):
+    list_grid, bit_grid = grid_pair(seed)
+    rng = random.Random(seed)
+    for _ in range(30):
+        x, y = rng.randrange(list_grid.width), rng.randrange(list_grid.height)
+        if list_grid.cell(x, y) == WALL:
+            continue
+        tiles = list_grid.explosion_area(x, y)
+        assert bit_grid.destroy_blocks(tiles) == list_grid.destroy_blocks(tiles)
+        assert bit_grid.to_rows() == [list(row) for row in list_grid]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_find_enemy_position_matches_list_grid(seed):
+    list_grid, bit_grid = grid_pair(seed)
+    list_rng, bit_rng = random.Random(seed), random.Random(seed)
+    for _ in range(5):
+        position = list_grid.find_enemy_position(list_rng)
+        assert bit_grid.find_enemy_position(bit_rng) == position
+        x, y = position
+        list_grid.set_cell(x, y, BLOCK)
+        bit_grid.set_cell(x, y, BLOCK)
+
+
+def test_walkability_follows_cell_changes():
+    list_grid, bit_grid = grid_pair(0)
+    for code in (EMPTY, WALL, BLOCK, HIDDEN_GATE, GATE):
+        list_grid.set_cell(5, 5, code)
+        bit_grid.set_cell(5, 5, code)
+        assert bit_grid.cell(5, 5) == code
+        assert bit_grid[5][5] == code
+        for x, y in ((5, 5), (-1, 0), (0, -1), (list_grid.width, 0), (0, list_grid.height)):
+            assert bit_grid.is_empty(x, y) == list_grid.is_empty(x, y)
+            assert bit_grid.is_walkable(x, y) == list_grid.is_walkable(x, y)
+
+
+def test_from_rows_round_trip():
+    list_grid, _ = grid_pair(3)
+    rows = [list(row) for row in list_grid]
+    grid = BitboardGrid.from_rows(rows)
+    assert grid.to_rows() == rows
+    assert grid.empty_mask() == BitboardGrid.generate(random.Random(3)).empty_mask()
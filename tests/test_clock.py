@@ -0,0 +1,82 @@
+"""Fixed-step clock and the frame-to-tick accumulator, on a fake timer"""
+import pytest
+
+from clock import FixedStepClock, StepAccumulator
+
+DT = 1 / 8  # Exact in binary, so the expected tick counts need no rounding slack
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_accumulator(max_catch_up=1.0):
+    timer = FakeTimer()
+    accumulator = StepAccumulator(DT, max_catch_up, timer)
+    accumulator.steps()  # The first call only starts the count
+    return accumulator, timer
+
+
+def test_fixed_step_clock():
+    clock = FixedStepClock(dt=0.5, start=2.0)
+    assert clock.now() == 2.0
+    for _ in range(3):
+        clock.advance()
+    assert clock.now() == 3.5
+
+
+def test_first_frame_runs_no_ticks():
+    timer = FakeTimer()
+    accumulator = StepAccumulator(DT, timer=timer)
+    assert accumulator.steps() == 0
+
+
+def test_ticks_per_frame():
+    accumulator, timer = make_accumulator()
+    frames = []
+    for frame_time in (DT, 2 * DT, DT / 2, DT / 2, 0.0, 3 * DT):
+        timer.now += frame_time
+        frames.append(accumulator.steps())
+    # Half-tick frames carry their remainder over to the next frame
+    assert frames == [1, 2, 0, 1, 0, 3]
+    assert accumulator.dropped == 0
+
+
+def test_high_frame_rate_keeps_the_tick_rate():
+    timer = FakeTimer()
+    accumulator = StepAccumulator(1 / 60, timer=timer)
+    accumulator.steps()
+    ticks = 0
+    for _ in range(144 * 10):  # Ten seconds at 144 frames per second
+        timer.now += 1 / 144
+        ticks += accumulator.steps()
+    assert abs(ticks - 600) <= 1
+
+
+def test_catch_up_is_capped():
+    accumulator, timer = make_accumulator(max_catch_up=4 * DT)
+    timer.now += 10 * DT + DT / 2  # A long stall
+    assert accumulator.steps() == 4
+    assert accumulator.dropped == 6
+    # The leftover fraction of a tick is kept, the dropped ticks are not
+    assert accumulator.alpha == pytest.approx(0.5)
+    timer.now += DT / 2
+    assert accumulator.steps() == 1
+
+
+def test_alpha_is_the_fraction_of_a_tick_left():
+    accumulator, timer = make_accumulator()
+    assert accumulator.alpha == 0.0
+    timer.now += DT / 4
+    assert accumulator.steps() == 0
+    assert accumulator.alpha == pytest.approx(0.25)
+    timer.now += DT
+    assert accumulator.steps() == 1
+    assert accumulator.alpha == pytest.approx(0.25)
+    timer.now += DT * 3 / 4
+    assert accumulator.steps() == 1
+    assert accumulator.alpha == pytest.approx(0.0)
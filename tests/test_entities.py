@@ -0,0 +1,79 @@
+"""Rows, swap-remove and the graveyard of EntityStore"""
+from entities import EntityStore, field, flag
+
+FIELDS = (('x', 'i'), ('alive', 'b'))
+
+
+class Thing:
+    __slots__ = ('store', 'row')
+    x = field('x')
+    alive = flag('alive')
+
+
+def filled_store(count):
+    store = EntityStore(FIELDS)
+    things = []
+    for i in range(count):
+        thing = Thing()
+        store.add(thing, {'x': i, 'alive': True})
+        things.append(thing)
+    return store, things
+
+
+def test_facades_read_and_write_their_row():
+    store, things = filled_store(3)
+    things[1].x = 42
+    things[2].alive = False
+    assert [thing.x for thing in things] == [0, 42, 2]
+    assert [thing.alive for thing in things] == [True, True, False]
+    assert store.row_values(things[1]) == (42, 1)
+
+
+def test_remove_moves_the_last_row_into_the_gap():
+    store, things = filled_store(4)
+    store.remove(things[1])
+    assert len(store) == 3
+    moved = things[3]
+    assert moved.row == 1
+    assert store.owners[1] is moved
+    assert moved.x == 3
+    assert [thing.x for thing in store.owners] == [0, 3, 2]
+
+
+def test_removed_entity_keeps_its_values():
+    store, things = filled_store(3)
+    things[0].x = 7
+    store.remove(things[0])
+    assert things[0].x == 7 and things[0].alive
+    assert things[0].store is store.graveyard
+    # Writing to the removed facade does not touch the live rows
+    things[0].x = 99
+    assert [thing.x for thing in store.owners] == [2, 1]
+
+
+def test_removing_the_last_row():
+    store, things = filled_store(3)
+    store.remove(things[2])
+    assert len(store) == 2
+    assert [thing.row for thing in things[:2]] == [0, 1]
+    assert [thing.x for thing in things] == [0, 1, 2]
+
+
+def test_removing_twice_is_ignored():
+    store, things = filled_store(3)
+    store.remove(things[0])
+    store.remove(things[0])
+    assert len(store) == 2
+    assert len(store.graveyard) == 1
+    assert [thing.x for thing in store.owners] == [2, 1]
+    assert things[0].x == 0
+
+
+def test_removals_share_one_graveyard():
+    store, things = filled_store(5)
+    for thing in things:
+        store.remove(thing)
+    assert len(store) == 0
+    assert store.graveyard.owners == things
+    assert [thing.x for thing in things] == [0, 1, 2, 3, 4]
+    assert {thing.store for thing in things} == {store.graveyard}
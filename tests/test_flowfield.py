@@ -0,0 +1,54 @@
+"""The incrementally patched flow field against a full recomputation"""
+import random
+
+import pytest
+
+from flowfield import FlowField
+from helpers import make_simulation, scripted_actions
+from simulation import ListGrid, BLOCK, HIDDEN_GATE, EMPTY
+
+SEEDS = range(10)
+
+
+def full_field(walkable, target, max_distance):
+    field = FlowField(walkable, max_distance)
+    field.set_target(*target)
+    return field.distance
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+@pytest.mark.parametrize("max_distance", (4, 10, 100))
+def test_cleared_cells_match_full_recompute(seed, max_distance):
+    rng = random.Random(seed)
+    grid = ListGrid.generate(rng, 21, 17)
+    field = FlowField(grid.is_empty, max_distance)
+    field.set_target(1, 1)
+    blocks = [(x, y) for y in range(grid.height) for x in range(grid.width)
+              if grid.cell(x, y) in (BLOCK, HIDDEN_GATE)]
+    rng.shuffle(blocks)
+    for x, y in blocks:
+        grid.set_cell(x, y, EMPTY)
+        field.cell_cleared(x, y)
+        assert field.distance == full_field(grid.is_empty, (1, 1), max_distance)
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_simulation_field_matches_full_recompute(seed):
+    sim = make_simulation(seed=seed, level=3, pursuit=True, width=31, height=25)
+    for action in scripted_actions(600, seed):
+        sim.step(action)
+        field = sim.flow_field
+        if field.target is not None:
+            assert field.distance == full_field(sim.enemy_walkable, field.target, field.max_distance)
+
+
+def test_next_step_moves_closer():
+    grid = ListGrid.generate(random.Random(0), 15, 13)
+    field = FlowField(grid.is_empty)
+    field.set_target(1, 1)
+    for (x, y), distance in field.distance.items():
+        step = field.next_step(x, y)
+        if distance == 0:
+            assert step is None
+        else:
+            assert field.distance[step] == distance - 1
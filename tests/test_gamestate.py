@@ -0,0 +1,100 @@
+"""Snapshots and their binary form"""
+import pytest
+
+from helpers import FPS, make_simulation, scripted_actions
+from gamestate import FlatGrid, GameState, snapshot, restore, pack_record, unpack_record
+from replay import state_hash
+
+
+def played_simulation(steps=300, **kwargs):
+    """Simulation in mid-game, usually with bombs on the board"""
+    sim = make_simulation(grid_factory=FlatGrid.generate, **kwargs)
+    for action in scripted_actions(steps):
+        sim.step(action)
+    return sim
+
+
+def continue_play(sim, actions):
+    hashes = []
+    for action in actions:
+        sim.step(action)
+        hashes.append(state_hash(sim))
+    return hashes
+
+
+@pytest.mark.parametrize('pursuit', [False, True])
+def test_restore_continues_in_sync(pursuit):
+    sim = played_simulation(pursuit=pursuit)
+    state = snapshot(sim)
+    actions = scripted_actions(10 * FPS, seed=7)
+    expected = continue_play(sim, actions)
+
+    restore(sim, state)
+    assert continue_play(sim, actions) == expected
+
+
+def test_default_grid_is_shared_after_the_first_snapshot():
+    sim = make_simulation()
+    for action in scripted_actions(300):
+        sim.step(action)
+    grid = sim.grid
+    first = snapshot(sim)
+    assert sim.grid is grid and sim.danger.grid is grid
+    assert isinstance(grid, FlatGrid)
+
+    second = snapshot(sim)
+    assert all(a is b for a, b in zip(first.rows, second.rows))
+
+    actions = scripted_actions(10 * FPS, seed=7)
+    expected = continue_play(sim, actions)
+    restore(sim, first)
+    assert continue_play(sim, actions) == expected
+
+
+def test_restore_after_a_new_level():
+    sim = played_simulation()
+    state = snapshot(sim)
+    before = state_hash(sim)
+    sim.reset(new_level=True)
+    restore(sim, state)
+    assert state_hash(sim) == before
+    assert snapshot(sim) == state
+
+
+def test_bytes_round_trip():
+    state = snapshot(played_simulation())
+    data = state.to_bytes()
+    decoded = GameState.from_bytes(data)
+    assert decoded == state
+    assert decoded.to_bytes() == data
+
+
+def test_restore_from_bytes_continues_in_sync():
+    sim = played_simulation()
+    data = snapshot(sim).to_bytes()
+    actions = scripted_actions(5 * FPS, seed=9)
+    expected = continue_play(sim, actions)
+
+    restore(sim, GameState.from_bytes(data))
+    assert continue_play(sim, actions) == expected
+
+
+def test_bytes_reject_other_data():
+    with pytest.raises(ValueError):
+        GameState.from_bytes(b'not a state')
+
+
+def test_records_keep_value_types():
+    values = (2 ** 60 + 1, -3, -2 ** 63, 1.5, 0.0, True, False, None)
+    out = bytearray()
+    pack_record(out, values)
+    decoded, offset = unpack_record(bytes(out), 0)
+    assert decoded == values
+    assert [type(value) for value in decoded] == [type(value) for value in values]
+    assert offset == len(out)
+
+
+def test_records_hold_at_most_32_values():
+    pack_record(bytearray(), tuple(range(32)))
+    with pytest.raises(ValueError):
+        pack_record(bytearray(), tuple(range(33)))
@@ -0,0 +1,81 @@
+"""Union-find connectivity and the pre-generating level queue"""
+import random
+
+import pytest
+
+from levelgen import UnionFind, LevelQueue, open_components
+from simulation import ListGrid
+
+LEVELS = 8
+
+
+# ===== CONNECTIVITY =====
+
+def test_union_find_connects_transitively():
+    sets = UnionFind(6)
+    sets.union(0, 1)
+    sets.union(1, 2)
+    sets.union(4, 5)
+    assert sets.connected(0, 2)
+    assert sets.connected(5, 4)
+    assert not sets.connected(2, 4)
+    assert not sets.connected(3, 0)
+    sets.union(2, 5)
+    assert sets.connected(0, 4)
+    assert sets.connected(3, 3)
+
+
+def test_open_components_splits_on_walls():
+    # Two open areas separated by the wall column x = 2
+    board = ["..#..",
+             "..#..",
+             "..#.."]
+    components = open_components(5, 3, lambda x, y: board[y][x] == '.')
+    assert components.connected(0, 1 * 5 + 1)
+    assert components.connected(3, 2 * 5 + 4)
+    assert not components.connected(0, 3)
+
+
+# ===== LEVEL QUEUE =====
+
+def generate(rng):
+    return ListGrid.generate(rng, 15, 13)
+
+
+def drain(queue, count=LEVELS):
+    try:
+        return [[list(row) for row in queue.next()] for _ in range(count)]
+    finally:
+        queue.close()
+
+
+def test_background_queue_matches_on_demand_levels():
+    on_demand = drain(LevelQueue(generate, random.Random(7)))
+    background = drain(LevelQueue(generate, random.Random(7), background=True))
+    assert background == on_demand
+    assert len({repr(level) for level in on_demand}) == LEVELS  # Really a stream, not one level repeated
+
+
+def test_restart_continues_from_the_new_stream():
+    queue = LevelQueue(generate, random.Random(1), background=True)
+    queue.next()
+    queue.restart(random.Random(7))
+    assert drain(queue, 3) == drain(LevelQueue(generate, random.Random(7)), 3)
+
+
+def test_worker_error_is_raised_by_next():
+    def fail_on_second(rng):
+        level = rng.random()
+        if len(produced) == 1:
+            raise ValueError("generation failed")
+        produced.append(level)
+        return level
+
+    produced = []
+    queue = LevelQueue(fail_on_second, random.Random(3), background=True)
+    try:
+        assert queue.next() == produced[0]
+        with pytest.raises(ValueError, match="generation failed"):
+            queue.next()
+    finally:
+        queue.close()
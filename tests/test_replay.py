@@ -0,0 +1,92 @@
+"""Input log encoding and playback"""
+import os
+
+import pytest
+
+from helpers import FPS, SEED, scripted_actions
+from clock import FixedStepClock
+from replay import InputLog, InputRecorder, play, read_varint, write_varint
+from simulation import Simulation, ACTION_BOMB
+
+
+@pytest.mark.parametrize('value', [0, 1, 127, 128, 300, 16383, 16384, 2 ** 32, 2 ** 63 - 1])
+def test_varint_round_trip(value):
+    out = bytearray()
+    write_varint(out, value)
+    out.append(0xAA)  # Whatever follows must be left alone
+    decoded, offset = read_varint(bytes(out), 0)
+    assert decoded == value
+    assert offset == len(out) - 1
+
+
+def test_varint_sizes():
+    for value, size in ((127, 1), (128, 2), (16383, 2), (16384, 3)):
+        out = bytearray()
+        write_varint(out, value)
+        assert len(out) == size
+
+
+def test_steps_are_run_length_encoded():
+    log = InputLog(SEED, 1, 15, 13, FPS)
+    for byte in [1] * 50 + [2] + [0] * 300 + [1]:
+        log.append(byte)
+    assert log.runs == [[1, 50], [2, 1], [0, 300], [1, 1]]
+    assert len(log) == 352
+    assert list(log.step_bytes()) == [1] * 50 + [2] + [0] * 300 + [1]
+
+
+def test_log_bytes_round_trip():
+    log = InputLog(SEED, 2, 31, 21, FPS, far_radius=15, pursuit=True)
+    for byte in [0] * 1000 + [5, 5, 16, 64] + [1] * 200:
+        log.append(byte)
+    log.checkpoints = [(600, b'12345678'), (1204, b'abcdefgh')]
+
+    decoded = InputLog.from_bytes(log.to_bytes())
+    assert (decoded.seed, decoded.level, decoded.width, decoded.height, decoded.fps,
+            decoded.far_radius, decoded.pursuit) == (SEED, 2, 31, 21, FPS, 15, True)
+    assert decoded.runs == log.runs
+    assert decoded.steps == log.steps
+    assert decoded.checkpoints == log.checkpoints
+
+
+def test_log_rejects_other_data():
+    with pytest.raises(ValueError):
+        InputLog.from_bytes(b'BMRP')
+    with pytest.raises(ValueError):
+        InputLog.from_bytes(b'\0' * 64)
+
+
+def record_session(seconds):
+    """Record a scripted session, restarting whenever the game is over"""
+    sim = Simulation(clock=FixedStepClock(dt=1 / FPS), seed=SEED)
+    recorder = InputRecorder(sim, FPS)
+    sim.reset()
+    recorder.mark_reset()
+    for action in scripted_actions(seconds * FPS):
+        if sim.can_restart():
+            sim.reset()
+            recorder.mark_reset()
+        recorder.step(sim, action)
+    return sim, recorder
+
+
+def test_recorded_session_replays_in_sync(tmp_path):
+    sim, recorder = record_session(25)
+    path = tmp_path / 'session.replay'
+    recorder.save(sim, path)
+
+    log = InputLog.load(path)
+    assert len(log.checkpoints) >= 2
+    replayed, mismatches = play(log)
+    assert mismatches == []
+    assert replayed.tick == sim.tick and replayed.level == sim.level
+
+
+def test_replay_reports_changed_input():
+    sim, recorder = record_session(15)
+    recorder.save(sim, os.devnull)
+    log = recorder.log
+    for run in log.runs:
+        run[0] &= ~ACTION_BOMB  # The same session without its bombs
+    _, mismatches = play(log)
+    assert mismatches
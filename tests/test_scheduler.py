@@ -0,0 +1,54 @@
+"""Event ordering and cancellation of the Scheduler"""
+from scheduler import Scheduler
+
+
+def test_events_fire_in_time_order():
+    scheduler = Scheduler()
+    scheduler.schedule(3.0, 'c')
+    scheduler.schedule(1.0, 'a')
+    scheduler.schedule(2.0, 'b')
+    assert [timer.kind for timer in scheduler.pop_due(2.5)] == ['a', 'b']
+    assert scheduler.next_time() == 3.0
+    assert [timer.kind for timer in scheduler.pop_due(3.0)] == ['c']
+    assert scheduler.pop_due(100.0) == []
+
+
+def test_ties_fire_in_scheduling_order():
+    scheduler = Scheduler()
+    for kind in ('first', 'second', 'third', 'fourth'):
+        scheduler.schedule(1.0, kind)
+    scheduler.schedule(0.5, 'earlier')
+    assert [timer.kind for timer in scheduler.pop_due(1.0)] == ['earlier', 'first', 'second', 'third', 'fourth']
+
+
+def test_cancelled_events_do_not_fire():
+    scheduler = Scheduler()
+    keep = scheduler.schedule(1.0, 'keep')
+    drop = scheduler.schedule(1.0, 'drop')
+    later = scheduler.schedule(2.0, 'later')
+    scheduler.cancel(drop)
+    scheduler.cancel(drop)  # Cancelling twice changes nothing
+    assert len(scheduler) == 2
+    scheduler.cancel(keep)
+    assert scheduler.next_time() == 2.0
+    assert scheduler.pop_due(5.0) == [later]
+    assert len(scheduler) == 0
+
+
+def test_cancelling_a_fired_event_is_a_no_op():
+    scheduler = Scheduler()
+    timer = scheduler.schedule(1.0, 'fuse')
+    scheduler.schedule(2.0, 'other')
+    assert scheduler.pop_due(1.0) == [timer]
+    scheduler.cancel(timer)
+    assert len(scheduler) == 1
+
+
+def test_clear_drops_everything():
+    scheduler = Scheduler()
+    timers = [scheduler.schedule(float(i), 'event', i) for i in range(5)]
+    scheduler.clear()
+    assert len(scheduler) == 0
+    assert scheduler.next_time() is None
+    assert all(timer.cancelled for timer in timers)
+    assert scheduler.pop_due(10.0) == []
@@ -0,0 +1,88 @@
+"""Server deltas applied by clients, and message framing"""
+import asyncio
+
+import pytest
+
+from replay import read_varint
+from server import (
+    MatchServer, MatchClient, RandomBot, MAX_INPUT_FRAME, client_matches, frame, loopback, read_frame,
+)
+
+TICKS = 20 * 60  # Twenty seconds of play, enough for bombs, deaths and restarts
+
+
+def unframe(data):
+    """The message inside exactly one frame"""
+    length, offset = read_varint(data, 0)
+    assert offset + length == len(data)
+    return data[offset:]
+
+
+class DirectPeer:
+    """The server's end of a client that gets every message at once"""
+
+    def __init__(self, client):
+        self.client = client
+        self.match = None
+        self.number = None
+
+    def send(self, data):
+        self.client.receive(unframe(data))
+
+    def backlog(self):
+        return 0
+
+    def close(self):
+        pass
+
+
+@pytest.mark.parametrize("players", [2, 4])
+def test_clients_follow_the_server_state(players):
+    server = MatchServer(players, seed=5)
+    clients, peers = [], []
+    for _ in range(players):
+        client = MatchClient(None)
+        peer = DirectPeer(client)
+        client.send_frame = lambda data, peer=peer: server.receive(peer, unframe(data))
+        server.connect(peer)
+        clients.append(client)
+        peers.append(peer)
+    bots = [RandomBot(number) for number in range(players)]
+    sim = server.matches[0].sim
+
+    for _ in range(TICKS):
+        for client, bot in zip(clients, bots):
+            client.set_actions(bot.act(client))
+        server.tick()
+        assert all(client_matches(client, sim) for client in clients)
+
+
+def test_loopback_clients_end_in_sync():
+    server, clients, in_sync = asyncio.run(loopback(matches=2, players=2, seconds=0.5, latency=0.01))
+    assert server.ticks > 0
+    assert in_sync == len(clients)
+
+
+def read_all(data, limit):
+    async def read():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await read_frame(reader, limit)
+    return asyncio.run(read())
+
+
+def test_read_frame_returns_the_message():
+    message = bytes(range(MAX_INPUT_FRAME))
+    assert read_all(frame(message), MAX_INPUT_FRAME) == message
+    assert read_all(frame(b'x' * 300), None) == b'x' * 300
+
+
+def test_read_frame_enforces_the_limit():
+    with pytest.raises(ValueError, match="limit"):
+        read_all(frame(b'x' * (MAX_INPUT_FRAME + 1)), MAX_INPUT_FRAME)
+
+
+def test_read_frame_rejects_an_endless_length():
+    with pytest.raises(ValueError, match="bad frame length"):
+        read_all(b'\xff' * 8, MAX_INPUT_FRAME)
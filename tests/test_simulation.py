@@ -0,0 +1,157 @@
+"""Game rules of Simulation.step() and seeded determinism"""
+from helpers import FPS, SEED, make_simulation, clear_enemies, place_enemy, scripted_actions, run_until
+from replay import state_hash
+from simulation import (
+    EMPTY, GATE, BOMB_TIMER, GAME_OVER_DELAY, ACTION_BOMB, ACTION_ENTER_GATE, ACTION_RESTART,
+    EVENT_BOMB_PLACED, EVENT_EXPLOSION, EVENT_ENEMY_KILLED, EVENT_PLAYER_KILLED, EVENT_GAME_OVER,
+    EVENT_GATE_FOUND, EVENT_LEVEL_COMPLETE, EVENT_RESTART, DEATH_BY_ENEMY, DEATH_BY_EXPLOSION,
+)
+
+
+def kinds(events):
+    return [kind for kind, _ in events]
+
+
+# ===== BOMBS =====
+
+def test_bomb_explodes_after_its_fuse():
+    sim = make_simulation()
+    clear_enemies(sim)
+    events = sim.step(ACTION_BOMB)
+    assert EVENT_BOMB_PLACED in kinds(events)
+    assert len(sim.bombs) == 1
+    assert not sim.danger.is_safe(1, 1)
+
+    events = run_until(sim, lambda step_events: EVENT_EXPLOSION in kinds(step_events))
+    assert abs(sim.now() - BOMB_TIMER) < 2 / FPS
+    assert sim.danger.is_safe(1, 1)
+
+
+def test_bomb_kills_enemies_and_player_in_its_blast():
+    sim = make_simulation()
+    clear_enemies(sim)
+    enemy = place_enemy(sim, 1, 2, moving=False)  # Next to the player, inside the blast
+    sim.step(ACTION_BOMB)
+
+    events = run_until(sim, lambda step_events: EVENT_EXPLOSION in kinds(step_events))
+    assert (EVENT_ENEMY_KILLED, enemy) in events
+    assert (EVENT_PLAYER_KILLED, DEATH_BY_EXPLOSION) in events
+    assert (EVENT_GAME_OVER, DEATH_BY_EXPLOSION) in events
+    assert sim.enemies == []
+    assert len(sim.enemy_store) == 0
+    assert sim.game_over and sim.player.is_dead
+
+
+def test_one_bomb_per_key_press():
+    sim = make_simulation()
+    clear_enemies(sim)
+    sim.step(ACTION_BOMB)
+    sim.step(ACTION_BOMB)  # Still held: no second bomb
+    assert len(sim.bombs) == 1
+
+
+# ===== ENEMIES AND GAME OVER =====
+
+def test_wandering_enemy_avoids_a_pending_blast():
+    # (3, 2) lies between the walls at (2, 2) and (4, 2): the only ways out are
+    # (3, 1), inside the blast of a bomb on (1, 1), and (3, 3), outside of it
+    for seed in range(20):
+        sim = make_simulation(seed=seed)
+        clear_enemies(sim)
+        sim.grid.set_cell(3, 3, EMPTY)  # May hold a block on some seeds
+        enemy = place_enemy(sim, 3, 2)
+        sim.step(ACTION_BOMB)
+        blast = set(sim.grid.explosion_area(1, 1))
+        moved = False
+        while sim.bombs and not any(bomb.exploded for bomb in sim.bombs):
+            sim.step()
+            assert (enemy.grid_x, enemy.grid_y) not in blast
+            moved = moved or (enemy.grid_x, enemy.grid_y) != (3, 2)
+        assert moved
+        assert enemy in sim.enemies
+
+
+def test_enemy_contact_ends_the_game():
+    sim = make_simulation()
+    clear_enemies(sim)
+    place_enemy(sim, 1, 1, moving=False)
+    events = sim.step()
+    assert (EVENT_PLAYER_KILLED, DEATH_BY_ENEMY) in events
+    assert (EVENT_GAME_OVER, DEATH_BY_ENEMY) in events
+    assert sim.game_over
+
+    # Nothing moves once the game is over
+    tick_events = sim.step(ACTION_BOMB)
+    assert tick_events == []
+    assert sim.bombs == []
+
+
+def test_restart_only_after_the_game_over_delay():
+    sim = make_simulation()
+    clear_enemies(sim)
+    place_enemy(sim, 1, 1, moving=False)
+    sim.step()
+    assert sim.step(ACTION_RESTART) == []
+    for _ in range(int(GAME_OVER_DELAY * FPS)):
+        sim.step()
+    events = sim.step(ACTION_RESTART)
+    assert events == [(EVENT_RESTART, 1)]
+    assert not sim.game_over and not sim.player.is_dead
+    assert len(sim.enemies) == 3
+
+
+# ===== GATE =====
+
+def test_gate_needs_every_enemy_defeated():
+    sim = make_simulation()
+    sim.grid.set_cell(1, 1, GATE)
+    assert sim.enemies
+    sim.step()
+    assert not sim.gate_found
+    sim.step(ACTION_ENTER_GATE)
+    assert not sim.level_complete
+
+
+def test_entering_the_gate_completes_the_level():
+    sim = make_simulation()
+    clear_enemies(sim)
+    sim.grid.set_cell(1, 1, GATE)
+    events = sim.step()
+    assert (EVENT_GATE_FOUND, (1, 1)) in events
+    assert sim.gate_found
+
+    events = sim.step(ACTION_ENTER_GATE)
+    assert (EVENT_LEVEL_COMPLETE, 1) in events
+    assert sim.level_complete
+
+    sim.reset(new_level=True)
+    assert sim.level == 2 and not sim.level_complete
+    assert len(sim.enemies) == 4
+
+
+# ===== DETERMINISM =====
+
+def play(seed, actions, **kwargs):
+    """State hash after every 60 steps of a seeded run"""
+    sim = make_simulation(seed, **kwargs)
+    hashes = []
+    for tick, action in enumerate(actions, 1):
+        sim.step(action)
+        if tick % FPS == 0:
+            hashes.append(state_hash(sim))
+    return hashes
+
+
+def test_same_seed_and_actions_give_the_same_game():
+    actions = scripted_actions(20 * FPS)
+    assert play(SEED, actions) == play(SEED, actions)
+
+
+def test_same_seed_with_pursuit_gives_the_same_game():
+    actions = scripted_actions(20 * FPS)
+    assert play(SEED, actions, pursuit=True) == play(SEED, actions, pursuit=True)
+
+
+def test_different_seeds_give_different_games():
+    actions = scripted_actions(5 * FPS)
+    assert play(SEED, actions) != play(SEED + 1, actions)
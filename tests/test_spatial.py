@@ -0,0 +1,72 @@
+"""Tests for the cell-keyed occupancy index"""
+from spatial import OccupancyIndex
+
+
+class Thing:
+    """Stand-in entity; unhashable like a dataclass with eq, to check the index never hashes them"""
+    __hash__ = None
+
+    def __init__(self, name):
+        self.name = name
+
+
+def test_add_and_lookup():
+    index = OccupancyIndex()
+    a, b = Thing("a"), Thing("b")
+    index.add(a, 1, 1)
+    index.add(b, 1, 1)
+    assert list(index.at(1, 1)) == [a, b]
+    assert index.at(2, 2) == ()
+    assert index.occupied(1, 1)
+    assert not index.occupied(2, 2)
+    assert len(index) == 2
+
+
+def test_move_updates_both_cells():
+    index = OccupancyIndex()
+    a = Thing("a")
+    index.add(a, 1, 1)
+    index.move(a, 1, 1, 1, 2)
+    assert not index.occupied(1, 1)
+    assert list(index.at(1, 2)) == [a]
+    assert len(index) == 1
+
+
+def test_remove_drops_empty_cells():
+    index = OccupancyIndex()
+    a, b = Thing("a"), Thing("b")
+    index.add(a, 3, 4)
+    index.add(b, 3, 4)
+    index.remove(a, 3, 4)
+    assert list(index.at(3, 4)) == [b]
+    index.remove(b, 3, 4)
+    assert not index.occupied(3, 4)
+    assert len(index) == 0
+
+
+def test_remove_missing_entity_is_ignored():
+    index = OccupancyIndex()
+    a, b = Thing("a"), Thing("b")
+    index.add(a, 0, 0)
+    index.remove(b, 0, 0)
+    index.remove(a, 5, 5)
+    assert list(index.at(0, 0)) == [a]
+
+
+def test_in_tiles_lists_each_entity_once():
+    index = OccupancyIndex()
+    a, b, c = Thing("a"), Thing("b"), Thing("c")
+    index.add(a, 1, 1)
+    index.add(b, 2, 1)
+    index.add(c, 9, 9)
+    # The same tile twice, as overlapping blasts produce
+    found = index.in_tiles([(1, 1), (2, 1), (1, 1), (3, 1)])
+    assert found == [a, b]
+
+
+def test_clear():
+    index = OccupancyIndex()
+    index.add(Thing("a"), 1, 1)
+    index.clear()
+    assert len(index) == 0
+    assert not index.occupied(1, 1)
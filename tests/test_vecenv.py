@@ -0,0 +1,73 @@
+"""Shapes, determinism and auto-reset of the vectorized environment"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from vecenv import VecEnv, NUM_ACTIONS, OBS_PLAYER, OUTCOME_RUNNING, OUTCOME_TIMEOUT  # noqa: E402
+
+NUM_ENVS = 8
+
+
+def random_actions(steps, seed=0):
+    return np.random.default_rng(seed).integers(0, NUM_ACTIONS, size=(steps, NUM_ENVS))
+
+
+def rollout(seed, steps=200):
+    env = VecEnv(NUM_ENVS, seed=seed)
+    frames = [env.reset()]
+    totals = np.zeros(NUM_ENVS)
+    for actions in random_actions(steps):
+        obs, rewards, dones, info = env.step(actions)
+        frames.append(obs)
+        totals += rewards
+    return np.stack(frames), totals
+
+
+def test_reset_shapes():
+    env = VecEnv(NUM_ENVS, seed=0)
+    obs = env.reset()
+    assert obs.shape == (NUM_ENVS, env.height, env.width)
+    # Exactly one player on every board
+    assert ((obs == OBS_PLAYER).sum(axis=(1, 2)) == 1).all()
+
+
+def test_step_shapes():
+    env = VecEnv(NUM_ENVS, seed=0)
+    env.reset()
+    obs, rewards, dones, info = env.step(np.zeros(NUM_ENVS, dtype=np.int64))
+    assert obs.shape == (NUM_ENVS, env.height, env.width)
+    assert rewards.shape == dones.shape == (NUM_ENVS,)
+    assert dones.dtype == bool
+    for key in ('outcome', 'episode_return', 'episode_steps'):
+        assert info[key].shape == (NUM_ENVS,)
+
+
+def test_same_seed_same_rollout():
+    frames_a, totals_a = rollout(seed=7)
+    frames_b, totals_b = rollout(seed=7)
+    assert np.array_equal(frames_a, frames_b)
+    assert np.array_equal(totals_a, totals_b)
+
+
+def test_different_seeds_differ():
+    frames_a, _ = rollout(seed=1, steps=0)
+    frames_b, _ = rollout(seed=2, steps=0)
+    assert not np.array_equal(frames_a, frames_b)
+
+
+def test_finished_boards_reset():
+    env = VecEnv(NUM_ENVS, seed=0, max_steps=5)
+    env.reset()
+    finished_early = np.zeros(NUM_ENVS, dtype=bool)
+    for step in range(1, 6):
+        _, _, dones, info = env.step(np.zeros(NUM_ENVS, dtype=np.int64))
+        assert (info['outcome'][dones] != OUTCOME_RUNNING).all()
+        assert (env.steps[dones] == 0).all()
+        if step < 5:
+            finished_early |= dones
+    # Boards still running on their first episode all hit the step limit now
+    first_episode = ~finished_early
+    assert first_episode.any()
+    assert dones[first_episode].all()
+    assert (info['outcome'][first_episode] == OUTCOME_TIMEOUT).all()
+    assert (info['episode_steps'][first_episode] == 5).all()
@@ -0,0 +1,101 @@
+"""
+Non-blocking level transitions.
+
+Moving to the next level used to freeze the window for a second with
+pygame.time.delay() and then rebuild the level inline, so events were
+dropped and the OS could flag the game as not responding. LevelTransition
+is a small state machine the main loop advances once per frame instead:
+
+    playing -> outro -> intro -> playing
+
+During the outro the finished level stays on screen under a fading overlay
+while the next level is generated in the background (see levelgen.py). Once
+the outro has run for its minimum time and the level is ready, the swap
+function installs it in one call, between two frames. The intro then fades
+the new level in while the game already runs. The loop keeps pumping events
+and drawing frames the whole time.
+"""
+import time
+
+# Transition states
+STATE_PLAYING = 'playing'
+STATE_OUTRO = 'outro'  # Old level on screen, next one being prepared
+STATE_INTRO = 'intro'  # New level swapped in and fading in
+
+# Transition kinds
+KIND_NEXT_LEVEL = 'next_level'
+KIND_RESTART = 'restart'
+
+# Minimum outro and intro lengths in seconds per kind
+OUTRO_TIME = {KIND_NEXT_LEVEL: 1.0, KIND_RESTART: 0.3}
+INTRO_TIME = {KIND_NEXT_LEVEL: 0.4, KIND_RESTART: 0.3}
+
+
+class LevelTransition:
+    def __init__(self, timer=time.perf_counter):
+        """
+        Args:
+            timer: Function returning the current time in seconds
+        """
+        self.timer = timer
+        self.state = STATE_PLAYING
+        self.kind = None
+        self.started = 0.0      # When the current state began
+        self.is_ready = None    # Function telling whether the swap can happen without waiting
+        self.swap = None        # Function installing the prepared level
+
+    @property
+    def active(self):
+        return self.state != STATE_PLAYING
+
+    @property
+    def frozen(self):
+        """True while the old level is on screen and must not be stepped"""
+        return self.state == STATE_OUTRO
+
+    def start(self, kind, swap, is_ready=None):
+        """
+        Begin a transition (ignored if one is already running).
+
+        Args:
+            kind: KIND_NEXT_LEVEL or KIND_RESTART
+            swap: Function that installs the next level
+            is_ready: Function returning True once swap() will not block
+        """
+        if self.active:
+            return
+        self.state = STATE_OUTRO
+        self.kind = kind
+        self.started = self.timer()
+        self.swap = swap
+        self.is_ready = is_ready
+
+    def update(self):
+        """
+        Advance the state machine; call once per frame.
+
+        Returns:
+            True if the level was swapped during this call
+        """
+        now = self.timer()
+        elapsed = now - self.started
+        if self.state == STATE_OUTRO:
+            if elapsed >= OUTRO_TIME[self.kind] and (self.is_ready is None or self.is_ready()):
+                self.swap()
+                self.state = STATE_INTRO
+                self.started = now
+                return True
+        elif self.state == STATE_INTRO and elapsed >= INTRO_TIME[self.kind]:
+            self.state = STATE_PLAYING
+            self.kind = self.swap = self.is_ready = None
+        return False
+
+    def progress(self):
+        """How far the current state has run, from 0.0 to 1.0"""
+        if self.state == STATE_OUTRO:
+            duration = OUTRO_TIME[self.kind]
+        elif self.state == STATE_INTRO:
+            duration = INTRO_TIME[self.kind]
+        else:
+            return 0.0
+        return min(1.0, (self.timer() - self.started) / duration)
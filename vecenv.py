@@ -0,0 +1,381 @@
+"""
+Vectorized multi-environment runner for agent training.
+
+VecEnv keeps N independent boards in NumPy arrays and advances all of them
+with one batched step() call, resetting finished episodes automatically.
+It follows the rules of simulation.py - the create_grid() layout, blast rays
+from calculate_explosion_area(), random enemy moves and the gate/enemy win
+check - on a tile-step time base: one env step is the time the player needs
+to walk one tile (TILE_SIZE / PLAYER_SPEED ticks at FPS), and every timer is
+converted to whole steps. Entering the gate when all enemies are dead ends
+the episode as a win without needing a separate "enter" action.
+
+Requires NumPy.
+
+Usage:
+    env = VecEnv(num_envs=1024, seed=0)
+    obs = env.reset()
+    obs, rewards, dones, info = env.step(actions)  # actions: int array of ACT_*
+"""
+import time
+
+import numpy as np
+
+from simulation import (
+    GRID_WIDTH, GRID_HEIGHT, TILE_SIZE, PLAYER_SPEED, BOMB_TIMER, BOMB_RANGE,
+    EXPLOSION_DURATION, ENEMY_MOVE_INTERVAL, DESTRUCTIBLE_BLOCK_CHANCE,
+    EMPTY, WALL, BLOCK, HIDDEN_GATE, GATE,
+)
+
+FPS = 60  # Tick rate of the interactive game the step length is derived from
+
+# Seconds of game time covered by one env step (one tile of player movement)
+STEP_SECONDS = TILE_SIZE / PLAYER_SPEED / FPS
+
+# Timers converted to env steps
+FUSE_STEPS = max(1, round(BOMB_TIMER / STEP_SECONDS))
+FLAME_STEPS = max(1, round(EXPLOSION_DURATION / STEP_SECONDS))
+ENEMY_MOVE_STEPS = max(1, round(ENEMY_MOVE_INTERVAL / STEP_SECONDS))
+MAX_EPISODE_STEPS = round(60 / STEP_SECONDS)  # One minute of game time
+
+# Enough bomb slots for one bomb per step while earlier ones are still live
+MAX_BOMBS = FUSE_STEPS + FLAME_STEPS + 1
+
+# Actions
+ACT_NOOP = 0
+ACT_UP = 1
+ACT_DOWN = 2
+ACT_LEFT = 3
+ACT_RIGHT = 4
+ACT_BOMB = 5
+NUM_ACTIONS = 6
+
+# (dy, dx) for each action; NOOP and BOMB don't move
+ACTION_DELTAS = np.array([(0, 0), (-1, 0), (1, 0), (0, -1), (0, 1), (0, 0)], dtype=np.int64)
+
+# Up, Down, Left, Right as (dy, dx)
+RAY_DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+# Observation codes - hidden gates look like ordinary blocks
+OBS_EMPTY = EMPTY
+OBS_WALL = WALL
+OBS_BLOCK = BLOCK
+OBS_GATE = GATE
+OBS_BOMB = 5
+OBS_FLAME = 6
+OBS_ENEMY = 7
+OBS_PLAYER = 8
+
+# Rewards
+REWARD_WIN = 1.0
+REWARD_DEATH = -1.0
+REWARD_ENEMY = 0.2
+
+# Episode outcomes reported in info['outcome']
+OUTCOME_RUNNING = 0
+OUTCOME_WIN = 1
+OUTCOME_KILLED_BY_ENEMY = 2
+OUTCOME_KILLED_BY_EXPLOSION = 3
+OUTCOME_TIMEOUT = 4
+
+
+def wall_layout(width=GRID_WIDTH, height=GRID_HEIGHT):
+    """Borders plus every second cell, as in create_grid()"""
+    walls = np.zeros((height, width), dtype=bool)
+    walls[0, :] = walls[-1, :] = True
+    walls[:, 0] = walls[:, -1] = True
+    walls[2:height - 1:2, 2:width - 1:2] = True
+    return walls
+
+
+class VecEnv:
+    def __init__(self, num_envs, seed=None, level=1, width=GRID_WIDTH, height=GRID_HEIGHT,
+                 max_steps=MAX_EPISODE_STEPS):
+        """
+        Args:
+            num_envs: Number of independent boards
+            seed: Seed for the NumPy random generator
+            level: Level whose enemy count to use (3 enemies on level 1, 4 on level 2, ...)
+            width, height: Board size in cells
+            max_steps: Steps after which an episode is cut off
+        """
+        self.num_envs = num_envs
+        self.width = width
+        self.height = height
+        self.max_steps = max_steps
+        self.num_enemies = 3 + level - 1
+        self.rng = np.random.default_rng(seed)
+
+        self.walls = wall_layout(width, height)
+        ys, xs = np.mgrid[0:height, 0:width]
+        # Cells where blocks may appear (not walls, not the 3x3 start area)
+        self.block_candidates = ~self.walls & ~((xs <= 2) & (ys <= 2))
+        # Cells where enemies may spawn (away from the player start)
+        self.spawn_area = ~((xs <= 3) & (ys <= 3))
+
+        n = num_envs
+        self.grid = np.zeros((n, height, width), dtype=np.int8)
+        self.player_y = np.ones(n, dtype=np.int64)
+        self.player_x = np.ones(n, dtype=np.int64)
+        self.enemy_y = np.zeros((n, self.num_enemies), dtype=np.int64)
+        self.enemy_x = np.zeros((n, self.num_enemies), dtype=np.int64)
+        self.enemy_alive = np.zeros((n, self.num_enemies), dtype=bool)
+        self.bomb_y = np.zeros((n, MAX_BOMBS), dtype=np.int64)
+        self.bomb_x = np.zeros((n, MAX_BOMBS), dtype=np.int64)
+        self.bomb_fuse = np.zeros((n, MAX_BOMBS), dtype=np.int64)   # Steps until it explodes, 0 = none
+        self.bomb_flame = np.zeros((n, MAX_BOMBS), dtype=np.int64)  # Steps the explosion stays, 0 = none
+        self.flames = np.zeros((n, height, width), dtype=bool)
+        # Tiles reached by each bomb's explosion, kept while its flames burn
+        self.blast_layers = np.zeros((n, MAX_BOMBS, height, width), dtype=bool)
+        self.steps = np.zeros(n, dtype=np.int64)
+        self.episode_return = np.zeros(n, dtype=np.float64)
+        self.env_index = np.arange(n)
+
+    # ===== RESET =====
+
+    def reset(self):
+        """Start a new episode on every board and return the observations"""
+        self.reset_envs(self.env_index)
+        return self.observe()
+
+    def reset_envs(self, envs):
+        """Generate fresh boards for the given env indices"""
+        count = len(envs)
+        if count == 0:
+            return
+        h, w = self.height, self.width
+        rng = self.rng
+
+        # Walls and random destructible blocks
+        grid = np.where(self.walls, WALL, EMPTY).astype(np.int8)
+        grid = np.broadcast_to(grid, (count, h, w)).copy()
+        blocks = (rng.random((count, h, w)) < DESTRUCTIBLE_BLOCK_CHANCE) & self.block_candidates
+        grid[blocks] = BLOCK
+
+        # Hide the gate under a random block (add a block first on the rare empty board)
+        flat = grid.reshape(count, -1)
+        no_blocks = ~blocks.reshape(count, -1).any(axis=1)
+        if no_blocks.any():
+            keys = rng.random((int(no_blocks.sum()), h * w)) * self.block_candidates.reshape(-1)
+            flat[np.nonzero(no_blocks)[0], keys.argmax(axis=1)] = BLOCK
+        keys = rng.random((count, h * w)) * (flat == BLOCK)
+        flat[np.arange(count), keys.argmax(axis=1)] = HIDDEN_GATE
+        self.grid[envs] = grid
+
+        # Enemies on distinct random empty cells away from the start
+        free = (flat == EMPTY) & self.spawn_area.reshape(-1)
+        keys = np.where(free, rng.random((count, h * w)), -1.0)
+        cells = np.argsort(-keys, axis=1)[:, :self.num_enemies]
+        self.enemy_y[envs] = cells // w
+        self.enemy_x[envs] = cells % w
+        self.enemy_alive[envs] = np.take_along_axis(free, cells, axis=1)
+
+        self.player_y[envs] = 1
+        self.player_x[envs] = 1
+        self.bomb_fuse[envs] = 0
+        self.bomb_flame[envs] = 0
+        self.flames[envs] = False
+        self.steps[envs] = 0
+        self.episode_return[envs] = 0.0
+
+    # ===== STEP =====
+
+    def step(self, actions):
+        """
+        Advance every board by one step.
+
+        Args:
+            actions: Int array of shape (num_envs,) with ACT_* values
+
+        Returns:
+            Tuple of (observations, rewards, dones, info). Finished boards are
+            reset before returning, so their observation is the first of the
+            next episode; info['outcome'] and info['episode_return'] describe
+            the episode that just ended.
+        """
+        n = self.num_envs
+        envs = self.env_index
+        grid = self.grid
+        actions = np.asarray(actions, dtype=np.int64)
+        rewards = np.zeros(n, dtype=np.float64)
+        outcome = np.zeros(n, dtype=np.int64)
+        self.steps += 1
+
+        # Player movement onto empty space or the revealed gate
+        delta = ACTION_DELTAS[actions]
+        target_y = self.player_y + delta[:, 0]
+        target_x = self.player_x + delta[:, 1]
+        target = grid[envs, target_y, target_x]
+        can_move = (target == EMPTY) | (target == GATE)
+        self.player_y = np.where(can_move, target_y, self.player_y)
+        self.player_x = np.where(can_move, target_x, self.player_x)
+
+        # Enemies take a random valid step every ENEMY_MOVE_STEPS steps
+        movers = np.nonzero(self.steps % ENEMY_MOVE_STEPS == 0)[0]
+        if len(movers):
+            self.move_enemies(movers)
+
+        # Contact with an enemy kills the player
+        touching = (self.enemy_alive
+                    & (self.enemy_y == self.player_y[:, None])
+                    & (self.enemy_x == self.player_x[:, None])).any(axis=1)
+        outcome[touching] = OUTCOME_KILLED_BY_ENEMY
+
+        # Bomb placement - one bomb per tile, using the first free slot
+        wants_bomb = (actions == ACT_BOMB) & ~touching
+        if wants_bomb.any():
+            self.place_bombs(np.nonzero(wants_bomb)[0])
+
+        # Flames from earlier explosions burn out
+        burning = self.bomb_flame > 0
+        self.bomb_flame[burning] -= 1
+
+        # Fuses burn down; bombs that reach zero explode this step
+        lit = self.bomb_fuse > 0
+        self.bomb_fuse[lit] -= 1
+        exploding = lit & (self.bomb_fuse == 0)
+        blast = np.zeros_like(self.flames)
+        if exploding.any():
+            self.explode(exploding, blast)
+            self.bomb_flame[exploding] = FLAME_STEPS
+
+        # Rebuild the flame layer from bombs that are still burning
+        self.flames[:] = False
+        burning_env, burning_slot = np.nonzero(self.bomb_flame > 0)
+        if len(burning_env):
+            self.flames[burning_env] |= self.blast_layers[burning_env, burning_slot]
+
+        # Enemies and player caught in this step's blasts
+        enemy_hit = self.enemy_alive & blast[envs[:, None], self.enemy_y, self.enemy_x]
+        rewards += REWARD_ENEMY * enemy_hit.sum(axis=1)
+        self.enemy_alive &= ~enemy_hit
+        player_hit = blast[envs, self.player_y, self.player_x] & (outcome == OUTCOME_RUNNING)
+        outcome[player_hit] = OUTCOME_KILLED_BY_EXPLOSION
+
+        # Win: standing on the revealed gate with every enemy defeated
+        on_gate = grid[envs, self.player_y, self.player_x] == GATE
+        won = on_gate & ~self.enemy_alive.any(axis=1) & (outcome == OUTCOME_RUNNING)
+        outcome[won] = OUTCOME_WIN
+
+        timed_out = (self.steps >= self.max_steps) & (outcome == OUTCOME_RUNNING)
+        outcome[timed_out] = OUTCOME_TIMEOUT
+
+        rewards[won] += REWARD_WIN
+        rewards[(outcome == OUTCOME_KILLED_BY_ENEMY) | (outcome == OUTCOME_KILLED_BY_EXPLOSION)] += REWARD_DEATH
+        self.episode_return += rewards
+        dones = outcome != OUTCOME_RUNNING
+
+        info = {'outcome': outcome, 'episode_return': self.episode_return.copy(),
+                'episode_steps': self.steps.copy()}
+        self.reset_envs(np.nonzero(dones)[0])
+        return self.observe(), rewards, dones, info
+
+    def move_enemies(self, envs):
+        """Move every live enemy on the given boards one step in a random valid direction"""
+        h, w = self.height, self.width
+        ey = self.enemy_y[envs]
+        ex = self.enemy_x[envs]
+        grid = self.grid[envs]
+        board = np.arange(len(envs))[:, None]
+
+        # Which of the four neighbours are empty
+        valid = np.empty(ey.shape + (4,), dtype=bool)
+        for i, (dy, dx) in enumerate(RAY_DIRECTIONS):
+            ny = np.clip(ey + dy, 0, h - 1)
+            nx = np.clip(ex + dx, 0, w - 1)
+            valid[..., i] = grid[board, ny, nx] == EMPTY
+
+        # A random permutation of the directions, taking the first valid one,
+        # is the same as the valid direction with the smallest random key
+        keys = self.rng.random(valid.shape) + ~valid
+        choice = keys.argmin(axis=-1)
+        moves = valid.any(axis=-1) & self.enemy_alive[envs]
+        directions = np.array(RAY_DIRECTIONS, dtype=np.int64)
+        self.enemy_y[envs] = np.where(moves, ey + directions[choice, 0], ey)
+        self.enemy_x[envs] = np.where(moves, ex + directions[choice, 1], ex)
+
+    def place_bombs(self, envs):
+        """Place a bomb under the player on the given boards if the tile is free"""
+        py = self.player_y[envs, None]
+        px = self.player_x[envs, None]
+        live = (self.bomb_fuse[envs] > 0) | (self.bomb_flame[envs] > 0)
+        occupied = (live & (self.bomb_y[envs] == py) & (self.bomb_x[envs] == px)).any(axis=1)
+        has_slot = ~live.all(axis=1)
+        ok = ~occupied & has_slot
+        envs = envs[ok]
+        slot = (~live[ok]).argmax(axis=1)
+        self.bomb_y[envs, slot] = self.player_y[envs]
+        self.bomb_x[envs, slot] = self.player_x[envs]
+        self.bomb_fuse[envs, slot] = FUSE_STEPS
+
+    def explode(self, exploding, blast):
+        """
+        Explode the marked bombs, destroy blocks and mark the reached tiles.
+
+        Bombs in the same slot explode together across boards; slots are
+        handled one after another so a block destroyed by one bomb opens the
+        way for the next, as when bombs update in order.
+        """
+        h, w = self.height, self.width
+        for slot in np.nonzero(exploding.any(axis=0))[0]:
+            envs = np.nonzero(exploding[:, slot])[0]
+            by = self.bomb_y[envs, slot]
+            bx = self.bomb_x[envs, slot]
+            layer = np.zeros((len(envs), h, w), dtype=bool)
+            board = np.arange(len(envs))
+            layer[board, by, bx] = True
+            for dy, dx in RAY_DIRECTIONS:
+                open_ray = np.ones(len(envs), dtype=bool)
+                for i in range(1, BOMB_RANGE + 1):
+                    y = np.clip(by + dy * i, 0, h - 1)
+                    x = np.clip(bx + dx * i, 0, w - 1)
+                    cell = self.grid[envs, y, x]
+                    # Stop at indestructible walls
+                    open_ray &= cell != WALL
+                    layer[board[open_ray], y[open_ray], x[open_ray]] = True
+                    # Blocks are destroyed but stop the ray
+                    open_ray &= (cell != BLOCK) & (cell != HIDDEN_GATE)
+            # Destroy blocks and reveal gates inside the blast
+            grid = self.grid[envs]
+            grid[layer & (grid == BLOCK)] = EMPTY
+            grid[layer & (grid == HIDDEN_GATE)] = GATE
+            self.grid[envs] = grid
+            self.blast_layers[envs, slot] = layer
+            blast[envs] |= layer
+
+    # ===== OBSERVATIONS =====
+
+    def observe(self):
+        """
+        Observation for every board.
+
+        Returns:
+            Int8 array of shape (num_envs, height, width) using the OBS_* codes
+        """
+        obs = self.grid.copy()
+        obs[obs == HIDDEN_GATE] = OBS_BLOCK
+        obs[self.flames] = OBS_FLAME
+        live = self.bomb_fuse > 0
+        bomb_env, bomb_slot = np.nonzero(live)
+        obs[bomb_env, self.bomb_y[bomb_env, bomb_slot], self.bomb_x[bomb_env, bomb_slot]] = OBS_BOMB
+        enemy_env, enemy_slot = np.nonzero(self.enemy_alive)
+        obs[enemy_env, self.enemy_y[enemy_env, enemy_slot], self.enemy_x[enemy_env, enemy_slot]] = OBS_ENEMY
+        obs[self.env_index, self.player_y, self.player_x] = OBS_PLAYER
+        return obs
+
+
+def steps_per_second(num_envs=4096, steps=200, seed=0):
+    """Measure env-steps per second with random actions"""
+    env = VecEnv(num_envs, seed=seed)
+    env.reset()
+    rng = np.random.default_rng(seed)
+    actions = rng.integers(0, NUM_ACTIONS, size=(steps, num_envs))
+    start = time.perf_counter()
+    for t in range(steps):
+        env.step(actions[t])
+    elapsed = time.perf_counter() - start
+    return num_envs * steps / elapsed
+
+
+if __name__ == "__main__":
+    print(f"{steps_per_second():,.0f} env-steps per second")